@@ -97,6 +97,11 @@ async def limit_upload_size(request: Request, call_next):
 # Khởi tạo hệ thống RAG
 rag_system = AdvancedDatabaseRAG()
 
+# Collection chung chứa tài liệu do admin upload. Store gốc chỉ được gán một lần ở đây,
+# mỗi request dùng view riêng (vector_store.for_collection) thay vì sửa collection_name dùng chung
+GLOBAL_COLLECTION = "global_documents"
+rag_system.vector_store.collection_name = GLOBAL_COLLECTION
+
 # Hàm utility để lấy thời gian Việt Nam
 def get_vietnam_time():
     """Lấy thời gian hiện tại theo múi giờ Việt Nam"""
@@ -258,8 +263,13 @@ def indexing_documents():
             f"Đã xử lý {len(processed_chunks)} chunks. Đang index..."
         )
 
-        # Index lên vector store
-        rag_system.index_to_qdrant(processed_chunks)
+        # Index lên vector store (collection chung); embedding pool đa tiến trình
+        # được dùng tự động cho corpus lớn khi bật EMBEDDING_POOL_WORKERS
+        rag_system.index_to_qdrant(
+            processed_chunks,
+            user_id=None,
+            vector_store=rag_system.vector_store.for_collection(GLOBAL_COLLECTION),
+        )
 
         # # Cập nhật BM25 index sau khi đã index xong tài liệu
         # indexing_status["message"] = "Đang cập nhật BM25 index..."
@@ -299,6 +309,21 @@ class FileDeleteResponse(BaseModel):
     removed_points: Optional[int] = None
 
 
+class BulkFileDeleteRequest(BaseModel):
+    file_ids: List[str]
+    # "exact": đếm bằng Qdrant, "metadata": cộng chunks_count đã lưu khi upload (chỉ đúng với file
+    # upload sau khi chunks_count lưu số point thực tế), "none": không đếm
+    count_mode: str = "exact"
+
+
+class BulkFileDeleteResponse(BaseModel):
+    status: str
+    message: str
+    deleted_files: List[str]
+    missing_files: List[str]
+    removed_points: Optional[int] = None
+
+
 # Thêm model để quản lý phiên hội thoại
 class ConversationRequest(BaseModel):
     conversation_id: str
@@ -468,6 +493,16 @@ async def get_current_user(
         )
 
 
+async def require_admin_role(current_user=Depends(get_current_user)):
+    """Dependency để kiểm tra quyền admin"""
+    if not current_user or getattr(current_user, 'role', None) != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới có quyền truy cập API này"
+        )
+    return current_user
+
+
 # API routes
 @app.get(f"{PREFIX}/")
 async def root():
@@ -498,10 +533,8 @@ async def ask_question_stream(
         # Lấy hoặc tạo ID phiên hội thoại
         user_id = current_user.id
 
-        # Đặt collection_name cho vector store
-        rag_system.vector_store.collection_name = "global_documents"
-        # Cập nhật user_id cho vector_store trong SearchManager
-        rag_system.vector_store.user_id = user_id
+        # View riêng cho request: collection chung + user hiện tại (không sửa store dùng chung)
+        request_vector_store = rag_system.vector_store.for_collection(GLOBAL_COLLECTION, user_id=user_id)
 
         # Lấy danh sách file_id từ request nếu có
         search_file_ids = None
@@ -584,6 +617,7 @@ async def ask_question_stream(
                     request.question,
                     # file_id=search_file_ids,
                     conversation_history=conversation_history,
+                    vector_store=request_vector_store,
                 )
 
                 # Thu thập toàn bộ nội dung để lưu lịch sử
@@ -755,10 +789,8 @@ async def upload_document(
         original_file_path = file_path
         
         # CẤU HÌNH VECTOR STORE KHÔNG DÙNG USER_ID
-        # Đặt collection_name cho vector store - sử dụng collection chung
-        rag_system.vector_store.collection_name = "global_documents"
-        # Không set user_id cho vector_store vì giờ dùng chung
-        rag_system.vector_store.user_id = None
+        # View riêng cho request trên collection chung, không set user_id vì tài liệu dùng chung
+        vector_store = rag_system.vector_store.for_collection(GLOBAL_COLLECTION)
         
         print(f"[UPLOAD] Admin {current_user.email} đang upload file vào thư mục chung")
 
@@ -819,31 +851,58 @@ async def upload_document(
         processed_chunks = rag_system.document_processor.process_documents(documents)
 
         # Index lên vector store KHÔNG DÙNG USER_ID
+        reindex_stats = None
+        points_count = 0
         if processed_chunks:
-            # Tạo embeddings cho các chunks
-            texts = [chunk["text"] for chunk in processed_chunks]
-            embeddings = await rag_system.embedding_model.encode(texts)
+            from backend.supabase.files_manager import FilesManager
+            from backend.supabase.client import SupabaseClient
 
-            # Đảm bảo collection đã tồn tại với kích thước vector đúng
-            await rag_system.vector_store.ensure_collection_exists(len(embeddings[0]))
+            # Tìm file cùng tên đã upload trước đó để index lại tăng dần thay vì index toàn bộ
+            existing_file = None
+            try:
+                # Sử dụng client với service role để bypass RLS
+                supabase_client_with_service_role = SupabaseClient(use_service_key=True)
+                files_manager = FilesManager(supabase_client_with_service_role.get_client())
+                existing_files = files_manager.get_file_by_name_for_admin(original_file_name)
+                existing_file = existing_files[0] if existing_files else None
+            except Exception as e:
+                files_manager = None
+                print(f"[UPLOAD] Không thể kiểm tra file đã tồn tại: {str(e)}")
 
             # Index embeddings KHÔNG DÙNG USER_ID - file sẽ được chia sẻ cho tất cả user
             print(f"[UPLOAD] Đang index {len(processed_chunks)} chunks vào collection chung global_documents")
-            file_id = str(uuid.uuid4())
+            if existing_file:
+                file_id = existing_file["file_id"]
+                old_category = (existing_file.get("metadata") or {}).get("category")
+                if old_category != category:
+                    # Danh mục thay đổi thì metadata của mọi chunk đều đổi, xóa để index lại toàn bộ
+                    vector_store.delete_by_file_id(file_id)
+                print(f"[UPLOAD] File {original_file_name} đã tồn tại (file_id={file_id}), index lại tăng dần")
+                reindex_stats = await vector_store.index_documents_incremental(
+                    processed_chunks,
+                    rag_system.embedding_model,
+                    user_id=None,  # Không dùng user_id
+                    file_id=file_id,
+                )
+            else:
+                file_id = str(uuid.uuid4())
+
+                # Encode và upsert theo pipeline với user_id=None để lưu vào collection chung
+                # (collection được tạo với kích thước vector của embedding model nếu chưa có)
+                await vector_store.index_documents_streaming(
+                    processed_chunks,
+                    rag_system.embedding_model,
+                    user_id=None,  # Không dùng user_id
+                    file_id=file_id,
+                )
             
-            # Gọi index_documents với user_id=None để lưu vào collection chung
-            await rag_system.vector_store.index_documents(
-                processed_chunks,
-                embeddings,
-                user_id=None,  # Không dùng user_id
-                file_id=file_id,
+            # Chunk trùng nội dung trong file có cùng point ID nên chỉ tạo một point: lưu số point thực tế
+            points_count = len(
+                {vector_store.make_point_id(file_id, chunk["text"]) for chunk in processed_chunks}
             )
-            
+
             # LƯU THÔNG TIN FILE VÀO DATABASE VỚI USER_ID CỦA ADMIN
             try:
-                from backend.supabase.files_manager import FilesManager
-                from backend.supabase.client import SupabaseClient
-                
                 # Lấy kích thước file gốc
                 file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
                 if file_size == 0 and os.path.exists(original_file_path):
@@ -853,7 +912,7 @@ async def upload_document(
                 metadata = {
                     "category": category,
                     "file_size": file_size,
-                    "chunks_count": len(processed_chunks),
+                    "chunks_count": points_count,
                     "is_indexed": True,
                     "last_indexed": datetime.now().isoformat(),
                     "original_file_name": original_file_name,
@@ -864,20 +923,29 @@ async def upload_document(
                     "is_shared_resource": True  # Đánh dấu là tài nguyên chia sẻ
                 }
                 
-                # Sử dụng client với service role để bypass RLS
-                supabase_client_with_service_role = SupabaseClient(use_service_key=True)
-                client = supabase_client_with_service_role.get_client()
-                files_manager = FilesManager(client)
+                if files_manager is None:
+                    # Sử dụng client với service role để bypass RLS
+                    supabase_client_with_service_role = SupabaseClient(use_service_key=True)
+                    files_manager = FilesManager(supabase_client_with_service_role.get_client())
                 
-                # Lưu metadata vào Supabase với user_id của admin
-                save_result = files_manager.save_file_metadata(
-                    file_id=file_id,
-                    filename=original_file_name,
-                    file_path=file_path,
-                    user_id=current_user.id,  # Lưu ID admin upload
-                    file_type=file_type,
-                    metadata=metadata
-                )
+                if existing_file:
+                    # Cập nhật bản ghi cũ, giữ nguyên file_id để lần sau vẫn index tăng dần được
+                    save_result = files_manager.update_file_metadata(
+                        file_id=file_id,
+                        file_path=file_path,
+                        file_type=file_type,
+                        metadata=metadata
+                    )
+                else:
+                    # Lưu metadata vào Supabase với user_id của admin
+                    save_result = files_manager.save_file_metadata(
+                        file_id=file_id,
+                        filename=original_file_name,
+                        file_path=file_path,
+                        user_id=current_user.id,  # Lưu ID admin upload
+                        file_type=file_type,
+                        metadata=metadata
+                    )
                 
                 print(f"[UPLOAD] Đã lưu thông tin file vào Supabase với file_id={file_id}")
             except Exception as e:
@@ -888,20 +956,67 @@ async def upload_document(
             "filename": original_file_name,
             "status": "success",
             "message": f"Admin đã tải lên và index thành công {len(processed_chunks)} chunks từ tài liệu vào hệ thống chung",
-            "chunks_count": len(processed_chunks),
+            "chunks_count": points_count,
             "category": category,
             "file_id": file_id,
-            "shared_resource": True
+            "shared_resource": True,
+            "reindex": reindex_stats,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi xử lý tài liệu: {str(e)}")
 
 
+# Trạng thái lần dựng lại collection gần nhất (blue/green)
+collection_rebuild_status = {"status": "idle"}
+
+
+async def run_collection_rebuild(alias, copy_data):
+    """Dựng lại collection ở nền, tìm kiếm vẫn dùng phiên bản cũ cho tới khi chuyển alias"""
+    collection_rebuild_status.update(
+        {"status": "running", "alias": alias, "copy_data": copy_data, "started_at": datetime.now().isoformat()}
+    )
+    try:
+        result = await rag_system.vector_store.rebuild_collection(
+            rag_system.embedding_model, alias=alias, copy_data=copy_data
+        )
+        collection_rebuild_status.update({"status": "completed", "result": result, "error": None})
+    except Exception as e:
+        print(f"[REBUILD] Lỗi khi dựng lại collection {alias}: {str(e)}")
+        collection_rebuild_status.update({"status": "failed", "error": str(e)})
+    finally:
+        collection_rebuild_status["finished_at"] = datetime.now().isoformat()
+
+
 @app.delete(f"{PREFIX}/collection/reset")
-async def reset_collection():
+async def reset_collection(
+    background_tasks: BackgroundTasks,
+    rebuild: bool = Query(
+        False,
+        description="True: encode lại toàn bộ dữ liệu sang phiên bản mới ở nền (blue/green) thay vì xóa dữ liệu",
+    ),
+    admin_user=Depends(require_admin_role)
+):
     """
-    Xóa toàn bộ dữ liệu đã index trong collection
+    [ADMIN] Xóa toàn bộ dữ liệu đã index trong collection
+
+    Với rebuild=true: dựng lại collection theo kiểu blue/green, phiên bản mới được tạo ở nền và
+    alias chỉ được chuyển khi đã đủ dữ liệu, nên tìm kiếm không bị gián đoạn
     """
+    if collection_rebuild_status.get("status") == "running":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Collection {collection_rebuild_status.get('alias')} đang được dựng lại",
+        )
+
+    if rebuild:
+        alias = rag_system.vector_store.collection_name
+        background_tasks.add_task(run_collection_rebuild, alias, True)
+        collection_rebuild_status.update({"status": "running", "alias": alias})
+        return {
+            "status": "accepted",
+            "message": f"Đang dựng lại collection {alias} ở nền, tìm kiếm vẫn dùng phiên bản hiện tại",
+        }
+
     try:
         # Lấy thông tin collection
         collection_info = rag_system.vector_store.get_collection_info()
@@ -914,12 +1029,8 @@ async def reset_collection():
         # Xóa collection cũ
         rag_system.vector_store.delete_collection()
 
-        # Lấy kích thước vector từ mô hình embedding
-        # Tạo một vector mẫu để xác định kích thước
-        sample_embedding = await rag_system.embedding_model.encode(["Sample text"])
-        vector_size = len(sample_embedding[0])
-
-        # Tạo lại collection mới
+        # Tạo lại collection mới với kích thước vector của mô hình embedding
+        vector_size = rag_system.embedding_model.get_dimension()
         await rag_system.vector_store.ensure_collection_exists(vector_size)
 
         return {
@@ -933,6 +1044,26 @@ async def reset_collection():
         )
 
 
+@app.get(f"{PREFIX}/collection/versions")
+async def get_collection_versions(admin_user=Depends(require_admin_role)):
+    """
+    Phiên bản collection mà alias đang trỏ tới, các phiên bản còn giữ và trạng thái lần dựng lại gần nhất
+    """
+    try:
+        vector_store = rag_system.vector_store
+        alias = vector_store.collection_name
+        return {
+            "alias": alias,
+            "current": vector_store.resolve_collection_name(alias),
+            "versions": vector_store.list_collection_versions(alias),
+            "rebuild": collection_rebuild_status,
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Lỗi khi lấy phiên bản collection: {str(e)}"
+        )
+
+
 # Thêm API endpoint lấy danh sách file đã upload
 @app.get(f"{PREFIX}/files", response_model=FileListResponse)
 async def get_uploaded_files(current_user=Depends(get_current_user)):
@@ -1080,11 +1211,9 @@ async def delete_file(filename: str, current_user=Depends(get_current_user)):
 
         print(f"[DELETE] Đang xóa các điểm dữ liệu liên quan đến file: {filename}")
 
-        # CẤU HÌNH VECTOR STORE ĐỂ XÓA TỪ COLLECTION CHUNG
-        original_collection = rag_system.vector_store.collection_name
-        rag_system.vector_store.collection_name = "global_documents"
-        rag_system.vector_store.user_id = None  # Không dùng user_id
-        print(f"[DELETE] Sử dụng collection: {rag_system.vector_store.collection_name}")
+        # CẤU HÌNH VECTOR STORE ĐỂ XÓA TỪ COLLECTION CHUNG (view riêng, không dùng user_id)
+        vector_store = rag_system.vector_store.for_collection(GLOBAL_COLLECTION)
+        print(f"[DELETE] Sử dụng collection: {vector_store.collection_name}")
 
         # XÓA TỪ VECTOR STORE THEO FILE_ID
         deleted_points_count = 0
@@ -1093,7 +1222,7 @@ async def delete_file(filename: str, current_user=Depends(get_current_user)):
         if file_id:
             try:
                 print(f"[DELETE] Thử xóa theo file_id: {file_id}")
-                success, message = rag_system.vector_store.delete_by_file_id(file_id)
+                success, message = vector_store.delete_by_file_id(file_id)
                 
                 if success:
                     import re
@@ -1109,7 +1238,7 @@ async def delete_file(filename: str, current_user=Depends(get_current_user)):
         if not deletion_success and actual_file_path:
             try:
                 print(f"[DELETE] Thử xóa theo đường dẫn file: {actual_file_path}")
-                success, message = rag_system.vector_store.delete_by_file_path(actual_file_path)
+                success, message = vector_store.delete_by_file_path(actual_file_path)
                 
                 if success:
                     import re
@@ -1137,9 +1266,6 @@ async def delete_file(filename: str, current_user=Depends(get_current_user)):
         except Exception as e:
             print(f"[DELETE] Lỗi khi xóa file khỏi database: {str(e)}")
 
-        # Khôi phục collection_name gốc
-        rag_system.vector_store.collection_name = original_collection
-
         return {
             "filename": filename,
             "status": "success",
@@ -1153,6 +1279,81 @@ async def delete_file(filename: str, current_user=Depends(get_current_user)):
         print(f"[DELETE] Lỗi không mong muốn: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Lỗi khi xóa file: {str(e)}")
 
+@app.post(f"{PREFIX}/admin/files/bulk-delete", response_model=BulkFileDeleteResponse)
+async def admin_bulk_delete_files(
+    request: BulkFileDeleteRequest,
+    admin_user=Depends(require_admin_role)
+):
+    """
+    [ADMIN] Xóa nhiều file cùng lúc: một lệnh delete (MatchAny theo file_id) trong vector store,
+    một truy vấn xóa trong database, sau đó xóa file vật lý
+
+    - **file_ids**: Danh sách file_id cần xóa
+    - **count_mode**: "exact" (mặc định, đếm bằng Qdrant), "metadata" (dùng chunks_count lúc upload) hoặc "none"
+    """
+    if request.count_mode not in ("exact", "metadata", "none"):
+        raise HTTPException(status_code=400, detail=f"count_mode không hợp lệ: {request.count_mode}")
+
+    file_ids = list(dict.fromkeys(file_id for file_id in request.file_ids if file_id))
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="Danh sách file_ids không được để trống")
+
+    try:
+        from backend.supabase.files_manager import FilesManager
+        from backend.supabase.client import SupabaseClient
+
+        files_manager = FilesManager(SupabaseClient(use_service_key=True).get_client())
+        file_records = files_manager.get_files_by_ids(file_ids)
+        records_by_id = {record["file_id"]: record for record in file_records}
+        missing_files = [file_id for file_id in file_ids if file_id not in records_by_id]
+
+        print(f"[DELETE] Admin {admin_user.email} đang xóa {len(file_ids)} file")
+
+        # Xóa điểm dữ liệu của tất cả file (kể cả file không còn bản ghi trong database)
+        vector_store = rag_system.vector_store.for_collection(GLOBAL_COLLECTION)
+        expected_counts = {
+            file_id: (record.get("metadata") or {}).get("chunks_count")
+            for file_id, record in records_by_id.items()
+        }
+        success, message, removed_points = vector_store.delete_by_file_ids(
+            file_ids,
+            count_mode=request.count_mode,
+            expected_counts=expected_counts,
+        )
+        if not success:
+            raise HTTPException(status_code=500, detail=message)
+
+        # Xóa file vật lý
+        upload_dir = os.getenv("UPLOAD_DIR", "backend/data")
+        for record in file_records:
+            file_path = record.get("file_path")
+            possible_paths = [file_path, os.path.join(upload_dir, record.get("filename") or "")]
+            for path in possible_paths:
+                if path and os.path.isfile(path):
+                    try:
+                        os.remove(path)
+                    except Exception as e:
+                        print(f"[DELETE] Lỗi khi xóa file vật lý {path}: {str(e)}")
+                    break
+
+        # Xóa vĩnh viễn các bản ghi trong database bằng một truy vấn
+        if records_by_id:
+            files_manager.delete_files_permanently(list(records_by_id))
+
+        return {
+            "status": "success",
+            "message": message,
+            "deleted_files": list(records_by_id),
+            "missing_files": missing_files,
+            "removed_points": removed_points,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[DELETE] Lỗi khi xóa nhiều file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Lỗi khi xóa nhiều file: {str(e)}")
+
 @app.post(f"{PREFIX}/collections/delete-by-filter")
 async def delete_points_by_filter(filter_request: Dict):
     """
@@ -1190,9 +1391,7 @@ async def delete_points_by_filter(filter_request: Dict):
                     )
 
         # Kiểm tra collection tồn tại
-        collection_exists = rag_system.vector_store.client.collection_exists(
-            rag_system.vector_store.collection_name
-        )
+        collection_exists = rag_system.vector_store.collection_exists_sync()
         print(
             f"[DELETE-FILTER] Collection {rag_system.vector_store.collection_name} tồn tại: {collection_exists}"
         )
@@ -2469,15 +2668,6 @@ def _raise_if_supabase_error(res):
         raise HTTPException(status_code=400, detail=str(res.error))
     return res
 
-async def require_admin_role(current_user=Depends(get_current_user)):
-    """Dependency để kiểm tra quyền admin"""
-    if not current_user or getattr(current_user, 'role', None) != 'admin':
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Chỉ admin mới có quyền truy cập API này"
-        )
-    return current_user
-
 def get_service_supabase_client():
     """Lấy Supabase client với service role key"""
     try:
@@ -4074,6 +4264,85 @@ async def admin_get_system_stats(
             detail=f"Lỗi khi lấy system stats: {str(e)}"
         )
 
+@app.get(f"{PREFIX}/admin/system/cache-stats")
+async def admin_get_cache_stats(
+    admin_user=Depends(require_admin_role)
+):
+    """
+    [ADMIN] Lấy thống kê các cache nội bộ (hit/miss) của hệ thống RAG
+    """
+    try:
+        return {
+            "embedding_cache": rag_system.embedding_model.get_cache_stats(),
+            "chunk_cache": rag_system.vector_store.get_chunk_cache_stats(),
+            "bm25_index": rag_system.vector_store.get_lexical_index_stats(),
+            "rerank_cache": rag_system.search_manager.get_rerank_cache_stats(),
+        }
+    except Exception as e:
+        print(f"Lỗi khi lấy cache stats: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi lấy cache stats: {str(e)}"
+        )
+
+@app.get(f"{PREFIX}/admin/system/rerank-stats")
+async def admin_get_rerank_stats(
+    admin_user=Depends(require_admin_role)
+):
+    """
+    [ADMIN] Thống kê rerank theo tầng: số ứng viên, số cặp qua model chính, số lần dừng sớm
+    và thời gian trung bình của từng tầng (để tinh chỉnh RERANK_CASCADE_TOP_M)
+    """
+    try:
+        return rag_system.search_manager.get_rerank_stats()
+    except Exception as e:
+        print(f"Lỗi khi lấy rerank stats: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi lấy rerank stats: {str(e)}"
+        )
+
+@app.get(f"{PREFIX}/admin/documents/export")
+async def admin_export_documents(
+    category: Optional[str] = Query(None, description="Chỉ xuất các chunk thuộc danh mục này"),
+    fields: Optional[str] = Query(
+        None, description="Danh sách trường payload cần xuất, phân tách bằng dấu phẩy (vd: text,source,file_id)"
+    ),
+    all_tenants: bool = Query(
+        False, description="Xuất dữ liệu của mọi tenant (multi-tenant), mặc định chỉ tài liệu chung"
+    ),
+    admin_user=Depends(require_admin_role)
+):
+    """
+    [ADMIN] Xuất toàn bộ chunk trong collection dưới dạng NDJSON (mỗi dòng một JSON),
+    dữ liệu được scroll và gửi dần theo từng trang nên không giữ cả collection trong bộ nhớ
+    """
+    vector_store = rag_system.vector_store
+    if not vector_store.collection_exists_sync():
+        raise HTTPException(
+            status_code=404,
+            detail=f"Collection {vector_store.collection_name} không tồn tại"
+        )
+
+    payload_fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    def generate_ndjson():
+        try:
+            for document in vector_store.iter_documents(
+                category=category, payload_fields=payload_fields, all_tenants=all_tenants
+            ):
+                yield json.dumps(document, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"Lỗi khi xuất tài liệu: {str(e)}")
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+    filename = f"{vector_store.collection_name}{'_' + category if category else ''}.ndjson"
+    return StreamingResponse(
+        generate_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @app.get(f"{PREFIX}/admin/conversations/stats", response_model=AdminConversationStatsResponse)
 async def admin_get_conversation_stats(
     days: int = Query(7, ge=1, le=365, description="Số ngày thống kê"),
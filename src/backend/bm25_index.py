@@ -0,0 +1,496 @@
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from backend.file_lock import file_lock
+
+# Cấu hình logging
+logging.basicConfig(format="[BM25] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[BM25] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Hư từ tiếng Việt/tiếng Anh phổ biến: bỏ khỏi unigram nhưng vẫn giữ trong bigram âm tiết
+STOPWORDS = frozenset(
+    [
+        "là", "của", "và", "các", "có", "được", "trong", "cho", "những", "một", "với",
+        "này", "để", "thì", "khi", "từ", "theo", "về", "như", "đó", "bị", "hay", "hoặc",
+        "the", "a", "an", "of", "and", "or", "to", "in", "is", "are", "for", "on", "with",
+    ]
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tách từ cho tiếng Việt: chuẩn hóa Unicode (NFC) và chữ thường, tách theo âm tiết,
+    thêm bigram của hai âm tiết liền kề (cơ_sở, dữ_liệu, group_by) vì từ tiếng Việt
+    thường gồm nhiều âm tiết. Từ khóa SQL và mã lỗi được giữ nguyên (having, ora_00942).
+    """
+    syllables = _TOKEN_RE.findall(unicodedata.normalize("NFC", text or "").lower())
+    terms = [syllable for syllable in syllables if syllable not in STOPWORDS]
+    terms.extend(f"{first}_{second}" for first, second in zip(syllables, syllables[1:]))
+    return terms
+
+
+class BM25Index:
+    """
+    Chỉ mục BM25 của một collection, lưu trên đĩa dạng postings nén đọc qua memory-map
+
+    - Phần gốc (base): postings_docs.npy (int32), postings_tf.npy (uint16), doc_len.npy (uint32),
+      meta.json (term -> [offset, df]) và docs.json (point ID + payload rút gọn để lọc)
+    - Thay đổi sau lần gộp gần nhất (thêm/xóa point) nằm trong bộ nhớ và được ghi nối tiếp
+      vào delta.jsonl, phát lại khi tải. Khi đủ BM25_COMPACT_THRESHOLD thay đổi thì gộp lại
+      thành phần gốc mới (ghi thư mục tạm rồi đổi tên)
+
+    Nhiều tiến trình (uvicorn worker) dùng chung thư mục: ghi delta, gộp và xóa giữ khóa file <index_dir>.lock.
+    Mỗi lần gộp tăng generation; trước khi ghi (và khi refresh) chỉ mục tải lại nếu generation trên đĩa đã đổi,
+    ngược lại chỉ phát lại phần delta.jsonl do tiến trình khác ghi thêm.
+    """
+
+    def __init__(self, index_dir: str):
+        """Tải chỉ mục từ index_dir nếu đã có trên đĩa"""
+        self.index_dir = index_dir
+        self.k1 = float(os.getenv("BM25_K1", "1.2"))
+        self.b = float(os.getenv("BM25_B", "0.75"))
+        self.compact_threshold = int(os.getenv("BM25_COMPACT_THRESHOLD", "5000"))
+        self.lock = threading.RLock()
+        # Đang dựng trong thread nền (VectorStore.build_lexical_index_async)
+        self.building = threading.Lock()
+        self._reset()
+        with self._file_lock(shared=True):
+            self._load()
+
+    # --------------------------------------------------------
+    # Trạng thái trong bộ nhớ
+    # --------------------------------------------------------
+    def _reset(self):
+        self.exists = False
+        self._terms = {}  # term -> (offset, df) trong phần gốc
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_tf = np.zeros(0, dtype=np.uint16)
+        self._base_docs = 0
+        self._delta = {}  # term -> ([doc], [tf]) cho các doc thêm sau lần gộp gần nhất
+        self._doc_ids = []  # doc nội bộ -> point ID
+        self._doc_meta = []  # doc nội bộ -> payload rút gọn
+        self._id_to_doc = {}
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._total_len = 0.0
+        self._alive_count = 0
+        self._pending_changes = 0
+        self._generation = None  # generation của phần gốc đã tải (None: chưa có trên đĩa)
+        self._delta_offset = 0  # số byte của delta.jsonl đã phát lại
+
+    def _grow(self, n_docs):
+        """Mở rộng mảng doc_len/alive (gấp đôi dung lượng) để chứa n_docs doc"""
+        if n_docs <= len(self._doc_len):
+            return
+        capacity = max(n_docs, 2 * len(self._doc_len), 1024)
+        doc_len = np.zeros(capacity, dtype=np.float32)
+        doc_len[: len(self._doc_len)] = self._doc_len
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self._alive)] = self._alive
+        self._doc_len, self._alive = doc_len, alive
+
+    def _path(self, name, index_dir=None):
+        return os.path.join(index_dir or self.index_dir, name)
+
+    def _file_lock(self, shared=False):
+        """Khóa giữa các tiến trình; nằm ngoài index_dir vì thư mục bị thay thế khi gộp"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_dir)), exist_ok=True)
+        return file_lock(self.index_dir + ".lock", shared=shared)
+
+    def _read_generation(self):
+        """Generation của phần gốc trên đĩa, None nếu chưa có chỉ mục"""
+        try:
+            with open(self._path("generation"), "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return None
+
+    def _sync(self):
+        """Đồng bộ với đĩa (gọi khi giữ khóa file): tải lại nếu generation đổi, phát lại delta mới"""
+        generation = self._read_generation()
+        if generation != self._generation:
+            self._release()
+            self._reset()
+            self._load()
+        elif self.exists:
+            self._replay_delta()
+
+    def refresh(self):
+        """Cập nhật thay đổi của tiến trình khác; bỏ qua nếu chỉ mục đang bận (ghi hoặc dựng trong thread nền)"""
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            with self._file_lock(shared=True):
+                self._sync()
+        finally:
+            self.lock.release()
+
+    def _load(self):
+        if not os.path.exists(self._path("meta.json")):
+            return
+        try:
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != INDEX_FORMAT_VERSION:
+                print(f"Bỏ qua chỉ mục {self.index_dir}: định dạng {meta.get('format')} không hỗ trợ")
+                return
+            with open(self._path("docs.json"), "r", encoding="utf-8") as f:
+                docs = json.load(f)
+
+            self._terms = {term: tuple(entry) for term, entry in meta["terms"].items()}
+            # view ndarray thường trên vùng memory-map: tránh chi phí lớp con np.memmap khi cắt lát
+            self._post_docs = np.load(self._path("postings_docs.npy"), mmap_mode="r").view(np.ndarray)
+            self._post_tf = np.load(self._path("postings_tf.npy"), mmap_mode="r").view(np.ndarray)
+            self._base_docs = len(docs)
+            self._grow(self._base_docs)
+            self._doc_len[: self._base_docs] = np.load(self._path("doc_len.npy"))
+            self._alive[: self._base_docs] = True
+            self._total_len = float(self._doc_len[: self._base_docs].sum())
+            self._alive_count = self._base_docs
+            for doc, (point_id, doc_meta) in enumerate(docs):
+                self._doc_ids.append(point_id)
+                self._doc_meta.append(doc_meta)
+                self._id_to_doc[point_id] = doc
+
+            self._generation = self._read_generation()
+            self._replay_delta()
+            self.exists = True
+        except Exception as e:
+            print(f"Không thể tải chỉ mục {self.index_dir}: {str(e)}")
+            self._reset()
+
+    def _replay_delta(self):
+        """Phát lại phần delta.jsonl sau _delta_offset (các dòng do tiến trình này hoặc tiến trình khác ghi)"""
+        delta_path = self._path("delta.jsonl")
+        if not os.path.exists(delta_path) or os.path.getsize(delta_path) <= self._delta_offset:
+            return
+        with open(delta_path, "rb") as f:
+            f.seek(self._delta_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Dòng cuối bị ghi dở khi tiến trình dừng đột ngột
+                    break
+                if line.strip():
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entry["op"] == "add":
+                        self._add_doc(entry["id"], entry["terms"], entry["len"], entry["meta"])
+                    else:
+                        self._remove_docs(entry["ids"])
+                self._delta_offset += len(line)
+
+    # --------------------------------------------------------
+    # Cập nhật
+    # --------------------------------------------------------
+    def _add_doc(self, point_id, term_counts, length, doc_meta):
+        old_doc = self._id_to_doc.get(point_id)
+        if old_doc is not None:
+            self._kill(old_doc)
+        doc = len(self._doc_ids)
+        self._grow(doc + 1)
+        self._doc_ids.append(point_id)
+        self._doc_meta.append(doc_meta)
+        self._id_to_doc[point_id] = doc
+        self._doc_len[doc] = length
+        self._alive[doc] = True
+        self._total_len += length
+        self._alive_count += 1
+        for term, tf in term_counts.items():
+            docs, tfs = self._delta.setdefault(term, ([], []))
+            docs.append(doc)
+            tfs.append(min(tf, 65535))
+        self._pending_changes += 1
+
+    def _kill(self, doc):
+        if self._alive[doc]:
+            self._alive[doc] = False
+            self._total_len -= float(self._doc_len[doc])
+            self._alive_count -= 1
+            self._pending_changes += 1
+
+    def _remove_docs(self, point_ids):
+        for point_id in point_ids:
+            doc = self._id_to_doc.pop(point_id, None)
+            if doc is not None:
+                self._kill(doc)
+
+    def _append_delta(self, entries):
+        """Ghi nối tiếp thay đổi (gọi khi giữ khóa file, sau _sync nên mọi dòng trước đó đã được phát lại)"""
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        with open(self._path("delta.jsonl"), "ab") as f:
+            f.write(data)
+        self._delta_offset += len(data)
+
+    def add(self, documents: Iterable[Tuple[str, str, Dict]]):
+        """
+        Thêm (hoặc thay thế) các chunk vào chỉ mục
+
+        Args:
+            documents: Các bộ (point_id, text, payload rút gọn dùng để lọc)
+        """
+        # Tách từ trước khi lấy khóa: phần tốn CPU không chặn tìm kiếm
+        entries = []
+        for point_id, text, doc_meta in documents:
+            terms = tokenize(text)
+            entries.append(
+                {"op": "add", "id": str(point_id), "terms": dict(Counter(terms)), "len": len(terms), "meta": doc_meta}
+            )
+        if not entries:
+            return
+        with self.lock, self._file_lock():
+            self._sync()
+            if not self.exists:
+                # Tiến trình khác vừa xóa chỉ mục: sẽ được dựng lại từ collection
+                return
+            for entry in entries:
+                self._add_doc(entry["id"], entry["terms"], entry["len"], entry["meta"])
+            self._append_delta(entries)
+            self._maybe_compact()
+
+    def remove(self, point_ids: Iterable = None, predicate: Callable[[dict], bool] = None) -> int:
+        """
+        Xóa chunk khỏi chỉ mục theo danh sách point ID hoặc theo điều kiện trên payload rút gọn
+
+        Returns:
+            Số chunk đã xóa
+        """
+        with self.lock, self._file_lock():
+            self._sync()
+            if point_ids is not None:
+                ids = [str(point_id) for point_id in point_ids if str(point_id) in self._id_to_doc]
+            else:
+                ids = [
+                    point_id
+                    for point_id, doc in self._id_to_doc.items()
+                    if predicate is None or predicate(self._doc_meta[doc])
+                ]
+            if ids:
+                self._remove_docs(ids)
+                self._append_delta([{"op": "delete", "ids": ids}])
+                self._maybe_compact()
+            return len(ids)
+
+    def build(self, documents: Iterable[Tuple[str, str, Dict]]):
+        """
+        Dựng lại toàn bộ chỉ mục từ các bộ (point_id, text, payload rút gọn)
+
+        Chỉ giữ khóa file khi ghi phần gốc (không giữ trong lúc duyệt collection) để tiến trình khác
+        vẫn tìm kiếm/cập nhật được; exists=False trong lúc dựng.
+        """
+        with self.lock:
+            self._release()
+            self._reset()
+            for point_id, text, doc_meta in documents:
+                terms = tokenize(text)
+                self._add_doc(str(point_id), dict(Counter(terms)), len(terms), doc_meta)
+            self.compact()
+            print(f"Đã dựng chỉ mục {self.index_dir} với {self._alive_count} chunk")
+
+    def drop(self):
+        """Xóa chỉ mục khỏi bộ nhớ và đĩa (sẽ được dựng lại từ collection khi cần)"""
+        with self.lock, self._file_lock():
+            self._release()
+            self._reset()
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+
+    def _release(self):
+        """Bỏ tham chiếu tới các file memory-map trước khi thay thế/xóa thư mục"""
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_tf = np.zeros(0, dtype=np.uint16)
+
+    def _maybe_compact(self):
+        if self._pending_changes >= self.compact_threshold:
+            self._write_base()
+
+    def compact(self):
+        """Gộp phần gốc và các thay đổi thành phần gốc mới, bỏ các doc đã xóa"""
+        with self.lock, self._file_lock():
+            self._write_base()
+
+    def _write_base(self):
+        """Ghi trạng thái trong bộ nhớ thành phần gốc mới với generation kế tiếp (gọi khi giữ khóa file)"""
+        with self.lock:
+            n_docs = len(self._doc_ids)
+            alive = self._alive[:n_docs]
+            remap = np.cumsum(alive, dtype=np.int64) - 1
+
+            terms = {}
+            doc_chunks = []
+            tf_chunks = []
+            offset = 0
+            for term in set(self._terms) | set(self._delta):
+                docs, tfs = self._postings(term)
+                keep = alive[docs]
+                if not keep.any():
+                    continue
+                docs = remap[docs[keep]].astype(np.int32)
+                terms[term] = [offset, len(docs)]
+                doc_chunks.append(docs)
+                tf_chunks.append(tfs[keep].astype(np.uint16))
+                offset += len(docs)
+
+            live_docs = np.flatnonzero(alive)
+            docs_json = [[self._doc_ids[doc], self._doc_meta[doc]] for doc in live_docs]
+            doc_len = self._doc_len[live_docs].astype(np.uint32)
+
+            tmp_dir = self.index_dir + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            np.save(
+                self._path("postings_docs.npy", tmp_dir),
+                np.concatenate(doc_chunks) if doc_chunks else np.zeros(0, dtype=np.int32),
+            )
+            np.save(
+                self._path("postings_tf.npy", tmp_dir),
+                np.concatenate(tf_chunks) if tf_chunks else np.zeros(0, dtype=np.uint16),
+            )
+            np.save(self._path("doc_len.npy", tmp_dir), doc_len)
+            generation = max(self._read_generation() or 0, self._generation or 0) + 1
+            with open(self._path("generation", tmp_dir), "w", encoding="utf-8") as f:
+                f.write(str(generation))
+            with open(self._path("docs.json", tmp_dir), "w", encoding="utf-8") as f:
+                json.dump(docs_json, f, ensure_ascii=False)
+            # meta.json ghi sau cùng: thư mục chỉ được coi là hợp lệ khi có file này
+            with open(self._path("meta.json", tmp_dir), "w", encoding="utf-8") as f:
+                json.dump({"format": INDEX_FORMAT_VERSION, "terms": terms}, f, ensure_ascii=False)
+
+            self._release()
+            old_dir = self.index_dir + ".old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(self.index_dir):
+                os.replace(self.index_dir, old_dir)
+            os.replace(tmp_dir, self.index_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+            self._reset()
+            self._load()
+
+    # --------------------------------------------------------
+    # Tìm kiếm
+    # --------------------------------------------------------
+    def _postings(self, term):
+        """Danh sách (doc, tf) của một term, gồm phần gốc (memory-map) và phần thay đổi"""
+        base = self._terms.get(term)
+        delta = self._delta.get(term)
+        if base is not None:
+            offset, df = base
+            docs = self._post_docs[offset : offset + df]
+            tfs = self._post_tf[offset : offset + df]
+            if delta is None:
+                return docs, tfs
+            return (
+                np.concatenate([docs, np.asarray(delta[0], dtype=np.int32)]),
+                np.concatenate([tfs, np.asarray(delta[1], dtype=np.uint16)]),
+            )
+        if delta is not None:
+            return np.asarray(delta[0], dtype=np.int32), np.asarray(delta[1], dtype=np.uint16)
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+
+    def search(self, query: str, limit: int = 5, allowed: Callable[[dict], bool] = None) -> List[Tuple[str, float]]:
+        """
+        Tìm các chunk khớp từ khóa nhất theo BM25
+
+        Args:
+            query: Câu truy vấn
+            limit: Số kết quả tối đa
+            allowed: Điều kiện trên payload rút gọn (lọc theo nguồn, file_id, tenant)
+
+        Returns:
+            Danh sách (point_id, điểm BM25) giảm dần theo điểm
+        """
+        with self.lock:
+            if self._alive_count == 0:
+                return []
+            n_docs = len(self._doc_ids)
+            alive = self._alive[:n_docs]
+            doc_len = self._doc_len[:n_docs]
+            avg_len = max(self._total_len / self._alive_count, 1.0)
+            scores = np.zeros(n_docs, dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                docs, tfs = self._postings(term)
+                if len(docs) == 0:
+                    continue
+                df = int(alive[docs].sum())
+                if df == 0:
+                    continue
+                idf = math.log(1.0 + (self._alive_count - df + 0.5) / (df + 0.5))
+                tfs = tfs.astype(np.float32)
+                norm = self.k1 * (1.0 - self.b + self.b * doc_len[docs] / avg_len)
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+            scores[~alive] = 0.0
+            candidates = np.flatnonzero(scores)
+            if len(candidates) == 0:
+                return []
+            if allowed is None and len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+            hits = []
+            for doc in candidates:
+                if allowed is not None and not allowed(self._doc_meta[doc]):
+                    continue
+                hits.append((self._doc_ids[doc], float(scores[doc])))
+                if len(hits) >= limit:
+                    break
+            return hits
+
+    def get_stats(self) -> dict:
+        """Số chunk, số term và số thay đổi chưa gộp"""
+        with self.lock:
+            return {
+                "documents": self._alive_count,
+                "terms": len(set(self._terms) | set(self._delta)),
+                "pending_changes": self._pending_changes,
+            }
+
+
+class BM25Registry:
+    """Các chỉ mục BM25 theo collection, dùng chung trong tiến trình (kể cả các view của VectorStore)"""
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or os.getenv(
+            "BM25_INDEX_DIR", os.path.join(os.getenv("UPLOAD_DIR", "backend/data"), "bm25")
+        )
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def get(self, collection_name: str) -> BM25Index:
+        """Chỉ mục của collection (có thể chưa được dựng: index.exists=False)"""
+        with self._lock:
+            index = self._indexes.get(collection_name)
+            if index is None:
+                index = BM25Index(os.path.join(self.base_dir, collection_name))
+                self._indexes[collection_name] = index
+            return index
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            indexes = dict(self._indexes)
+        return {name: index.get_stats() for name, index in indexes.items() if index.exists}
@@ -0,0 +1,122 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Cấu hình logging
+logging.basicConfig(format="[Chunk Cache] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[Chunk Cache] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkCache:
+    """
+    Cache LRU trong bộ nhớ cho payload của chunk, khóa theo (collection, point ID)
+
+    Dùng cho truy xuất hai pha: vector search chỉ trả về ID + score (with_payload=False),
+    text/metadata của top-N được lấy từ cache, phần thiếu được retrieve một lần từ Qdrant.
+    Cache được làm nóng khi index và bị vô hiệu hóa khi xóa point.
+    """
+
+    def __init__(self, max_entries: int = None):
+        """Khởi tạo cache rỗng với số phần tử tối đa (CHUNK_CACHE_MAX_ENTRIES)"""
+        self.capacity = int(max_entries or os.getenv("CHUNK_CACHE_MAX_ENTRIES", "20000"))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (collection, point_id) -> payload
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, collection_name: str, point_ids: Iterable) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Lấy payload của nhiều point
+
+        Returns:
+            (dict point_id -> payload cho các ID có trong cache, danh sách ID còn thiếu)
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for point_id in point_ids:
+                point_id = str(point_id)
+                key = (collection_name, point_id)
+                payload = self._entries.get(key)
+                if payload is None:
+                    missing.append(point_id)
+                    continue
+                self._entries.move_to_end(key)
+                found[point_id] = payload
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, collection_name: str, payloads: Dict[str, dict]):
+        """Lưu payload của nhiều point, loại bỏ phần tử ít dùng nhất khi vượt capacity"""
+        with self._lock:
+            for point_id, payload in payloads.items():
+                if payload is None:
+                    continue
+                key = (collection_name, str(point_id))
+                self._entries[key] = payload
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(
+        self,
+        collection_name: str,
+        point_ids: Iterable = None,
+        predicate: Callable[[dict], bool] = None,
+    ) -> int:
+        """
+        Xóa các phần tử của một collection khỏi cache
+
+        Args:
+            collection_name: Tên collection
+            point_ids: Chỉ xóa các ID này
+            predicate: Chỉ xóa các payload thỏa điều kiện (ví dụ cùng file_id)
+            (không truyền cả hai: xóa toàn bộ phần tử của collection)
+
+        Returns:
+            Số phần tử đã xóa
+        """
+        with self._lock:
+            if point_ids is not None:
+                keys = [(collection_name, str(point_id)) for point_id in point_ids]
+                keys = [key for key in keys if key in self._entries]
+            else:
+                keys = [
+                    key
+                    for key, payload in self._entries.items()
+                    if key[0] == collection_name and (predicate is None or predicate(payload))
+                ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """Xóa toàn bộ nội dung cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Trả về số liệu hit/miss của cache"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+        }
@@ -0,0 +1,157 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Các cờ đặc trưng do DocumentProcessor._enhance_chunk_metadata gắn vào metadata.
+# Thứ tự là vị trí bit trong feature_flags: chỉ được thêm vào cuối, không đổi thứ tự
+FEATURE_FLAGS = (
+    "chứa_định_nghĩa",
+    "chứa_cú_pháp",
+    "chứa_mẫu_code",
+    "chứa_ví_dụ",
+    "chứa_so_sánh",
+    "chứa_lỗi",
+    "chứa_cú_pháp_select",
+    "chứa_cú_pháp_join",
+    "chứa_cú_pháp_ddl",
+    "chứa_cú_pháp_dml",
+    "chứa_bảng",
+    "chứa_hình_ảnh",
+)
+FLAG_BITS = {name: 1 << i for i, name in enumerate(FEATURE_FLAGS)}
+
+# Mã số nhỏ cho chunk_type và category (0 = không xác định / danh mục khác).
+# Chuỗi gốc vẫn giữ trong metadata để hiển thị và lọc theo metadata.category
+CHUNK_TYPES = ("unknown", "text", "heading", "table", "list", "code")
+CATEGORIES = (
+    "other",
+    "general",
+    "sql",
+    "nosql",
+    "database_design",
+    "database_administration",
+    "data_warehouse",
+)
+
+FEATURE_FIELD = "feature_flags"
+CHUNK_TYPE_FIELD = "chunk_type_id"
+CATEGORY_FIELD = "category_id"
+
+# Điểm cộng theo loại truy vấn: (cờ cần có, điểm cộng)
+QUERY_TYPE_BOOSTS = {
+    "definition": ("chứa_định_nghĩa", 0.2),
+    "syntax": ("chứa_cú_pháp", 0.25),
+    "example": ("chứa_ví_dụ", 0.15),
+    "comparison": ("chứa_so_sánh", 0.15),
+    "troubleshooting": ("chứa_lỗi", 0.2),
+}
+# Điểm cộng thêm cho truy vấn cú pháp khi chunk chứa đúng loại câu lệnh SQL được hỏi
+SQL_SYNTAX_BOOST = 0.1
+
+
+def encode_flags(metadata: Dict) -> int:
+    """Gộp các cờ boolean trong metadata thành một số nguyên bitmask"""
+    mask = 0
+    for name, bit in FLAG_BITS.items():
+        if metadata.get(name):
+            mask |= bit
+    return mask
+
+
+def decode_flags(mask: int) -> Dict[str, bool]:
+    """Khôi phục các cờ boolean (chỉ các cờ được bật) từ bitmask"""
+    return {name: True for name, bit in FLAG_BITS.items() if mask & bit}
+
+
+def _code(value, table: Tuple[str, ...]) -> int:
+    try:
+        return table.index(value)
+    except ValueError:
+        return 0
+
+
+def compact_metadata(metadata: Dict) -> Tuple[Dict, Dict]:
+    """
+    Tách các cờ boolean khỏi metadata và tạo các trường payload gọn
+
+    Returns:
+        (metadata không còn các cờ boolean,
+         {feature_flags, chunk_type_id, category_id} để ghi ở cấp trên của payload)
+    """
+    fields = {
+        FEATURE_FIELD: encode_flags(metadata),
+        CHUNK_TYPE_FIELD: _code(metadata.get("chunk_type"), CHUNK_TYPES),
+        CATEGORY_FIELD: _code(metadata.get("category"), CATEGORIES),
+    }
+    stripped = {key: value for key, value in metadata.items() if key not in FLAG_BITS}
+    return stripped, fields
+
+
+def compact_payload(payload: Dict) -> Dict:
+    """Chuyển payload của point cũ (cờ boolean trong metadata) sang dạng gọn; payload đã gọn giữ nguyên"""
+    if payload is None or FEATURE_FIELD in payload:
+        return payload
+    metadata, fields = compact_metadata(payload.get("metadata") or {})
+    return {**payload, "metadata": metadata, **fields}
+
+
+def feature_masks(results: Iterable[Dict]) -> np.ndarray:
+    """
+    Bitmask của từng kết quả: dùng feature_flags nếu có, nếu không (point cũ chưa backfill)
+    thì tính từ các cờ boolean trong metadata
+    """
+    masks = []
+    for result in results:
+        mask = result.get(FEATURE_FIELD)
+        if mask is None:
+            mask = encode_flags(result.get("metadata") or {})
+        masks.append(mask)
+    return np.asarray(masks, dtype=np.int64)
+
+
+def _sql_syntax_bits(query: str) -> int:
+    """Các bit cú pháp SQL cụ thể tương ứng với câu lệnh xuất hiện trong truy vấn"""
+    bits = 0
+    if "SELECT" in query:
+        bits |= FLAG_BITS["chứa_cú_pháp_select"]
+    if "JOIN" in query:
+        bits |= FLAG_BITS["chứa_cú_pháp_join"]
+    if "CREATE" in query or "ALTER" in query:
+        bits |= FLAG_BITS["chứa_cú_pháp_ddl"]
+    return bits
+
+
+def compute_boosts(query_type: str, query: str, masks: np.ndarray) -> np.ndarray:
+    """
+    Điểm cộng theo metadata cho tất cả kết quả cùng lúc (vector hóa bằng NumPy)
+
+    Args:
+        query_type: Loại truy vấn từ SearchManager._detect_query_type
+        query: Câu truy vấn gốc (để nhận biết SELECT/JOIN/CREATE/ALTER)
+        masks: Mảng bitmask của các kết quả (feature_masks)
+
+    Returns:
+        Mảng điểm cộng cùng độ dài với masks
+    """
+    boosts = np.zeros(len(masks), dtype=np.float64)
+    if query_type not in QUERY_TYPE_BOOSTS:
+        return boosts
+
+    flag, boost = QUERY_TYPE_BOOSTS[query_type]
+    matched = (masks & FLAG_BITS[flag]) != 0
+    boosts[matched] = boost
+
+    if query_type == "syntax":
+        sql_bits = _sql_syntax_bits(query)
+        if sql_bits:
+            boosts[matched & ((masks & sql_bits) != 0)] += SQL_SYNTAX_BOOST
+    return boosts
+
+
+def apply_boosts(query_type: str, query: str, results: List[Dict], scores) -> None:
+    """Ghi rerank_score và final_score (điểm reranker + điểm cộng metadata) vào từng kết quả"""
+    base_scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+    final_scores = base_scores + compute_boosts(query_type, query, feature_masks(results))
+    for result, base_score, final_score in zip(results, base_scores.tolist(), final_scores.tolist()):
+        result["rerank_score"] = base_score
+        result["final_score"] = final_score
@@ -1,6 +1,9 @@
-from sentence_transformers import SentenceTransformer
 import logging
 import asyncio
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 # Cấu hình logging
 logging.basicConfig(
@@ -16,45 +19,371 @@ logger = logging.getLogger(__name__)
 import os
 from dotenv import load_dotenv
 
+from backend.embedding_cache import EmbeddingCache
+from backend.onnx_backend import get_backend, load_sentence_transformer
+
 # Load biến môi trường từ .env
 load_dotenv()
 
+# Model riêng của mỗi tiến trình worker trong embedding pool
+_worker_model = None
+
+
+def _init_pool_worker(model_name, backend, num_threads):
+    """Khởi tạo worker: cố định số thread torch rồi tải model một lần"""
+    global _worker_model
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    _worker_model = load_sentence_transformer(model_name, backend)
+
+
+def _encode_in_worker(args):
+    """Encode một shard văn bản trong tiến trình worker"""
+    texts, batch_size = args
+    return _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+
 
 class EmbeddingModel:
     """Lớp quản lý các mô hình embedding với hỗ trợ async"""
 
-    def __init__(self, model_name=None):
+    def __init__(self, model_name=None, use_cache=None, backend=None):
         """Khởi tạo mô hình embedding"""
-        self.model = SentenceTransformer(
-            model_name
-            or os.getenv("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-base")
+        self.model_name = model_name or os.getenv(
+            "EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-base"
         )
+        # Backend suy luận: torch (mặc định) hoặc onnx (int8, dành cho node chỉ có CPU)
+        self.backend = backend or get_backend("EMBEDDING_BACKEND")
+        self.model = load_sentence_transformer(self.model_name, self.backend)
         self.dimension = self.model.get_sentence_embedding_dimension()
 
+        # Cache embedding trên đĩa để không encode lại các chunk đã gặp
+        if use_cache is None:
+            use_cache = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.cache = None
+        if use_cache:
+            try:
+                # Vector int8 khác một chút so với fp32 nên tách khóa cache theo backend
+                self.cache = EmbeddingCache(f"{self.model_name}@{self.backend}", self.dimension)
+                atexit.register(self.cache.flush)
+            except Exception as e:
+                print(f"Không thể khởi tạo embedding cache, bỏ qua cache: {str(e)}")
+                self.cache = None
+
+        # Cấu hình micro-batching cho truy vấn đồng thời
+        self.query_batch_window = float(os.getenv("EMBEDDING_QUERY_BATCH_WINDOW_MS", "5")) / 1000
+        self.query_max_batch_size = int(os.getenv("EMBEDDING_QUERY_MAX_BATCH_SIZE", "32"))
+        self._query_queue = None
+        self._query_batcher = None
+        self._query_loop = None
+
+        # Cấu hình encode theo bucket độ dài cho các lô chunk lớn
+        self.bucketed = os.getenv("EMBEDDING_BUCKETED", "true").lower() == "true"
+        self.token_budget = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "16384"))
+        self.max_bucket_size = int(os.getenv("EMBEDDING_MAX_BUCKET_SIZE", "256"))
+
+        # Cấu hình embedding pool đa tiến trình cho các job ingest lớn (0 = tắt)
+        pool_workers = os.getenv("EMBEDDING_POOL_WORKERS", "0").lower()
+        cpu_count = os.cpu_count() or 1
+        self.pool_workers = cpu_count if pool_workers == "auto" else int(pool_workers)
+        self.pool_threads_per_worker = int(
+            os.getenv(
+                "EMBEDDING_POOL_THREADS_PER_WORKER",
+                str(max(1, cpu_count // max(self.pool_workers, 1))),
+            )
+        )
+        self.pool_min_texts = int(os.getenv("EMBEDDING_POOL_MIN_TEXTS", "256"))
+        self.pool_shard_size = int(os.getenv("EMBEDDING_POOL_SHARD_SIZE", "64"))
+        self._pool = None
+
+    def start_pool(self):
+        """Khởi động embedding pool (mỗi worker tải một bản model riêng)"""
+        if self._pool is not None:
+            return self._pool
+        print(
+            f"Khởi động embedding pool: {self.pool_workers} worker x {self.pool_threads_per_worker} thread"
+        )
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.pool_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pool_worker,
+            initargs=(self.model_name, self.backend, self.pool_threads_per_worker),
+        )
+        atexit.register(self.stop_pool)
+        return self._pool
+
+    def stop_pool(self):
+        """Dừng embedding pool và giải phóng các tiến trình worker"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def iter_encode_multi_process(self, texts, batch_size=32):
+        """
+        Encode văn bản trên embedding pool, trả kết quả dần theo từng shard
+
+        Các shard liên tiếp được phân cho các worker song song; kết quả được
+        yield đúng thứ tự gốc ngay khi shard đầu tiên còn chờ hoàn thành.
+        """
+        texts = list(texts)
+        pool = self.start_pool()
+        shards = [
+            (texts[i:i + self.pool_shard_size], batch_size)
+            for i in range(0, len(texts), self.pool_shard_size)
+        ]
+        for vectors in pool.map(_encode_in_worker, shards):
+            yield np.asarray(vectors, dtype=np.float32)
+
+    def encode_multi_process(self, texts, batch_size=32, show_progress=True):
+        """Encode văn bản trên embedding pool, fallback encode trong tiến trình nếu ít văn bản"""
+        texts = list(texts)
+        if self.pool_workers <= 1 or len(texts) < self.pool_min_texts:
+            return self.model.encode(
+                texts, batch_size=batch_size, show_progress_bar=show_progress
+            )
+
+        parts = []
+        done = 0
+        for vectors in self.iter_encode_multi_process(texts, batch_size=batch_size):
+            parts.append(vectors)
+            done += len(vectors)
+            if show_progress:
+                print(f"Embedding pool: {done}/{len(texts)} văn bản")
+        return np.concatenate(parts, axis=0)
+
+    def _run_model(self, texts, batch_size=32, show_progress=True, bucketed=False):
+        """Chạy model trên văn bản, dùng pool đa tiến trình hoặc bucket độ dài nếu phù hợp"""
+        if (
+            self.pool_workers > 1
+            and not isinstance(texts, str)
+            and len(texts) >= self.pool_min_texts
+        ):
+            return self.encode_multi_process(
+                texts, batch_size=batch_size, show_progress=show_progress
+            )
+        if bucketed and not isinstance(texts, str) and len(texts) > 1:
+            return self.encode_bucketed(texts, show_progress=show_progress)
+        return self.model.encode(
+            texts, batch_size=batch_size, show_progress_bar=show_progress
+        )
+
+    def get_token_lengths(self, texts):
+        """Số token (đã cắt theo max_seq_length) của từng văn bản"""
+        encoded = self.model.tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def plan_buckets(self, lengths):
+        """
+        Chia các văn bản thành bucket có độ dài token gần nhau
+
+        Văn bản được sắp xếp theo độ dài; mỗi bucket nhận thêm phần tử cho tới khi
+        (số phần tử x độ dài lớn nhất) vượt token_budget hoặc đạt max_bucket_size.
+        Văn bản ngắn vì vậy được encode theo batch lớn, văn bản dài theo batch nhỏ.
+
+        Returns:
+            Danh sách bucket, mỗi bucket là danh sách chỉ số gốc
+        """
+        order = np.argsort(np.asarray(lengths), kind="stable")
+        buckets = []
+        current = []
+        current_max = 0
+        for idx in order.tolist():
+            length = max(int(lengths[idx]), 1)
+            new_max = max(current_max, length)
+            if current and (
+                new_max * (len(current) + 1) > self.token_budget
+                or len(current) >= self.max_bucket_size
+            ):
+                buckets.append(current)
+                current = []
+                new_max = length
+            current.append(idx)
+            current_max = new_max
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def encode_bucketed(self, texts, show_progress=True):
+        """Encode theo bucket độ dài với batch size thích ứng, trả về theo thứ tự gốc"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        buckets = self.plan_buckets(self.get_token_lengths(texts))
+        output = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for bucket_idx, bucket in enumerate(buckets):
+            batch = [texts[i] for i in bucket]
+            output[bucket] = self.model.encode(
+                batch, batch_size=len(batch), show_progress_bar=False
+            )
+            if show_progress:
+                print(
+                    f"Bucket {bucket_idx + 1}/{len(buckets)}: {len(batch)} văn bản"
+                )
+        return output
+
+    def _encode_with_cache(self, texts, batch_size=32, show_progress=True, bucketed=False, flush=False):
+        """
+        Encode văn bản, chỉ chạy model cho những văn bản chưa có trong cache
+
+        flush=True (luồng index) đẩy cache xuống đĩa ngay sau batch; luồng truy vấn để cache tự flush định kỳ.
+        Thống kê cache chỉ được in khi show_progress.
+        """
+        if self.cache is None:
+            return self._run_model(
+                texts, batch_size=batch_size, show_progress=show_progress, bucketed=bucketed
+            )
+
+        single = isinstance(texts, str)
+        text_list = [texts] if single else list(texts)
+        if not text_list:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        vectors, missing = self.cache.lookup(text_list)
+        if missing:
+            missing_texts = [text_list[i] for i in missing]
+            encoded = self._run_model(
+                missing_texts,
+                batch_size=batch_size,
+                show_progress=show_progress and len(missing_texts) > 1,
+                bucketed=bucketed,
+            )
+            vectors[missing] = encoded
+            self.cache.store(missing_texts, encoded)
+            if flush:
+                self.cache.flush()
+
+        if show_progress and len(text_list) > 1:
+            print(
+                f"Cache: {len(text_list) - len(missing)}/{len(text_list)} văn bản đã có embedding, "
+                f"encode mới {len(missing)}"
+            )
+
+        return vectors[0] if single else vectors
+
     async def encode(self, texts, batch_size=32, show_progress=True):
         """Tạo vector embedding cho văn bản bất đồng bộ"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            None, 
-            lambda: self.model.encode(
-                texts, batch_size=batch_size, show_progress_bar=show_progress
+            None,
+            lambda: self._encode_with_cache(
+                texts, batch_size=batch_size, show_progress=show_progress
             )
         )
 
-    async def encode_batch(self, texts, batch_size=32, show_progress=True):
-        """Tạo vector embedding cho nhiều văn bản với batch processing bất đồng bộ"""
-        return await self.encode(texts, batch_size=batch_size, show_progress=show_progress)
+    async def iter_encode_batches(self, texts, batch_size=128):
+        """
+        Encode văn bản theo từng batch và trả dần kết quả (async generator)
+
+        Yields:
+            Tuple (vị trí bắt đầu của batch, mảng vector của batch)
+        """
+        loop = asyncio.get_event_loop()
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            vectors = await loop.run_in_executor(
+                None,
+                lambda: self._encode_with_cache(
+                    batch, show_progress=False, bucketed=self.bucketed, flush=True
+                )
+            )
+            yield start, vectors
+
+    async def encode_query(self, query):
+        """
+        Tạo vector embedding cho một câu truy vấn qua micro-batcher
+
+        Các truy vấn đến trong cùng một khoảng thời gian ngắn (query_batch_window)
+        được gom lại và encode trong một lần gọi model.encode duy nhất.
+        """
+        loop = asyncio.get_running_loop()
+        if self._query_loop is not loop or self._query_batcher is None or self._query_batcher.done():
+            self._query_loop = loop
+            self._query_queue = asyncio.Queue()
+            self._query_batcher = loop.create_task(self._run_query_batcher(self._query_queue))
+
+        future = loop.create_future()
+        await self._query_queue.put((query, future))
+        return await future
+
+    async def _run_query_batcher(self, queue):
+        """Vòng lặp gom các truy vấn đang chờ thành batch và encode cùng lúc"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.query_batch_window
+            while len(batch) < self.query_max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(
+                    None,
+                    lambda: self._encode_with_cache(texts, show_progress=False),
+                )
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            if len(batch) > 1:
+                print(f"Micro-batch: đã encode {len(batch)} truy vấn trong một lần gọi model")
+
+    async def encode_batch(self, texts, batch_size=32, show_progress=True, bucketed=None, flush=True):
+        """
+        Tạo vector embedding cho nhiều văn bản với batch processing bất đồng bộ
+
+        flush=False cho các batch truy vấn (không cần đẩy cache xuống đĩa sau mỗi lần tìm kiếm)
+        """
+        if bucketed is None:
+            bucketed = self.bucketed
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            lambda: self._encode_with_cache(
+                texts, batch_size=batch_size, show_progress=show_progress, bucketed=bucketed, flush=flush
+            )
+        )
 
     def encode_sync(self, texts, batch_size=32, show_progress=True):
         """Tạo vector embedding cho văn bản đồng bộ (để tương thích ngược)"""
-        return self.model.encode(
-            texts, batch_size=batch_size, show_progress_bar=show_progress
+        return self._encode_with_cache(
+            texts, batch_size=batch_size, show_progress=show_progress
         )
 
-    def encode_batch_sync(self, texts, batch_size=32, show_progress=True):
-        """Tạo vector embedding cho nhiều văn bản với batch processing đồng bộ"""
-        return self.encode_sync(texts, batch_size=batch_size, show_progress=show_progress)
+    def encode_batch_sync(self, texts, batch_size=32, show_progress=True, bucketed=None, flush=True):
+        """Tạo vector embedding cho nhiều văn bản với batch processing đồng bộ (flush như encode_batch)"""
+        if bucketed is None:
+            bucketed = self.bucketed
+        return self._encode_with_cache(
+            texts, batch_size=batch_size, show_progress=show_progress, bucketed=bucketed, flush=flush
+        )
 
     def get_dimension(self):
         """Trả về kích thước vector của mô hình"""
         return self.dimension
+
+    def get_cache_stats(self):
+        """Trả về thống kê hit/miss của embedding cache"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
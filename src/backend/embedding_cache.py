@@ -0,0 +1,243 @@
+import logging
+import os
+import json
+import atexit
+import hashlib
+import threading
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from backend.file_lock import file_lock
+
+# Cấu hình logging
+logging.basicConfig(format="[Embedding Cache] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[Embedding Cache] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+# Kích thước digest của khóa (bytes) - 16 bytes là đủ để tránh va chạm cho kho nhỏ
+KEY_SIZE = 16
+
+
+class EmbeddingCache:
+    """
+    Cache embedding trên đĩa, định danh theo nội dung (content-addressed)
+
+    Dữ liệu gồm 3 file memory-mapped cùng số slot (capacity):
+    - vectors.f32: ma trận float32 (capacity, dimension) chứa vector
+    - keys.bin: ma trận uint8 (capacity, KEY_SIZE) chứa digest blake2b(model_name, text) của từng slot
+      (toàn byte 0 = slot trống)
+    - ticks.u64: "thời điểm" truy cập gần nhất của slot, dùng để loại bỏ theo LRU
+
+    Nhiều process (uvicorn worker) có thể dùng chung một thư mục: mọi thao tác đọc/ghi giữ khóa file
+    cache.lock, và slot tìm được qua chỉ mục trong bộ nhớ luôn được đối chiếu lại với khóa trên đĩa
+    (process khác có thể đã loại bỏ và ghi đè slot đó).
+
+    store chỉ ghi vào memmap; dữ liệu được đẩy xuống đĩa khi gọi flush (sau mỗi batch index),
+    định kỳ mỗi EMBEDDING_CACHE_FLUSH_INTERVAL giây khi có ghi mới, và khi tiến trình thoát.
+    """
+
+    def __init__(self, model_name: str, dimension: int, cache_dir: str = None, max_entries: int = None):
+        """Khởi tạo cache và nạp chỉ mục khóa từ đĩa (nếu có)"""
+        self.model_name = model_name
+        self.dimension = int(dimension)
+        self.cache_dir = cache_dir or os.getenv(
+            "EMBEDDING_CACHE_DIR",
+            os.path.join(os.getenv("UPLOAD_DIR", "backend/data"), ".cache", "embeddings"),
+        )
+        self.capacity = int(max_entries or os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+        self.flush_interval = float(os.getenv("EMBEDDING_CACHE_FLUSH_INTERVAL", "30"))
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._slots = {}  # digest -> slot
+        self._tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with file_lock(self._path("cache.lock")):
+            self._open()
+        atexit.register(self.flush)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _open(self):
+        """Mở (hoặc tạo mới) các file memmap, reset nếu cấu hình đã thay đổi"""
+        meta_path = self._path("meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception as e:
+                print(f"Không đọc được meta.json, tạo lại cache: {str(e)}")
+
+        files_exist = all(
+            os.path.exists(self._path(name)) for name in ("vectors.f32", "keys.bin", "ticks.u64")
+        )
+        reusable = (
+            files_exist
+            and meta.get("dimension") == self.dimension
+            and meta.get("capacity") == self.capacity
+        )
+        mode = "r+" if reusable else "w+"
+        if not reusable and files_exist:
+            logger.warning(
+                f"Cấu hình cache thay đổi (dimension {meta.get('dimension')} -> {self.dimension}, "
+                f"capacity {meta.get('capacity')} -> {self.capacity}), xóa toàn bộ cache tại {self.cache_dir}"
+            )
+
+        self._vectors = np.memmap(
+            self._path("vectors.f32"), dtype=np.float32, mode=mode, shape=(self.capacity, self.dimension)
+        )
+        # uint8 thay vì S16: numpy cắt các byte NUL ở cuối giá trị S16, làm hỏng digest kết thúc bằng \x00
+        self._keys = np.memmap(
+            self._path("keys.bin"), dtype=np.uint8, mode=mode, shape=(self.capacity, KEY_SIZE)
+        )
+        self._ticks = np.memmap(
+            self._path("ticks.u64"), dtype=np.uint64, mode=mode, shape=(self.capacity,)
+        )
+
+        if reusable:
+            used = np.flatnonzero(self._keys.any(axis=1))
+            self._slots = {self._keys[i].tobytes(): int(i) for i in used}
+            self._tick = int(self._ticks.max()) if len(used) else 0
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dimension": self.dimension, "capacity": self.capacity}, f)
+
+        print(
+            f"Embedding cache sẵn sàng: {len(self._slots)}/{self.capacity} vector tại {self.cache_dir}"
+        )
+
+    def make_key(self, text: str) -> bytes:
+        """Tạo khóa từ hash của (model_name, text)"""
+        h = hashlib.blake2b(digest_size=KEY_SIZE)
+        h.update(self.model_name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        return h.digest()
+
+    def _find(self, key: bytes):
+        """Slot đang chứa key hoặc None; bỏ mục chỉ mục đã cũ nếu slot đã bị process khác ghi đè (gọi khi giữ lock)"""
+        slot = self._slots.get(key)
+        if slot is not None and self._keys[slot].tobytes() != key:
+            del self._slots[key]
+            slot = None
+        return slot
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Tra cứu vector cho danh sách văn bản
+
+        Returns:
+            Tuple (vectors, missing) - vectors có shape (len(texts), dimension),
+            các dòng thuộc missing chưa có giá trị và cần được encode
+        """
+        keys = [self.make_key(t) for t in texts]
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing = []
+        with self._lock, file_lock(self._path("cache.lock")):
+            for i, key in enumerate(keys):
+                slot = self._find(key)
+                if slot is None:
+                    missing.append(i)
+                    continue
+                vectors[i] = self._vectors[slot]
+                self._tick += 1
+                self._ticks[slot] = self._tick
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return vectors, missing
+
+    def store(self, texts: List[str], vectors: np.ndarray):
+        """Lưu vector của các văn bản vào cache, loại bỏ slot cũ nhất nếu đầy"""
+        if len(texts) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimension)
+        with self._lock, file_lock(self._path("cache.lock")):
+            # Bỏ trùng lặp trong cùng một lần ghi
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(text)
+                if self._find(key) is None:
+                    pending[key] = vector
+            if not pending:
+                return
+
+            free_slots = self._take_slots(len(pending))
+            for (key, vector), slot in zip(pending.items(), free_slots):
+                # Ghi vector trước rồi mới ghi khóa để slot không bao giờ trỏ tới dữ liệu dở dang
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._tick += 1
+                self._ticks[slot] = self._tick
+                self._slots[key] = slot
+            self._dirty = True
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _take_slots(self, n: int) -> List[int]:
+        """Lấy n slot để ghi: ưu tiên slot trống, sau đó loại bỏ các slot ít dùng nhất"""
+        n = min(n, self.capacity)
+        occupied = self._keys.any(axis=1)
+        free = np.flatnonzero(~occupied)[:n].tolist()
+        need = n - len(free)
+        if need > 0:
+            used = np.flatnonzero(occupied)
+            oldest = used[np.argpartition(self._ticks[used], need - 1)[:need]]
+            for slot in oldest.tolist():
+                # Slot có thể do process khác ghi nên chưa có trong chỉ mục của process này
+                self._slots.pop(self._keys[slot].tobytes(), None)
+                self._keys[slot] = 0
+            self.evictions += need
+            free.extend(oldest.tolist())
+        return free
+
+    def flush(self):
+        """Đẩy dữ liệu memmap xuống đĩa (bỏ qua nếu chưa có ghi mới từ lần flush trước)"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._dirty:
+                return
+            self._vectors.flush()
+            self._keys.flush()
+            self._ticks.flush()
+            self._dirty = False
+
+    def clear(self):
+        """Xóa toàn bộ nội dung cache"""
+        with self._lock, file_lock(self._path("cache.lock")):
+            self._keys[:] = 0
+            self._ticks[:] = 0
+            self._slots = {}
+            self._dirty = True
+            self._tick = 0
+        self.flush()
+
+    def get_stats(self) -> dict:
+        """Trả về số liệu hit/miss của cache"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+            "cache_dir": self.cache_dir,
+        }
@@ -0,0 +1,30 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ còn khóa giữa các thread trong process
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """
+    Khóa giữa các process (flock) trên file path, dùng khi nhiều uvicorn worker cùng ghi một thư mục dữ liệu
+
+    Mỗi lần gọi mở một file descriptor riêng nên các thread trong cùng process cũng loại trừ nhau.
+
+    Args:
+        path: Đường dẫn file khóa (được tạo nếu chưa có)
+        shared: True để lấy khóa đọc (nhiều process cùng giữ được), False để lấy khóa ghi độc quyền
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
@@ -0,0 +1,1034 @@
+import logging
+import os
+import json
+import shutil
+import atexit
+import asyncio
+import functools
+import threading
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+from qdrant_client import models
+
+from backend.file_lock import file_lock
+from backend.vector_store import VectorStore
+
+# Cấu hình logging
+logging.basicConfig(format="[Local Vector Store] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[Local Vector Store] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+SUPPORTED_DTYPES = ("float32", "float16")
+# Số dòng tính điểm mỗi lần khi quét toàn bộ (giới hạn bộ nhớ tạm khi vector là float16)
+SCORE_BLOCK_SIZE = 65536
+# Các trường lọc thường dùng, luôn giữ dạng cột numpy (cùng các trường keyword có payload index)
+COLUMNAR_FIELDS = ("file_id", "metadata.category", "user_id", "tenant_id")
+
+
+class LocalCollectionInfo(SimpleNamespace):
+    """Thông tin collection, có dict() giống CollectionInfo của Qdrant"""
+
+    def dict(self):
+        result = {}
+        for key, value in vars(self).items():
+            if isinstance(value, LocalCollectionInfo):
+                value = value.dict()
+            elif hasattr(value, "model_dump"):
+                value = value.model_dump()
+            elif isinstance(value, dict):
+                value = {k: v.model_dump() if hasattr(v, "model_dump") else v for k, v in value.items()}
+            result[key] = value
+        return result
+
+
+class _KeywordColumn:
+    """
+    Cột numpy của một trường keyword: mỗi dòng giữ mã int32 của giá trị (mã hóa từ điển), -1 = không có giá trị
+
+    Filter MatchValue/MatchAny/MatchExcept trên cột này là phép so sánh vector thay vì vòng lặp Python
+    theo từng dòng. Nếu có dòng chứa list/dict thì cột không mã hóa được (multi) và filter quay về cách cũ.
+    """
+
+    def __init__(self, capacity):
+        self.codes = np.full(capacity, -1, dtype=np.int32)
+        self.vocab = {}
+        self.multi = False
+
+    def set(self, row, value):
+        if isinstance(value, (list, dict)):
+            self.multi = True
+            return
+        self.codes[row] = -1 if value is None else self.vocab.setdefault(value, len(self.vocab))
+
+    def grow(self, capacity):
+        codes = np.full(capacity, -1, dtype=np.int32)
+        codes[: len(self.codes)] = self.codes
+        self.codes = codes
+
+    def mask(self, match, size):
+        """Mặt nạ cho điều kiện match, None nếu kiểu match không dùng được cột"""
+        codes = self.codes[:size]
+        if isinstance(match, models.MatchValue):
+            code = self.vocab.get(match.value)
+            return codes == code if code is not None else np.zeros(size, dtype=bool)
+        if isinstance(match, models.MatchAny):
+            return np.isin(codes, [self.vocab[v] for v in match.any if v in self.vocab])
+        if isinstance(match, models.MatchExcept):
+            excluded = [self.vocab[v] for v in getattr(match, "except_") if v in self.vocab]
+            return (codes >= 0) & ~np.isin(codes, excluded)
+        return None
+
+
+def _file_signature(path):
+    """(inode, mtime, kích thước) của file, None nếu chưa có: phát hiện file bị tiến trình khác ghi lại"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class _LocalCollection:
+    """
+    Một collection lưu trên đĩa
+
+    - meta.json: dim, dtype, capacity, payload_schema, uid (đổi khi tạo lại) và generation (tăng mỗi lần nén)
+    - vectors.<dtype>: ma trận memory-mapped (capacity, dim) chứa vector đã chuẩn hóa
+    - payloads.jsonl: log ghi nối tiếp {row, id, payload} / {row, deleted}, phát lại khi mở
+    - hnsw.bin: đồ thị HNSW (tùy chọn, dựng lại từ vectors nếu thiếu hoặc lệch)
+
+    Nhiều tiến trình (uvicorn worker) dùng chung thư mục: ghi, nén và tải giữ khóa file <path>.lock
+    (đọc giữ khóa chia sẻ). Trước mỗi thao tác, sync() tải lại nếu uid/generation trên đĩa đã đổi,
+    ngược lại mở lại vectors khi capacity tăng và chỉ phát lại phần log do tiến trình khác ghi thêm.
+    """
+
+    def __init__(self, path, dim=None, dtype="float32", use_hnsw=False):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        self._hnsw = None
+        self._hnsw_dirty = False
+        self._log = None
+        self.vectors = None
+        # Khóa riêng của collection: thao tác trên các collection khác nhau không chặn nhau
+        self.lock = threading.RLock()
+        self.closed = False
+
+        with self.file_lock():
+            meta = self._read_meta()
+            if meta is None:
+                os.makedirs(path, exist_ok=True)
+                self.dim = int(dim)
+                self.dtype = dtype
+                self.capacity = 1024
+                self.payload_schema = {}
+                self.uid = uuid.uuid4().hex
+                self.generation = 0
+                self._write_meta()
+                meta = self._read_meta()
+            self._reload(meta)
+
+            dead_rows = self.size - len(self.row_of)
+            if dead_rows > 1000 and dead_rows > len(self.row_of):
+                self._compact()
+
+    def close(self):
+        self.flush()
+        self._log.close()
+        self.closed = True
+
+    # ----- Lưu trữ -----
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def file_lock(self, shared=False):
+        """Khóa giữa các tiến trình; nằm ngoài thư mục collection để delete_collection xóa được cả thư mục"""
+        return file_lock(self.path + ".lock", shared=shared)
+
+    def _read_meta(self):
+        """Đọc meta.json, None nếu collection không còn trên đĩa"""
+        meta_path = self._file("meta.json")
+        signature = _file_signature(meta_path)
+        if signature is None:
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._meta_signature = signature
+        return meta
+
+    def _write_meta(self):
+        meta_path = self._file("meta.json")
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dim": self.dim,
+                    "dtype": self.dtype,
+                    "capacity": self.capacity,
+                    "payload_schema": self.payload_schema,
+                    "uid": self.uid,
+                    "generation": self.generation,
+                },
+                f,
+            )
+        os.replace(tmp_path, meta_path)
+        self._meta_signature = _file_signature(meta_path)
+
+    def _open_vectors(self):
+        vectors_path = self._file(f"vectors.{self.dtype}")
+        mode = "r+" if os.path.exists(vectors_path) else "w+"
+        self.vectors = np.memmap(
+            vectors_path, dtype=self.dtype, mode=mode, shape=(self.capacity, self.dim)
+        )
+
+    def _reload(self, meta):
+        """Dựng lại toàn bộ trạng thái từ đĩa (gọi khi giữ khóa file)"""
+        if self._log is not None:
+            self._log.close()
+        self.vectors = None
+        self.dim = meta["dim"]
+        self.dtype = meta["dtype"]
+        self.capacity = meta["capacity"]
+        self.payload_schema = meta.get("payload_schema", {})
+        # Collection tạo trước khi có uid/generation
+        self.uid = meta.get("uid")
+        self.generation = meta.get("generation", 0)
+
+        self.ids = []
+        self.payloads = []
+        self.row_of = {}
+        self.size = 0
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self._columns = {}
+        self._keyword_columns = {}
+        self._hnsw = None
+        self._log_offset = 0
+        self._open_vectors()
+        self._replay_log()
+        self._log = open(self._file("payloads.jsonl"), "ab")
+
+        if self.use_hnsw:
+            self._load_hnsw()
+
+    def sync(self):
+        """
+        Đồng bộ với thay đổi của tiến trình khác (gọi khi giữ khóa file)
+
+        Returns:
+            False nếu collection đã bị xóa trên đĩa
+        """
+        if _file_signature(self._file("meta.json")) != self._meta_signature:
+            meta = self._read_meta()
+            if meta is None:
+                return False
+            if (meta.get("uid"), meta.get("generation", 0)) != (self.uid, self.generation):
+                self._reload(meta)
+                return True
+            if meta["capacity"] != self.capacity:
+                self._resize(meta["capacity"])
+            self.payload_schema = meta.get("payload_schema", {})
+        self._replay_log()
+        return True
+
+    def _replay_log(self):
+        """Phát lại phần payloads.jsonl sau _log_offset (dòng của lần mở trước hoặc của tiến trình khác)"""
+        log_path = self._file("payloads.jsonl")
+        if not os.path.exists(log_path) or os.path.getsize(log_path) <= self._log_offset:
+            return
+        added, deleted = [], []
+        with open(log_path, "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Dòng cuối bị ghi dở do tắt đột ngột
+                    break
+                self._log_offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                row = entry["row"]
+                if entry.get("deleted"):
+                    self._set_row(row, None, None)
+                    deleted.append(row)
+                else:
+                    self._set_row(row, entry["id"], entry["payload"])
+                    added.append(row)
+        self._columns = {}
+        if self._hnsw is not None:
+            added = sorted(set(added) - set(deleted))
+            if added:
+                self._hnsw.add_items(np.asarray(self.vectors[added], dtype=np.float32), added)
+            for row in set(deleted):
+                try:
+                    self._hnsw.mark_deleted(row)
+                except RuntimeError:
+                    # Dòng được thêm rồi xóa trong cùng đoạn log: chưa có trong đồ thị
+                    pass
+            self._hnsw_dirty = True
+
+    def _set_row(self, row, point_id, payload):
+        """Đặt trạng thái một dòng (point_id None = đã xóa), cập nhật các cột keyword"""
+        while self.size <= row:
+            self.ids.append(None)
+            self.payloads.append(None)
+            self.size += 1
+        if self.ids[row] is not None:
+            self.row_of.pop(self.ids[row], None)
+        self.ids[row] = point_id
+        self.payloads[row] = payload
+        self.alive[row] = point_id is not None
+        if point_id is not None:
+            self.row_of[point_id] = row
+        for key, column in self._keyword_columns.items():
+            column.set(row, self._field(payload, key) if payload is not None else None)
+
+    def _append_log(self, entries):
+        """Ghi nối tiếp log (gọi khi giữ khóa file độc quyền, sau sync) và ghi nhận phần đã áp dụng"""
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        self._log.write(data)
+        self._log.flush()
+        self._log_offset += len(data)
+
+    def _resize(self, capacity):
+        """Mở lại vectors với capacity mới và mở rộng các mảng theo dòng"""
+        self.vectors = None
+        self.capacity = capacity
+        self._open_vectors()
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self.alive)] = self.alive
+        self.alive = alive
+        for column in self._keyword_columns.values():
+            column.grow(capacity)
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+
+    def _grow(self, needed):
+        """Tăng capacity (gấp đôi) và chép vector sang file mới"""
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        vectors_path = self._file(f"vectors.{self.dtype}")
+        tmp_path = vectors_path + ".tmp"
+        grown = np.memmap(tmp_path, dtype=self.dtype, mode="w+", shape=(new_capacity, self.dim))
+        grown[: self.capacity] = self.vectors
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_path, vectors_path)
+        self._resize(new_capacity)
+        self._write_meta()
+
+    def compact(self):
+        """Ghi lại vectors và log chỉ với các dòng còn sống để thu hồi chỗ của dòng đã xóa"""
+        with self.lock, self.file_lock():
+            if self.sync():
+                self._compact()
+
+    def _compact(self):
+        """Nén (gọi khi giữ khóa file độc quyền, sau sync); tiến trình khác tải lại nhờ generation mới"""
+        rows = sorted(self.row_of.values())
+        vectors = np.array(self.vectors[rows]) if rows else np.zeros((0, self.dim), dtype=self.dtype)
+        ids = [self.ids[row] for row in rows]
+        payloads = [self.payloads[row] for row in rows]
+
+        log_path = self._file("payloads.jsonl")
+        with open(log_path + ".tmp", "w", encoding="utf-8") as f:
+            for row, (point_id, payload) in enumerate(zip(ids, payloads)):
+                f.write(json.dumps({"row": row, "id": point_id, "payload": payload}, ensure_ascii=False) + "\n")
+        self.vectors[: len(rows)] = vectors
+        self.vectors.flush()
+        os.replace(log_path + ".tmp", log_path)
+
+        self.generation += 1
+        self._write_meta()
+        self._reload(self._read_meta())
+        print(f"Đã nén collection {self.name}: còn {len(rows)} điểm")
+
+    def flush(self):
+        self.vectors.flush()
+        self._log.flush()
+        # Collection đã bị tiến trình khác xóa thì không còn chỗ để lưu đồ thị
+        if self._hnsw is not None and self._hnsw_dirty and os.path.isdir(self.path):
+            with self.file_lock():
+                self._hnsw.save_index(self._file("hnsw.bin"))
+                # Ghi lại vị trí log mà đồ thị đã áp dụng để phát hiện đồ thị lỗi thời khi mở lại
+                with open(self._file("hnsw.json"), "w", encoding="utf-8") as f:
+                    json.dump({"uid": self.uid, "generation": self.generation, "log_size": self._log_offset}, f)
+            self._hnsw_dirty = False
+
+    # ----- HNSW -----
+
+    def _load_hnsw(self):
+        """Tải đồ thị HNSW đã lưu nếu nó khớp với log payload hiện tại, ngược lại dựng lại"""
+        hnsw_path = self._file("hnsw.bin")
+        marker_path = self._file("hnsw.json")
+        if os.path.exists(hnsw_path) and os.path.exists(marker_path):
+            try:
+                with open(marker_path, "r", encoding="utf-8") as f:
+                    marker = json.load(f)
+                if marker == {"uid": self.uid, "generation": self.generation, "log_size": self._log_offset}:
+                    index = hnswlib.Index(space="ip", dim=self.dim)
+                    index.load_index(hnsw_path, max_elements=self.capacity)
+                    self._hnsw = index
+                    self._hnsw_dirty = False
+                    self._set_ef()
+                    return
+            except Exception as e:
+                print(f"Không thể tải đồ thị HNSW, dựng lại: {str(e)}")
+        self._build_hnsw()
+
+    def _build_hnsw(self):
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(
+            max_elements=self.capacity,
+            ef_construction=int(os.getenv("LOCAL_VECTOR_STORE_HNSW_EF_CONSTRUCTION", "200")),
+            M=int(os.getenv("LOCAL_VECTOR_STORE_HNSW_M", "16")),
+        )
+        rows = sorted(self.row_of.values())
+        if rows:
+            index.add_items(np.asarray(self.vectors[rows], dtype=np.float32), rows)
+        self._hnsw = index
+        self._hnsw_dirty = True
+        self._set_ef()
+
+    def _set_ef(self):
+        self._hnsw.set_ef(int(os.getenv("LOCAL_VECTOR_STORE_HNSW_EF", "128")))
+
+    # ----- Ghi -----
+
+    def upsert(self, points):
+        """Thêm/ghi đè điểm (gọi khi giữ khóa file độc quyền, sau sync: dòng mới không trùng với tiến trình khác)"""
+        ids = [point.id for point in points]
+        vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector phải có kích thước {self.dim}")
+        # Chuẩn hóa để tích vô hướng = cosine (giống Distance.COSINE của Qdrant)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        rows = []
+        next_row = self.size
+        for point_id in ids:
+            row = self.row_of.get(point_id)
+            if row is None:
+                row = next_row
+                next_row += 1
+            rows.append(row)
+        if next_row > self.capacity:
+            self._grow(next_row)
+
+        # Ghi vector trước log: tiến trình khác chỉ thấy dòng mới khi đọc được log của nó
+        self.vectors[rows] = vectors.astype(self.dtype)
+        self.vectors.flush()
+        entries = []
+        for point, row in zip(points, rows):
+            self._set_row(row, point.id, point.payload or {})
+            entries.append({"row": row, "id": point.id, "payload": self.payloads[row]})
+        self._append_log(entries)
+        self._columns = {}
+
+        if self._hnsw is not None:
+            self._hnsw.add_items(vectors, rows)
+            self._hnsw_dirty = True
+        return len(rows)
+
+    def delete_rows(self, rows):
+        """Xóa các dòng (gọi khi giữ khóa file độc quyền, sau sync)"""
+        entries = []
+        for row in rows:
+            if self.ids[row] is None:
+                continue
+            self._set_row(row, None, None)
+            entries.append({"row": row, "deleted": True})
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(row)
+                self._hnsw_dirty = True
+        self._append_log(entries)
+        self._columns = {}
+        return len(rows)
+
+    # ----- Filter -----
+
+    @staticmethod
+    def _field(payload, key):
+        """Giá trị của một trường payload (hỗ trợ khóa lồng "metadata.category")"""
+        value = payload
+        for part in key.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+
+    def _column(self, key):
+        """Giá trị của một trường payload cho mọi dòng (list Python, dựng lại sau mỗi lần ghi)"""
+        column = self._columns.get(key)
+        if column is None:
+            column = [self._field(payload, key) for payload in self.payloads]
+            self._columns[key] = column
+        return column
+
+    def _keyword_column(self, key):
+        """
+        Cột numpy của trường keyword (COLUMNAR_FIELDS hoặc có payload index kiểu keyword), None với trường khác
+
+        Dựng một lần khi filter lần đầu rồi được cập nhật tại chỗ khi upsert/xóa.
+        """
+        column = self._keyword_columns.get(key)
+        if column is None:
+            schema = self.payload_schema.get(key)
+            schema_type = schema.get("type") if isinstance(schema, dict) else schema
+            if key not in COLUMNAR_FIELDS and schema_type != "keyword":
+                return None
+            column = _KeywordColumn(self.capacity)
+            for row, payload in enumerate(self.payloads):
+                if payload is not None:
+                    column.set(row, self._field(payload, key))
+            self._keyword_columns[key] = column
+        return column
+
+    @staticmethod
+    def _values_match(value, predicate):
+        if isinstance(value, list):
+            return any(predicate(item) for item in value)
+        return value is not None and predicate(value)
+
+    def _condition_mask(self, condition):
+        if isinstance(condition, dict):
+            condition = (
+                models.Filter(**condition)
+                if any(k in condition for k in ("must", "should", "must_not"))
+                else models.FieldCondition(**condition)
+            )
+        if isinstance(condition, models.Filter):
+            return self.filter_mask(condition)
+        if isinstance(condition, models.HasIdCondition):
+            mask = np.zeros(self.size, dtype=bool)
+            for point_id in condition.has_id:
+                row = self.row_of.get(point_id if isinstance(point_id, int) else str(point_id))
+                if row is not None:
+                    mask[row] = True
+            return mask
+        if not isinstance(condition, models.FieldCondition):
+            raise ValueError(f"Điều kiện filter không được hỗ trợ: {type(condition).__name__}")
+
+        match = condition.match
+        keyword_column = self._keyword_column(condition.key)
+        if keyword_column is not None and not keyword_column.multi:
+            mask = keyword_column.mask(match, self.size)
+            if mask is not None:
+                return mask
+
+        column = self._column(condition.key)
+        if isinstance(match, models.MatchValue):
+            predicate = lambda v: v == match.value
+        elif isinstance(match, models.MatchAny):
+            allowed = set(match.any)
+            predicate = lambda v: v in allowed
+        elif isinstance(match, models.MatchExcept):
+            excluded = set(getattr(match, "except_"))
+            predicate = lambda v: v not in excluded
+        elif isinstance(match, models.MatchText):
+            predicate = lambda v: isinstance(v, str) and match.text in v
+        elif condition.range is not None:
+            r = condition.range
+            predicate = lambda v: isinstance(v, (int, float)) and (
+                (r.gt is None or v > r.gt)
+                and (r.gte is None or v >= r.gte)
+                and (r.lt is None or v < r.lt)
+                and (r.lte is None or v <= r.lte)
+            )
+        else:
+            raise ValueError(f"Điều kiện trên trường {condition.key} không được hỗ trợ")
+        return np.fromiter(
+            (self._values_match(v, predicate) for v in column), dtype=bool, count=self.size
+        )
+
+    def filter_mask(self, query_filter):
+        """Mặt nạ các dòng còn sống thỏa mãn filter (None = tất cả)"""
+        mask = self.alive[: self.size].copy()
+        if query_filter is None:
+            return mask
+        if isinstance(query_filter, dict):
+            query_filter = models.Filter(**query_filter)
+        for condition in query_filter.must or []:
+            mask &= self._condition_mask(condition)
+        if query_filter.should:
+            should = np.zeros(self.size, dtype=bool)
+            for condition in query_filter.should:
+                should |= self._condition_mask(condition)
+            mask &= should
+        for condition in query_filter.must_not or []:
+            mask &= ~self._condition_mask(condition)
+        return mask
+
+    # ----- Đọc -----
+
+    def search(self, query_vector, query_filter=None, limit=10):
+        """Trả về danh sách (row, score) theo điểm giảm dần"""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        alive_count = len(self.row_of)
+        if alive_count == 0 or limit <= 0:
+            return []
+
+        if self._hnsw is not None and query_filter is None:
+            try:
+                labels, distances = self._hnsw.knn_query(query, k=min(limit, alive_count))
+                # Với space "ip", distance = 1 - tích vô hướng
+                return [(int(row), 1.0 - float(d)) for row, d in zip(labels[0], distances[0])]
+            except RuntimeError as e:
+                print(f"HNSW không trả đủ kết quả, dùng tìm kiếm chính xác: {str(e)}")
+
+        mask = self.filter_mask(query_filter)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+
+        scores = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), SCORE_BLOCK_SIZE):
+            block = candidates[start : start + SCORE_BLOCK_SIZE]
+            scores[start : start + len(block)] = np.asarray(self.vectors[block], dtype=np.float32) @ query
+
+        k = min(limit, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class LocalVectorClient:
+    """
+    Client lưu vector cục bộ, cài đặt tập con API của QdrantClient mà VectorStore sử dụng
+
+    Mỗi collection là một thư mục con trong base_dir, dữ liệu được giữ lại sau khi khởi động lại.
+    self._lock chỉ bảo vệ danh sách collection và alias; mỗi thao tác trên điểm giữ khóa riêng của collection
+    (luôn lấy sau self._lock, không bao giờ ngược lại) nên các collection/view khác nhau không chặn nhau.
+    Giữa các tiến trình: thao tác ghi giữ khóa file độc quyền của collection, thao tác đọc giữ khóa chia sẻ,
+    aliases.json được đọc lại khi đổi và sửa dưới khóa aliases.json.lock.
+    """
+
+    def __init__(self, base_dir=None, dtype=None, use_hnsw=None):
+        self.base_dir = base_dir or os.getenv(
+            "LOCAL_VECTOR_STORE_DIR",
+            os.path.join(os.getenv("UPLOAD_DIR", "backend/data"), ".vector_store"),
+        )
+        self.dtype = (dtype or os.getenv("LOCAL_VECTOR_STORE_DTYPE", "float32")).lower()
+        if self.dtype not in SUPPORTED_DTYPES:
+            raise ValueError(
+                f"LOCAL_VECTOR_STORE_DTYPE={self.dtype} không hợp lệ. Hỗ trợ: {', '.join(SUPPORTED_DTYPES)}"
+            )
+        if use_hnsw is None:
+            use_hnsw = os.getenv("LOCAL_VECTOR_STORE_HNSW", "false").lower() == "true"
+        if use_hnsw and hnswlib is None:
+            print("Chưa cài hnswlib, dùng tìm kiếm chính xác (pip install hnswlib)")
+        self.use_hnsw = use_hnsw
+
+        self._lock = threading.RLock()  # danh sách collection và alias
+        self._collections = {}
+        os.makedirs(self.base_dir, exist_ok=True)
+        self._aliases_path = os.path.join(self.base_dir, "aliases.json")
+        self._aliases = {}
+        self._aliases_signature = None
+        atexit.register(self.close)
+
+    def _collection_path(self, collection_name):
+        return os.path.join(self.base_dir, collection_name)
+
+    def _refresh_aliases(self):
+        """Đọc lại aliases.json nếu file đã đổi (alias có thể được chuyển bởi tiến trình khác)"""
+        with self._lock:
+            signature = _file_signature(self._aliases_path)
+            if signature == self._aliases_signature:
+                return self._aliases
+            aliases = {}
+            if signature is not None:
+                with open(self._aliases_path, "r", encoding="utf-8") as f:
+                    aliases = json.load(f)
+            self._aliases = aliases
+            self._aliases_signature = signature
+            return aliases
+
+    def _get(self, collection_name):
+        collection_name = self._refresh_aliases().get(collection_name, collection_name)
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            if not self.collection_exists(collection_name):
+                raise ValueError(f"Collection {collection_name} không tồn tại")
+            collection = _LocalCollection(
+                self._collection_path(collection_name), use_hnsw=self.use_hnsw
+            )
+            self._collections[collection_name] = collection
+        return collection
+
+    @contextmanager
+    def _locked(self, collection_name, shared=False):
+        """
+        Lấy collection (qua alias), giữ khóa riêng của nó và khóa file trong suốt thao tác
+
+        Args:
+            shared: True với thao tác chỉ đọc (các tiến trình đọc đồng thời), False khi ghi
+        """
+        with self._lock:
+            collection = self._get(collection_name)
+        with collection.lock:
+            if not collection.closed:
+                with collection.file_lock(shared=shared):
+                    synced = collection.sync()
+                    if synced:
+                        yield collection
+                if synced:
+                    return
+                # Tiến trình khác đã xóa collection
+                collection.close()
+        with self._lock:
+            if self._collections.get(collection.name) is collection:
+                self._collections.pop(collection.name)
+        raise ValueError(f"Collection {collection_name} không tồn tại")
+
+    @staticmethod
+    def _with_payload(payload, with_payload):
+        if with_payload is True:
+            return payload
+        if not with_payload:
+            return None
+        # Danh sách trường cần lấy
+        fields = with_payload if isinstance(with_payload, (list, tuple)) else getattr(with_payload, "include", None) or []
+        return {key: payload[key] for key in fields if key in payload}
+
+    # ----- Collection -----
+
+    def collection_exists(self, collection_name):
+        collection_name = self._refresh_aliases().get(collection_name, collection_name)
+        return os.path.exists(os.path.join(self._collection_path(collection_name), "meta.json"))
+
+    def get_collections(self):
+        names = sorted(
+            name for name in os.listdir(self.base_dir) if self.collection_exists(name)
+        )
+        return models.CollectionsResponse(
+            collections=[models.CollectionDescription(name=name) for name in names]
+        )
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        with self._lock:
+            if vectors_config.distance != models.Distance.COSINE:
+                raise ValueError("LocalVectorClient chỉ hỗ trợ Distance.COSINE")
+            previous = self._collections.pop(collection_name, None)
+            if previous is not None:
+                with previous.lock:
+                    previous.close()
+            self._collections[collection_name] = _LocalCollection(
+                self._collection_path(collection_name),
+                dim=vectors_config.size,
+                dtype=self.dtype,
+                use_hnsw=self.use_hnsw,
+            )
+            return True
+
+    def delete_collection(self, collection_name, **kwargs):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                with collection.lock:
+                    collection.close()
+            path = self._collection_path(collection_name)
+            with file_lock(path + ".lock"):
+                shutil.rmtree(path, ignore_errors=True)
+            # Giống Qdrant: alias của collection bị xóa theo
+            with self._aliases_lock():
+                aliases = self._refresh_aliases()
+                remaining = {a: c for a, c in aliases.items() if c != collection_name}
+                if remaining != aliases:
+                    self._write_aliases(remaining)
+            return True
+
+    # ----- Alias -----
+
+    def _aliases_lock(self):
+        """Khóa file cho đọc-sửa-ghi aliases.json giữa các tiến trình"""
+        return file_lock(self._aliases_path + ".lock")
+
+    def _write_aliases(self, aliases):
+        """Ghi aliases.json (gọi khi giữ _aliases_lock)"""
+        tmp_path = self._aliases_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(aliases, f)
+        os.replace(tmp_path, self._aliases_path)
+        self._aliases = aliases
+        self._aliases_signature = _file_signature(self._aliases_path)
+
+    def get_aliases(self):
+        return models.CollectionsAliasesResponse(
+            aliases=[
+                models.AliasDescription(alias_name=alias, collection_name=collection_name)
+                for alias, collection_name in sorted(self._refresh_aliases().items())
+            ]
+        )
+
+    def get_collection_aliases(self, collection_name):
+        return models.CollectionsAliasesResponse(
+            aliases=[
+                models.AliasDescription(alias_name=alias, collection_name=target)
+                for alias, target in sorted(self._refresh_aliases().items())
+                if target == collection_name
+            ]
+        )
+
+    def update_collection_aliases(self, change_aliases_operations, **kwargs):
+        """Áp dụng toàn bộ thay đổi alias rồi ghi file một lần (nguyên tử như Qdrant)"""
+        with self._lock, self._aliases_lock():
+            aliases = dict(self._refresh_aliases())
+            for operation in change_aliases_operations:
+                if isinstance(operation, models.CreateAliasOperation):
+                    create = operation.create_alias
+                    if os.path.isdir(self._collection_path(create.alias_name)):
+                        raise ValueError(f"Alias {create.alias_name} trùng tên một collection")
+                    if not self.collection_exists(create.collection_name):
+                        raise ValueError(f"Collection {create.collection_name} không tồn tại")
+                    aliases[create.alias_name] = create.collection_name
+                elif isinstance(operation, models.DeleteAliasOperation):
+                    aliases.pop(operation.delete_alias.alias_name, None)
+                elif isinstance(operation, models.RenameAliasOperation):
+                    rename = operation.rename_alias
+                    aliases[rename.new_alias_name] = aliases.pop(rename.old_alias_name)
+            self._write_aliases(aliases)
+            return True
+
+    def get_collection(self, collection_name):
+        with self._locked(collection_name, shared=True) as collection:
+            points_count = len(collection.row_of)
+            return LocalCollectionInfo(
+                status="green",
+                points_count=points_count,
+                vectors_count=points_count,
+                indexed_vectors_count=points_count if collection._hnsw is not None else 0,
+                payload_schema={
+                    field: self._payload_index_info(schema, points_count)
+                    for field, schema in collection.payload_schema.items()
+                },
+                config=LocalCollectionInfo(
+                    params=LocalCollectionInfo(
+                        vectors=models.VectorParams(size=collection.dim, distance=models.Distance.COSINE)
+                    ),
+                    dtype=collection.dtype,
+                    hnsw=collection._hnsw is not None,
+                ),
+            )
+
+    @staticmethod
+    def _payload_index_info(schema, points_count):
+        if isinstance(schema, dict):
+            return models.PayloadIndexInfo(
+                data_type=schema["type"], params=models.KeywordIndexParams(**schema), points=points_count
+            )
+        return models.PayloadIndexInfo(data_type=schema, points=points_count)
+
+    def update_collection(self, collection_name, **kwargs):
+        """Không có gì để cập nhật: kho cục bộ không lượng tử hóa (dùng LOCAL_VECTOR_STORE_DTYPE)"""
+        with self._locked(collection_name, shared=True):
+            return True
+
+    def create_payload_index(self, collection_name, field_name, field_schema, **kwargs):
+        """Chỉ ghi nhận schema: filter cục bộ dùng cột payload trong bộ nhớ nên không cần index riêng"""
+        with self._locked(collection_name) as collection:
+            if isinstance(field_schema, models.KeywordIndexParams):
+                # Giữ lại tham số (is_tenant) để VectorStore kiểm tra index đúng cấu hình
+                collection.payload_schema[field_name] = field_schema.model_dump(mode="json", exclude_none=True)
+            else:
+                collection.payload_schema[field_name] = models.PayloadSchemaType(field_schema).value
+            collection._write_meta()
+            return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def delete_payload_index(self, collection_name, field_name, **kwargs):
+        with self._locked(collection_name) as collection:
+            collection.payload_schema.pop(field_name, None)
+            collection._write_meta()
+            return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    # ----- Điểm -----
+
+    def upsert(self, collection_name, points, **kwargs):
+        with self._locked(collection_name) as collection:
+            collection.upsert(points)
+            return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def search(
+        self,
+        collection_name,
+        query_vector,
+        query_filter=None,
+        limit=10,
+        with_payload=True,
+        with_vectors=False,
+        **kwargs,
+    ):
+        with self._locked(collection_name, shared=True) as collection:
+            return self._search(collection, query_vector, query_filter, limit, with_payload, with_vectors)
+
+    def _search(self, collection, query_vector, query_filter, limit, with_payload, with_vectors):
+        hits = collection.search(query_vector, query_filter=query_filter, limit=limit)
+        return [
+            models.ScoredPoint(
+                id=collection.ids[row],
+                version=0,
+                score=score,
+                payload=self._with_payload(collection.payloads[row], with_payload),
+                vector=np.asarray(collection.vectors[row], dtype=np.float32).tolist() if with_vectors else None,
+            )
+            for row, score in hits
+        ]
+
+    def search_batch(self, collection_name, requests, **kwargs):
+        with self._locked(collection_name, shared=True) as collection:
+            return [
+                self._search(
+                    collection,
+                    request.vector,
+                    request.filter,
+                    request.limit,
+                    request.with_payload,
+                    request.with_vector,
+                )
+                for request in requests
+            ]
+
+    def scroll(
+        self,
+        collection_name,
+        scroll_filter=None,
+        limit=10,
+        offset=None,
+        with_payload=True,
+        with_vectors=False,
+        **kwargs,
+    ):
+        """Duyệt các điểm theo thứ tự dòng; offset là chỉ số dòng bắt đầu (trả về trong next_offset)"""
+        scroll_filter = scroll_filter if scroll_filter is not None else kwargs.get("filter")
+        with self._locked(collection_name, shared=True) as collection:
+            rows = np.flatnonzero(collection.filter_mask(scroll_filter))
+            start = int(offset or 0)
+            rows = rows[rows >= start]
+            page = rows[:limit]
+            next_offset = int(rows[limit]) if len(rows) > limit else None
+            records = [
+                models.Record(
+                    id=collection.ids[row],
+                    payload=self._with_payload(collection.payloads[row], with_payload),
+                    vector=np.asarray(collection.vectors[row], dtype=np.float32).tolist() if with_vectors else None,
+                )
+                for row in page
+            ]
+            return records, next_offset
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        with self._locked(collection_name, shared=True) as collection:
+            records = []
+            for point_id in ids:
+                row = collection.row_of.get(point_id)
+                if row is None:
+                    continue
+                records.append(
+                    models.Record(
+                        id=point_id,
+                        payload=self._with_payload(collection.payloads[row], with_payload),
+                        vector=np.asarray(collection.vectors[row], dtype=np.float32).tolist() if with_vectors else None,
+                    )
+                )
+            return records
+
+    def count(self, collection_name, count_filter=None, exact=True, **kwargs):
+        with self._locked(collection_name, shared=True) as collection:
+            return models.CountResult(count=int(collection.filter_mask(count_filter).sum()))
+
+    def delete(self, collection_name, points_selector, **kwargs):
+        with self._locked(collection_name) as collection:
+            if isinstance(points_selector, models.FilterSelector):
+                rows = np.flatnonzero(collection.filter_mask(points_selector.filter)).tolist()
+            else:
+                point_ids = (
+                    points_selector.points
+                    if isinstance(points_selector, models.PointIdsList)
+                    else points_selector
+                )
+                rows = [
+                    collection.row_of[point_id]
+                    for point_id in point_ids
+                    if point_id in collection.row_of
+                ]
+            collection.delete_rows(rows)
+            return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                try:
+                    with collection.lock:
+                        collection.close()
+                except Exception as e:
+                    print(f"Lỗi khi đóng collection {collection.path}: {str(e)}")
+            self._collections = {}
+
+
+class LocalAsyncVectorClient:
+    """Bản bất đồng bộ của LocalVectorClient (cùng interface với AsyncQdrantClient), chạy trong thread pool"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, functools.partial(method, *args, **kwargs))
+
+        return call
+
+
+class LocalVectorStore(VectorStore):
+    """
+    VectorStore lưu vector trên đĩa cục bộ (memory-mapped), không cần Qdrant
+
+    Giữ nguyên toàn bộ interface của VectorStore; chỉ thay client Qdrant bằng LocalVectorClient.
+    Chọn bằng VECTOR_STORE_BACKEND=local.
+    """
+
+    def __init__(self, base_dir=None, collection_name=None, user_id=None):
+        """Khởi tạo client cục bộ"""
+        self.client = LocalVectorClient(base_dir)
+        self.user_id = user_id
+        self.collection_name = collection_name
+        self._indexed_collections = set()
+        self._collection_cache = {}
+        self._async_client = None
+        self._async_client_loop = None
+        self._init_multitenancy()
+        self._init_chunk_cache()
+        # Chỉ mục BM25 nằm cùng dữ liệu cục bộ
+        self._init_lexical_index(os.path.join(self.client.base_dir, "_bm25"))
+        if user_id and not collection_name:
+            self.collection_name = self._collection_name_for(user_id)
+
+        print(
+            f"Khởi tạo Local Vector Store tại {self.client.base_dir} "
+            f"(dtype={self.client.dtype}, hnsw={self.client.use_hnsw and hnswlib is not None})"
+        )
+
+    def _create_async_client(self):
+        """Kho cục bộ không qua mạng: chỉ cần chạy client đồng bộ trong thread pool"""
+        return LocalAsyncVectorClient(self.client)
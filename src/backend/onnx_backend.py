@@ -0,0 +1,133 @@
+import logging
+import os
+from sentence_transformers import SentenceTransformer, CrossEncoder
+from dotenv import load_dotenv
+
+# Cấu hình logging
+logging.basicConfig(format="[ONNX Backend] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[ONNX Backend] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+# Load biến môi trường từ .env
+load_dotenv()
+
+SUPPORTED_BACKENDS = ("torch", "onnx")
+# Cấu hình lượng tử hóa int8 động hỗ trợ bởi sentence-transformers
+SUPPORTED_QUANTIZATION_CONFIGS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+def get_backend(env_name: str) -> str:
+    """Đọc backend suy luận (torch/onnx) từ biến môi trường"""
+    backend = os.getenv(env_name, "torch").lower()
+    if backend not in SUPPORTED_BACKENDS:
+        print(f"Backend {backend} không được hỗ trợ cho {env_name}, dùng torch")
+        return "torch"
+    return backend
+
+
+def get_quantization_config() -> str:
+    """Đọc cấu hình lượng tử hóa (tập lệnh CPU đích)"""
+    config = os.getenv("ONNX_QUANTIZATION_CONFIG", "avx2").lower()
+    if config not in SUPPORTED_QUANTIZATION_CONFIGS:
+        raise ValueError(
+            f"ONNX_QUANTIZATION_CONFIG={config} không hợp lệ. Hỗ trợ: {', '.join(SUPPORTED_QUANTIZATION_CONFIGS)}"
+        )
+    return config
+
+
+def get_onnx_model_dir(model_name: str) -> str:
+    """Thư mục chứa bản ONNX đã export của một model"""
+    base_dir = os.getenv("ONNX_MODEL_DIR", os.path.join("backend", "models", "onnx"))
+    return os.path.join(base_dir, model_name.replace("/", "__"))
+
+
+def get_quantized_file_name(config: str = None) -> str:
+    """Tên file ONNX int8 (tương đối trong thư mục model) theo quy ước của sentence-transformers"""
+    return f"onnx/model_qint8_{config or get_quantization_config()}.onnx"
+
+
+def is_exported(model_name: str, config: str = None) -> bool:
+    """Kiểm tra model đã được export sang ONNX int8 hay chưa"""
+    return os.path.exists(
+        os.path.join(get_onnx_model_dir(model_name), get_quantized_file_name(config))
+    )
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch"):
+    """Tải SentenceTransformer với backend mong muốn, tự động quay về torch nếu thiếu bản ONNX"""
+    if backend == "onnx":
+        if is_exported(model_name):
+            try:
+                model = SentenceTransformer(
+                    get_onnx_model_dir(model_name),
+                    backend="onnx",
+                    model_kwargs={"file_name": get_quantized_file_name()},
+                )
+                print(f"Đã tải embedding model {model_name} (ONNX int8, {get_quantization_config()})")
+                return model
+            except Exception as e:
+                print(f"Lỗi khi tải bản ONNX của {model_name}, dùng torch: {str(e)}")
+        else:
+            print(
+                f"Chưa có bản ONNX int8 cho {model_name}. Chạy: python backend/scripts/export_onnx_models.py export"
+            )
+    return SentenceTransformer(model_name)
+
+
+def load_cross_encoder(model_name: str, backend: str = "torch"):
+    """Tải CrossEncoder với backend mong muốn, tự động quay về torch nếu thiếu bản ONNX"""
+    if backend == "onnx":
+        if is_exported(model_name):
+            try:
+                model = CrossEncoder(
+                    get_onnx_model_dir(model_name),
+                    backend="onnx",
+                    model_kwargs={"file_name": get_quantized_file_name()},
+                )
+                print(f"Đã tải reranker {model_name} (ONNX int8, {get_quantization_config()})")
+                return model
+            except Exception as e:
+                print(f"Lỗi khi tải bản ONNX của {model_name}, dùng torch: {str(e)}")
+        else:
+            print(
+                f"Chưa có bản ONNX int8 cho {model_name}. Chạy: python backend/scripts/export_onnx_models.py export"
+            )
+    return CrossEncoder(model_name)
+
+
+def export_quantized_model(model_name: str, kind: str = "embedding", config: str = None) -> str:
+    """
+    Export một model sang ONNX rồi lượng tử hóa int8 động (chạy một lần)
+
+    Args:
+        model_name: Tên model trên HuggingFace hoặc đường dẫn local
+        kind: "embedding" (SentenceTransformer) hoặc "reranker" (CrossEncoder)
+        config: Cấu hình lượng tử hóa (arm64, avx2, avx512, avx512_vnni)
+
+    Returns:
+        Đường dẫn thư mục chứa model đã export
+    """
+    # Chỉ có từ sentence-transformers>=3.2 và cần optimum[onnxruntime]
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    config = config or get_quantization_config()
+    output_dir = get_onnx_model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Export {kind} model {model_name} sang ONNX tại {output_dir}...")
+    model_cls = CrossEncoder if kind == "reranker" else SentenceTransformer
+    onnx_model = model_cls(model_name, backend="onnx")
+    onnx_model.save_pretrained(output_dir)
+
+    print(f"Lượng tử hóa int8 động với cấu hình {config}...")
+    export_dynamic_quantized_onnx_model(onnx_model, config, output_dir)
+    print(f"Đã tạo {os.path.join(output_dir, get_quantized_file_name(config))}")
+    return output_dir
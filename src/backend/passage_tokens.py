@@ -0,0 +1,244 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Cấu hình logging
+logging.basicConfig(format="[Passage Tokens] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[Passage Tokens] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+# Kích thước digest của khóa (bytes)
+KEY_SIZE = 16
+
+
+class PassageTokenEncoder:
+    """
+    Mã hóa sẵn các cặp (query, passage) cho cross-encoder và chạy model trực tiếp trên token ID
+
+    Token ID của passage (đã cắt theo độ dài tối đa của model) được cache theo hash văn bản của chunk,
+    nên các chunk dài từ _chunk_by_structure chỉ bị tokenize một lần thay vì ở mỗi lần predict.
+    Mỗi lần rerank chỉ tokenize query một lần rồi ghép với token của passage theo đúng cách cắt
+    longest_first mà CrossEncoder.predict dùng.
+    """
+
+    def __init__(self, model, max_entries: int = None):
+        """Khởi tạo encoder cho một model CrossEncoder (RERANK_TOKEN_CACHE_MAX_ENTRIES)"""
+        self.model = model
+        self.tokenizer = model.tokenizer
+        self.network = model.model
+        self.activation_fn = getattr(model, "activation_fn", None) or getattr(model, "default_activation_function", None)
+
+        # Giống CrossEncoder: dùng max_length của model, nếu không có thì của tokenizer (giá trị vô hạn -> 512)
+        max_length = getattr(model, "max_seq_length", None) or getattr(model, "max_length", None)
+        tokenizer_max_length = self.tokenizer.model_max_length
+        if tokenizer_max_length > 100_000:
+            tokenizer_max_length = 512
+        self.max_length = int(min(max_length or tokenizer_max_length, tokenizer_max_length))
+        self.use_token_type_ids = "token_type_ids" in self.tokenizer.model_input_names
+        self._template = self._pair_template()
+        self.pair_budget = self.max_length - sum(len(part) for part in self._template[::2])
+
+        self.capacity = int(max_entries or os.getenv("RERANK_TOKEN_CACHE_MAX_ENTRIES", "20000"))
+        self._lock = threading.Lock()
+        # Tokenizer nhanh (Rust) không an toàn khi nhiều thread cùng tokenize với tham số cắt khác nhau
+        self._tokenizer_lock = threading.Lock()
+        self._entries = OrderedDict()  # hash văn bản -> (token ID int32 đã cắt, số token thật) của passage
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def create(cls, model, max_entries: int = None):
+        """
+        Tạo encoder nếu model là CrossEncoder torch có tokenizer, ngược lại trả về None (dùng predict với văn bản)
+
+        predict gọi thẳng mạng torch trên tensor đã pad nên không dùng cho backend ONNX/OpenVINO
+        (RERANKER_BACKEND=onnx): các backend đó vẫn chấm điểm qua CrossEncoder.predict.
+        """
+        backend = getattr(model, "backend", "torch")
+        if backend != "torch":
+            print(f"Reranker dùng backend {backend}, không mã hóa sẵn passage (dùng predict với văn bản)")
+            return None
+        try:
+            encoder = cls(model, max_entries)
+        except Exception as e:
+            print(f"Không thể mã hóa sẵn passage cho reranker, dùng predict với văn bản: {str(e)}")
+            return None
+        if encoder.tokenizer.truncation_side != "right" or encoder.pair_budget <= 1:
+            print("Tokenizer của reranker không cắt bên phải, dùng predict với văn bản")
+            return None
+        return encoder
+
+    def _pair_template(self):
+        """
+        Bố cục token đặc biệt của một cặp, suy ra từ chính tokenizer (không phụ thuộc phiên bản transformers)
+
+        Returns:
+            (tiền tố, type của query, phần giữa, type của passage, hậu tố) - các phần là list (id, type)
+        """
+        first = self.tokenizer("a", add_special_tokens=False)["input_ids"]
+        second = self.tokenizer("b", add_special_tokens=False)["input_ids"]
+        encoded = self.tokenizer("a", "b", return_token_type_ids=True)
+        ids = encoded["input_ids"]
+        types = encoded.get("token_type_ids") or [0] * len(ids)
+
+        def find(sub, start):
+            for i in range(start, len(ids) - len(sub) + 1):
+                if ids[i : i + len(sub)] == sub:
+                    return i
+            raise ValueError("không xác định được bố cục token đặc biệt của cặp")
+
+        first_start = find(first, 0)
+        first_end = first_start + len(first)
+        second_start = find(second, first_end)
+        second_end = second_start + len(second)
+        segment = lambda start, end: list(zip(ids[start:end], types[start:end]))
+        return (
+            segment(0, first_start),
+            types[first_start],
+            segment(first_end, second_start),
+            types[second_start],
+            segment(second_end, len(ids)),
+        )
+
+    def _tokenize(self, texts: List[str]) -> List[List[int]]:
+        """
+        Tokenize không thêm token đặc biệt và không cắt: tokenizer vẫn tokenize toàn bộ văn bản trước khi cắt,
+        giữ độ dài thật để cắt longest_first giống hệt tokenizer
+        """
+        with self._tokenizer_lock:
+            return self.tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]
+
+    def _passage_ids(self, results: List[Dict]) -> List[Tuple[np.ndarray, int]]:
+        """(token ID đã cắt, số token thật) của passage từng kết quả, lấy từ cache và chỉ tokenize các chunk chưa có"""
+        keys = [
+            hashlib.blake2b(result.get("text", "").encode("utf-8"), digest_size=KEY_SIZE).digest()
+            for result in results
+        ]
+        passages = [None] * len(results)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    missing.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                passages[i] = entry
+            self.hits += len(results) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            tokenized = self._tokenize([results[i].get("text", "") for i in missing])
+            with self._lock:
+                for i, ids in zip(missing, tokenized):
+                    passages[i] = (np.asarray(ids[: self.pair_budget], dtype=np.int32), len(ids))
+                    self._entries[keys[i]] = passages[i]
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+        return passages
+
+    def _truncate(self, query_len: int, passage_len: int):
+        """Độ dài (query, passage) sau khi cắt longest_first như tokenizer khi gọi với truncation=True"""
+        budget = self.pair_budget
+        if query_len + passage_len <= budget:
+            return query_len, passage_len
+        short_len = min(query_len, passage_len)
+        if short_len <= budget // 2:
+            # Chỉ cắt chuỗi dài hơn
+            if query_len > passage_len:
+                return budget - passage_len, passage_len
+            return query_len, budget - query_len
+        # Cả hai đều dài hơn nửa ngân sách: chia đôi, phần lẻ thuộc về chuỗi dài hơn (bằng nhau thì passage)
+        if query_len > passage_len:
+            return budget - budget // 2, budget // 2
+        return budget // 2, budget - budget // 2
+
+    def encode_pairs(self, query: str, results: List[Dict]) -> List[Dict]:
+        """
+        Tạo input đã mã hóa cho các cặp (query, passage), dùng thay cho [(query, result["text"]), ...]
+
+        Returns:
+            Danh sách dict {"input_ids", "token_type_ids"?} đã có token đặc biệt, truyền vào predict
+        """
+        if not results:
+            return []
+        query_ids = self._tokenize([query])[0]
+        prefix, query_type, middle, passage_type, suffix = self._template
+        prefix_ids, prefix_types = [i for i, _ in prefix], [t for _, t in prefix]
+        middle_ids, middle_types = [i for i, _ in middle], [t for _, t in middle]
+        suffix_ids, suffix_types = [i for i, _ in suffix], [t for _, t in suffix]
+        pairs = []
+        for passage, passage_total in self._passage_ids(results):
+            query_len, passage_len = self._truncate(len(query_ids), passage_total)
+            second = passage[:passage_len].tolist()
+            pair = {"input_ids": prefix_ids + query_ids[:query_len] + middle_ids + second + suffix_ids}
+            if self.use_token_type_ids:
+                pair["token_type_ids"] = (
+                    prefix_types + [query_type] * query_len + middle_types + [passage_type] * passage_len + suffix_types
+                )
+            pairs.append(pair)
+        return pairs
+
+    @staticmethod
+    def count_tokens(pair: Dict) -> int:
+        """Số token thực của một cặp đã mã hóa (dùng cho token budget của RerankScheduler)"""
+        return len(pair["input_ids"])
+
+    def predict(self, pairs: List[Dict], batch_size: int = 32) -> np.ndarray:
+        """Chấm điểm các cặp đã mã hóa, gom các cặp dài gần nhau vào cùng batch để giảm padding"""
+        import torch
+
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+
+        batch_size = batch_size or len(pairs)
+        order = np.argsort([-len(pair["input_ids"]) for pair in pairs], kind="stable")
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        device = getattr(self.network, "device", None)
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start : start + batch_size]
+            features = self.tokenizer.pad([pairs[i] for i in batch_idx], padding=True, return_tensors="pt")
+            if device is not None:
+                features = {name: tensor.to(device) for name, tensor in features.items()}
+            with torch.inference_mode():
+                logits = self.network(**features).logits
+                if logits.dtype != torch.float32:
+                    logits = logits.float()
+                if self.activation_fn is not None:
+                    logits = self.activation_fn(logits)
+            scores[batch_idx] = logits[:, 0].cpu().numpy()
+        return scores
+
+    def clear(self):
+        """Xóa toàn bộ token đã cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Số passage đã cache, hit/miss và dung lượng token ID"""
+        with self._lock:
+            total = self.hits + self.misses
+            token_bytes = sum(ids.nbytes for ids, _ in self._entries.values())
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "max_length": self.max_length,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+                "memory_bytes": token_bytes,
+            }
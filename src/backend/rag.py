@@ -124,8 +124,13 @@ class AdvancedDatabaseRAG:
 
         # Lưu trữ user_id
         self.user_id = user_id
-        # Khởi tạo vector store với user_id
-        self.vector_store = VectorStore(user_id=user_id)
+        # Khởi tạo vector store với user_id (Qdrant hoặc kho cục bộ memory-mapped)
+        if os.getenv("VECTOR_STORE_BACKEND", "qdrant").lower() == "local":
+            from backend.local_vector_store import LocalVectorStore
+
+            self.vector_store = LocalVectorStore(user_id=user_id)
+        else:
+            self.vector_store = VectorStore(user_id=user_id)
         print(f"Khởi tạo hệ thống RAG cho user_id={user_id}")
 
         if document_processor is not None:
@@ -284,8 +289,8 @@ class AdvancedDatabaseRAG:
         """Xử lý một tài liệu đơn lẻ"""
         return self.document_processor.chunk_documents_sync([document])
 
-    async def index_to_qdrant_async(self, chunks: List[Dict], user_id) -> None:
-        """Index chunks lên Qdrant (bất đồng bộ)"""
+    async def index_to_qdrant_async(self, chunks: List[Dict], user_id, vector_store=None) -> None:
+        """Index chunks lên Qdrant (bất đồng bộ), vector_store: view theo request (mặc định store chung)"""
         if not chunks:
             print("Không có chunks nào để index")
             return
@@ -294,19 +299,13 @@ class AdvancedDatabaseRAG:
         print(f"Bắt đầu index {len(chunks)} chunks lên Qdrant cho user_id={user_id}")
 
         try:
-            # Tạo embeddings batch để tối ưu tốc độ
-            texts = [chunk["text"] for chunk in chunks]
-            print(f"Đang tạo embeddings cho {len(texts)} texts...")
-
-            # Sử dụng async batch encoding
-            embeddings = await self.embedding_model.encode_batch(texts)
-            print(f"Đã tạo xong {len(embeddings)} embeddings")
-
             # Lấy file_id từ chunk đầu tiên (giả sử tất cả chunks thuộc cùng một file)
             file_id = chunks[0].get("file_id", str(uuid.uuid4()))
 
-            # Index lên vector store
-            await self.vector_store.index_documents(chunks, embeddings, user_id, file_id)
+            # Encode và index theo pipeline: encode batch tiếp theo trong khi upsert batch hiện tại
+            await (vector_store or self.vector_store).index_documents_streaming(
+                chunks, self.embedding_model, user_id, file_id
+            )
 
             end_time = time.time()
             processing_time = end_time - start_time
@@ -319,8 +318,8 @@ class AdvancedDatabaseRAG:
             print(f"Lỗi khi index chunks: {str(e)}")
             raise
 
-    def index_to_qdrant(self, chunks: List[Dict], user_id) -> None:
-        """Index chunks lên Qdrant (đồng bộ)"""
+    def index_to_qdrant(self, chunks: List[Dict], user_id, vector_store=None) -> None:
+        """Index chunks lên Qdrant (đồng bộ), vector_store: view theo request (mặc định store chung)"""
         if not chunks:
             print("Không có chunks nào để index")
             return
@@ -341,7 +340,7 @@ class AdvancedDatabaseRAG:
             file_id = chunks[0].get("file_id", str(uuid.uuid4()))
 
             # Index lên vector store
-            self.vector_store.index_documents_sync(chunks, embeddings, user_id, file_id)
+            (vector_store or self.vector_store).index_documents_sync(chunks, embeddings, user_id, file_id)
 
             end_time = time.time()
             processing_time = end_time - start_time
@@ -360,8 +359,14 @@ class AdvancedDatabaseRAG:
         k: int = 20,
         sources: List[str] = None,
         file_id: List[str] = None,
+        vector_store=None,
+        with_payload: bool = True,
     ) -> List[Dict]:
-        """Tìm kiếm ngữ nghĩa (bất đồng bộ)"""
+        """
+        Tìm kiếm ngữ nghĩa (bất đồng bộ), vector_store: view theo request (VectorStore.for_collection)
+
+        with_payload=False chỉ lấy id + score (truy xuất hai pha)
+        """
         print(f"Semantic search với query='{query}', k={k}")
         
         if sources:
@@ -376,6 +381,8 @@ class AdvancedDatabaseRAG:
                 k=k,
                 sources=sources,
                 file_id=file_id,
+                vector_store=vector_store,
+                with_payload=with_payload,
             )
 
             print(f"Tìm thấy {len(results)} kết quả từ semantic search")
@@ -402,8 +409,9 @@ class AdvancedDatabaseRAG:
         k: int = 20,
         sources: List[str] = None,
         file_id: List[str] = None,
+        vector_store=None,
     ) -> List[Dict]:
-        """Tìm kiếm ngữ nghĩa (đồng bộ)"""
+        """Tìm kiếm ngữ nghĩa (đồng bộ), vector_store: view theo request (VectorStore.for_collection)"""
         print(f"Semantic search với query='{query}', k={k}")
         
         if sources:
@@ -418,6 +426,7 @@ class AdvancedDatabaseRAG:
                 k=k,
                 sources=sources,
                 file_id=file_id,
+                vector_store=vector_store,
             )
 
             print(f"Tìm thấy {len(results)} kết quả từ semantic search")
@@ -453,6 +462,7 @@ class AdvancedDatabaseRAG:
         sources: List[str] = None,
         file_id: List[str] = None,
         conversation_history: str = None,
+        vector_store=None,
     ) -> AsyncGenerator[Dict, None]:
         """
         Truy vấn hệ thống RAG với các nguồn và trả về kết quả dưới dạng stream
@@ -463,6 +473,7 @@ class AdvancedDatabaseRAG:
             sources: Danh sách các file nguồn cần tìm kiếm (cách cũ, sử dụng file_id thay thế)
             file_id: Danh sách các file_id cần tìm kiếm (cách mới). Nếu là None hoặc rỗng, sẽ tìm kiếm trong tất cả các file
             conversation_history: Lịch sử hội thoại
+            vector_store: View theo request (VectorStore.for_collection), mặc định store chung
 
         Returns:
             AsyncGenerator trả về từng phần của câu trả lời
@@ -665,9 +676,17 @@ class AdvancedDatabaseRAG:
             }
             return
         RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "50"))
+        # Truy xuất hai pha: tìm RETRIEVAL_K kết quả chỉ với id + score,
+        # payload chỉ lấy cho top RERANK_TOP_N (từ chunk cache hoặc retrieve) trước khi rerank
+        two_phase = os.getenv("TWO_PHASE_RETRIEVAL", "true").lower() == "true"
         # Thực hiện semantic search
         search_results = await self.semantic_search_async(
-            query_to_use, k=RETRIEVAL_K, sources=sources, file_id=file_id
+            query_to_use,
+            k=RETRIEVAL_K,
+            sources=sources,
+            file_id=file_id,
+            vector_store=vector_store,
+            with_payload=not two_phase,
         )
         
         # Fallback mechanism cho streaming
@@ -757,18 +776,23 @@ class AdvancedDatabaseRAG:
             return
         RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "15"))
         results_to_rerank = search_results[:RERANK_TOP_N]
-        print(f"Lấy về {len(search_results)} kết quả, sẽ rerank top {len(results_to_rerank)}.")
-
-        # Rerank kết quả nếu có nhiều hơn 1 kết quả
-        if len(search_results) > 0:
+        if two_phase:
+            top_n = len(results_to_rerank)
+            results_to_rerank = await (vector_store or self.vector_store).fetch_payloads(results_to_rerank)
+            if len(results_to_rerank) < top_n:
+                print(f"{top_n - len(results_to_rerank)} kết quả đã bị xóa trước khi lấy payload, bỏ qua.")
+        print(f"Lấy về {len(search_results)} kết quả, sẽ rerank {len(results_to_rerank)} kết quả có payload.")
+
+        # Rerank nếu còn kết quả (truy xuất hai pha: point bị xóa giữa hai pha đã bị loại khi lấy payload)
+        if len(results_to_rerank) > 0:
             reranked_results = await self.rerank_results_async(
                 query_to_use, results_to_rerank
             )
             # Lấy số lượng kết quả đã rerank
             total_reranked = len(reranked_results)
         else:
-            reranked_results = search_results
-            total_reranked = 1
+            reranked_results = results_to_rerank
+            total_reranked = 0
 
         # Chuẩn bị context từ các kết quả đã rerank
         context_docs = []
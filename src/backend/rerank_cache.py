@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+# Cấu hình logging
+logging.basicConfig(format="[Rerank Cache] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[Rerank Cache] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+# Kích thước digest của khóa (bytes)
+KEY_SIZE = 16
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Chuẩn hóa câu truy vấn để các câu hỏi lặp lại dùng chung khóa (NFC, chữ thường, khoảng trắng, dấu câu cuối)"""
+    query = unicodedata.normalize("NFC", query or "").lower()
+    return _WHITESPACE_RE.sub(" ", query).strip().rstrip("?.!").strip()
+
+
+class RerankScoreCache:
+    """
+    Cache LRU + TTL trong bộ nhớ cho điểm cross-encoder của các cặp (query, chunk)
+
+    Khóa là digest của (phiên bản model, query đã chuẩn hóa, định danh chunk), trong đó định danh
+    chunk là point ID nếu có, ngược lại là hash của văn bản. Đổi model/backend reranker thì khóa đổi theo.
+    """
+
+    def __init__(self, model_version: str, max_entries: int = None, ttl_seconds: float = None):
+        """Khởi tạo cache rỗng (RERANK_CACHE_MAX_ENTRIES, RERANK_CACHE_TTL)"""
+        self.model_version = model_version
+        self.capacity = int(max_entries or os.getenv("RERANK_CACHE_MAX_ENTRIES", "50000"))
+        self.ttl = float(ttl_seconds if ttl_seconds is not None else os.getenv("RERANK_CACHE_TTL", "86400"))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # digest -> (score, thời điểm hết hạn)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, normalized_query: str, result: Dict) -> bytes:
+        """Tạo khóa từ (model_version, query đã chuẩn hóa, point ID hoặc hash văn bản)"""
+        chunk_id = result.get("id")
+        chunk_key = f"id:{chunk_id}" if chunk_id else "text:" + hashlib.blake2b(
+            result.get("text", "").encode("utf-8"), digest_size=KEY_SIZE
+        ).hexdigest()
+        h = hashlib.blake2b(digest_size=KEY_SIZE)
+        for part in (self.model_version, normalized_query, chunk_key):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def lookup(self, query: str, results: List[Dict]) -> Tuple[List, List[int], List[bytes]]:
+        """
+        Tra cứu điểm của các cặp (query, result)
+
+        Returns:
+            Tuple (scores, missing, keys) - scores[i] là None với các vị trí thuộc missing,
+            keys dùng lại khi gọi store
+        """
+        normalized_query = normalize_query(query)
+        keys = [self.make_key(normalized_query, result) for result in results]
+        scores = [None] * len(results)
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None or entry[1] < now:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                scores[i] = entry[0]
+            self.hits += len(results) - len(missing)
+            self.misses += len(missing)
+        return scores, missing, keys
+
+    def store(self, keys: List[bytes], scores: List[float]):
+        """Lưu điểm của các khóa, loại bỏ phần tử ít dùng nhất khi vượt capacity"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._entries[key] = (float(score), expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Xóa toàn bộ nội dung cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Trả về số liệu hit/miss của cache"""
+        total = self.hits + self.misses
+        return {
+            "model_version": self.model_version,
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+        }
@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+from collections import deque
+from typing import List
+
+import numpy as np
+
+# Cấu hình logging
+logging.basicConfig(format="[Rerank Scheduler] %(message)s", level=logging.INFO)
+# Ghi đè hàm print để thêm prefix
+original_print = print
+
+
+def print(*args, **kwargs):
+    prefix = "[Rerank Scheduler] "
+    original_print(prefix + " ".join(map(str, args)), **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+
+class _RerankJob:
+    """Các cặp (query, passage) của một request đang chờ chấm điểm"""
+
+    __slots__ = ("pairs", "costs", "scores", "remaining", "done", "error")
+
+    def __init__(self, pairs, costs):
+        self.pairs = pairs
+        self.costs = costs
+        self.scores = np.zeros(len(pairs), dtype=np.float32)
+        self.remaining = len(pairs)
+        self.done = threading.Event()
+        self.error = None
+
+
+class RerankScheduler:
+    """
+    Gom các cặp (query, passage) của nhiều request đồng thời vào chung các lượt forward của cross-encoder
+
+    Một thread worker lấy các cặp đang chờ theo thứ tự đến, xếp vào một lượt cho tới khi
+    (số cặp x độ dài token lớn nhất) vượt RERANK_TOKEN_BUDGET, chạy model một lần rồi trả điểm
+    về đúng request. Khi model rảnh, request được chạy ngay (không có cửa sổ chờ gom batch) nên
+    độ trễ của một request đơn lẻ không tăng; các request đến trong lúc model đang chạy được gom
+    vào lượt kế tiếp. Số cặp chờ tối đa là RERANK_MAX_PENDING_PAIRS: vượt quá thì request mới
+    phải chờ (backpressure) thay vì xếp hàng vô hạn.
+    """
+
+    def __init__(self, model, token_budget: int = None, max_pending_pairs: int = None):
+        """Khởi tạo scheduler cho một model CrossEncoder (worker được tạo khi có request đầu tiên)"""
+        self.model = model
+        self.token_budget = int(token_budget or os.getenv("RERANK_TOKEN_BUDGET", "8192"))
+        self.max_pending_pairs = int(max_pending_pairs or os.getenv("RERANK_MAX_PENDING_PAIRS", "512"))
+        self.max_length = int(getattr(model, "max_length", None) or 512)
+        # Model nhận cặp đã mã hóa (PassageTokenEncoder) thì biết chính xác số token của từng cặp
+        self._count_tokens = getattr(model, "count_tokens", None)
+
+        self._cond = threading.Condition()
+        self._queue = deque()  # (job, vị trí cặp trong job)
+        self._pending = 0
+        self._worker = None
+
+        self.requests = 0
+        self.forward_passes = 0
+        self.scored_pairs = 0
+        self.max_pass_pairs = 0
+        self.backpressure_waits = 0
+
+    def _estimate_tokens(self, pair) -> int:
+        """Ước lượng số token của một cặp (khoảng 4 ký tự/token, tối đa max_length) để xếp lượt"""
+        if self._count_tokens is not None:
+            return self._count_tokens(pair)
+        query, passage = pair
+        return min(self.max_length, (len(query) + len(passage)) // 4 + 3)
+
+    def predict(self, pairs: List, batch_size: int = None) -> np.ndarray:
+        """
+        Chấm điểm các cặp (query, passage) hoặc cặp đã mã hóa, dùng thay cho predict của model
+
+        batch_size được bỏ qua: kích thước lượt do token budget quyết định.
+        Gọi từ thread (thread pool hoặc code đồng bộ), chặn cho tới khi có đủ điểm.
+        """
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+
+        job = _RerankJob(list(pairs), [self._estimate_tokens(pair) for pair in pairs])
+        with self._cond:
+            # Backpressure: chờ hàng đợi có chỗ (request lớn hơn giới hạn vẫn được nhận khi hàng đợi rỗng)
+            if self._pending and self._pending + len(pairs) > self.max_pending_pairs:
+                self.backpressure_waits += 1
+                while self._pending and self._pending + len(pairs) > self.max_pending_pairs:
+                    self._cond.wait()
+            self._queue.extend((job, i) for i in range(len(pairs)))
+            self._pending += len(pairs)
+            self.requests += 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="rerank-scheduler", daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.scores
+
+    def _next_pass(self):
+        """Lấy các cặp cho lượt forward tiếp theo trong giới hạn token budget (gọi khi giữ lock)"""
+        batch = []
+        max_tokens = 0
+        while self._queue:
+            job, i = self._queue[0]
+            new_max = max(max_tokens, job.costs[i])
+            if batch and new_max * (len(batch) + 1) > self.token_budget:
+                break
+            batch.append(self._queue.popleft())
+            max_tokens = new_max
+        return batch
+
+    def _run(self):
+        """Vòng lặp của worker: lấy một lượt, chạy model, trả điểm về từng request"""
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = self._next_pass()
+
+            try:
+                scores = self.model.predict([job.pairs[i] for job, i in batch], batch_size=len(batch))
+                scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+                error = None
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                released = len(batch)
+                if error is None:
+                    for (job, i), score in zip(batch, scores):
+                        job.scores[i] = score
+                        job.remaining -= 1
+                        if job.remaining == 0:
+                            job.done.set()
+                else:
+                    print(f"Lỗi khi chạy reranker: {str(error)}")
+                    failed = {id(job): job for job, _ in batch}
+                    for job in failed.values():
+                        job.error = error
+                        job.done.set()
+                    # Bỏ các cặp còn lại của những request đã lỗi
+                    remaining = deque(item for item in self._queue if id(item[0]) not in failed)
+                    released += len(self._queue) - len(remaining)
+                    self._queue = remaining
+                self._pending -= released
+                self.forward_passes += 1
+                self.scored_pairs += len(batch)
+                self.max_pass_pairs = max(self.max_pass_pairs, len(batch))
+                self._cond.notify_all()
+
+            request_count = len({id(job) for job, _ in batch})
+            if request_count > 1:
+                print(f"Micro-batch: {len(batch)} cặp của {request_count} request trong một lượt")
+
+    def get_stats(self) -> dict:
+        """Số request, số lượt forward, số cặp trung bình mỗi lượt và số lần phải chờ do backpressure"""
+        with self._cond:
+            return {
+                "token_budget": self.token_budget,
+                "max_pending_pairs": self.max_pending_pairs,
+                "pending_pairs": self._pending,
+                "requests": self.requests,
+                "forward_passes": self.forward_passes,
+                "avg_pairs_per_pass": round(self.scored_pairs / self.forward_passes, 2) if self.forward_passes else 0.0,
+                "max_pairs_per_pass": self.max_pass_pairs,
+                "backpressure_waits": self.backpressure_waits,
+            }
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Migration: chuyển payload của các point đã index trước đây sang dạng gọn
+
+- Gộp các cờ boolean (chứa_định_nghĩa, chứa_cú_pháp_select, ...) trong metadata thành
+  một số nguyên feature_flags và xóa các cờ đó khỏi metadata
+- Thêm mã số chunk_type_id và category_id
+
+Chỉ xử lý các point chưa có feature_flags nên có thể chạy lại nhiều lần. Trong lúc chưa
+backfill, reranker vẫn tính bitmask từ các cờ trong metadata nên không cần dừng hệ thống.
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/backfill_feature_flags.py                 # Tất cả collection
+  python backend/scripts/backfill_feature_flags.py --collection global_documents
+  python backend/scripts/backfill_feature_flags.py --dry-run       # Chỉ đếm số point cần chuyển
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from qdrant_client import models
+
+from backend.chunk_features import FEATURE_FIELD, compact_payload
+from backend.vector_store import VectorStore
+
+PENDING_FILTER = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=FEATURE_FIELD))])
+
+
+def backfill_collection(vector_store, collection_name, batch_size):
+    """Ghi đè payload gọn cho các point chưa có feature_flags, trả về số point đã chuyển"""
+    client = vector_store.client
+    converted = 0
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=PENDING_FILTER,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        if records:
+            client.batch_update_points(
+                collection_name=collection_name,
+                update_operations=[
+                    models.OverwritePayloadOperation(
+                        overwrite_payload=models.SetPayload(
+                            payload=compact_payload(record.payload or {}),
+                            points=[record.id],
+                        )
+                    )
+                    for record in records
+                ],
+                wait=True,
+            )
+            converted += len(records)
+        if offset is None:
+            break
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển cờ metadata của các point cũ sang bitmask feature_flags")
+    parser.add_argument("--collection", default=None, help="Chỉ xử lý một collection")
+    parser.add_argument("--batch-size", type=int, default=256, help="Số point mỗi lần scroll/ghi")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm số point cần chuyển")
+    args = parser.parse_args()
+
+    vector_store = VectorStore()
+    if args.collection:
+        collection_names = [args.collection]
+    else:
+        collection_names = [c.name for c in vector_store.client.get_collections().collections]
+
+    failed = 0
+    for collection_name in collection_names:
+        try:
+            pending = vector_store.client.count(
+                collection_name=collection_name, count_filter=PENDING_FILTER, exact=True
+            ).count
+            if not pending:
+                print(f"✅ {collection_name}: tất cả point đã có {FEATURE_FIELD}")
+                continue
+            if args.dry_run:
+                print(f"🔍 {collection_name}: {pending} point chưa có {FEATURE_FIELD}")
+                continue
+            converted = backfill_collection(vector_store, collection_name, args.batch_size)
+            print(f"✅ {collection_name}: đã chuyển {converted} point")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {collection_name}: {str(e)}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark encode theo batch cố định (batch_size=32) so với encode theo bucket độ dài
+trên các chunk thật được tạo từ thư mục tài liệu (UPLOAD_DIR)
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/benchmark_embedding_batching.py
+  python backend/scripts/benchmark_embedding_batching.py --data-dir backend/data --repeats 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+from backend.embedding import EmbeddingModel
+from backend.scripts.corpus_utils import load_corpus_texts
+
+
+def padded_tokens(lengths, batches):
+    """Tổng số token sau khi pad (batch_size x độ dài lớn nhất trong batch)"""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark encode theo bucket độ dài")
+    parser.add_argument("--data-dir", default=None, help="Thư mục tài liệu (mặc định UPLOAD_DIR)")
+    parser.add_argument("--limit", type=int, default=None, help="Số chunk tối đa")
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size cố định để so sánh")
+    parser.add_argument("--repeats", type=int, default=3, help="Số lần lặp, lấy thời gian nhỏ nhất")
+    args = parser.parse_args()
+
+    texts = load_corpus_texts(args.data_dir, args.limit)
+    # Tắt cache để đo đúng chi phí của model
+    model = EmbeddingModel(use_cache=False)
+    lengths = model.get_token_lengths(texts)
+
+    print(f"Corpus: {len(texts)} chunk, token min={min(lengths)}, max={max(lengths)}, trung bình={np.mean(lengths):.1f}")
+
+    # Lượng padding theo thứ tự tài liệu với batch cố định
+    fixed_batches = [
+        list(range(i, min(i + args.batch_size, len(texts))))
+        for i in range(0, len(texts), args.batch_size)
+    ]
+    bucket_batches = model.plan_buckets(lengths)
+    real_tokens = sum(lengths)
+    print(
+        f"Tỉ lệ padding - cố định: {padded_tokens(lengths, fixed_batches) / real_tokens:.2f}x "
+        f"({len(fixed_batches)} batch), bucket: {padded_tokens(lengths, bucket_batches) / real_tokens:.2f}x "
+        f"({len(bucket_batches)} batch, token_budget={model.token_budget})"
+    )
+
+    fixed_times = []
+    bucket_times = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        fixed = model.model.encode(texts, batch_size=args.batch_size, show_progress_bar=False)
+        fixed_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        bucketed = model.encode_bucketed(texts, show_progress=False)
+        bucket_times.append(time.perf_counter() - start)
+
+    diff = np.abs(np.asarray(fixed) - bucketed).max()
+    print(f"\n=== KẾT QUẢ ({args.repeats} lần lặp, lấy thời gian nhỏ nhất) ===")
+    print(f"Batch cố định ({args.batch_size}): {min(fixed_times):.2f}s ({len(texts) / min(fixed_times):.1f} chunk/s)")
+    print(f"Bucket độ dài:        {min(bucket_times):.2f}s ({len(texts) / min(bucket_times):.1f} chunk/s)")
+    print(f"Tăng tốc: {min(fixed_times) / min(bucket_times):.2f}x")
+    print(f"Sai lệch lớn nhất giữa hai cách (kiểm tra thứ tự): {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
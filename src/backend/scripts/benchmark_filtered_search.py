@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark độ trễ tìm kiếm có filter trên Qdrant trước và sau khi tạo payload index
+
+Script tạo một collection tạm với dữ liệu tổng hợp (nhiều file, nhiều danh mục),
+đo các truy vấn giống search_with_filter / delete_by_file_id / get_document_by_category,
+tạo payload index rồi đo lại. Collection tạm bị xóa khi kết thúc (trừ khi dùng --keep).
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/benchmark_filtered_search.py
+  python backend/scripts/benchmark_filtered_search.py --points 100000 --files 500
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+from qdrant_client import models
+
+from backend.vector_store import VectorStore
+
+CATEGORIES = ["SQL", "NoSQL", "Thiết kế CSDL", "Giao tác"]
+
+
+def populate(vector_store, collection_name, num_points, num_files, dim, rng):
+    """Tạo collection tạm (không có payload index) và nạp dữ liệu tổng hợp"""
+    vector_store.client.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+    )
+    batch_size = 1000
+    for start in range(0, num_points, batch_size):
+        count = min(batch_size, num_points - start)
+        vectors = rng.standard_normal((count, dim)).astype(np.float32)
+        points = []
+        for offset in range(count):
+            file_index = (start + offset) % num_files
+            source = f"tai_lieu_{file_index}.pdf"
+            points.append(
+                models.PointStruct(
+                    id=start + offset,
+                    vector=vectors[offset].tolist(),
+                    payload={
+                        "text": f"chunk {start + offset}",
+                        "source": source,
+                        "file_id": f"file-{file_index}",
+                        "metadata": {
+                            "source": source,
+                            "category": CATEGORIES[file_index % len(CATEGORIES)],
+                        },
+                    },
+                )
+            )
+        vector_store.client.upsert(collection_name=collection_name, points=points, wait=True)
+    print(f"Đã nạp {num_points} điểm ({num_files} file) vào {collection_name}")
+
+
+def measure(vector_store, collection_name, num_queries, num_files, dim, seed):
+    """Đo độ trễ (ms) của từng loại truy vấn có filter"""
+    rng = np.random.default_rng(seed)
+    client = vector_store.client
+    latencies = {"search file_id": [], "search 2 sources": [], "scroll category": [], "count file_id": []}
+
+    for _ in range(num_queries):
+        query_vector = rng.standard_normal(dim).astype(np.float32).tolist()
+        file_a, file_b = rng.integers(0, num_files, size=2)
+        file_filter = models.Filter(
+            must=[models.FieldCondition(key="file_id", match=models.MatchValue(value=f"file-{file_a}"))]
+        )
+        sources_filter = models.Filter(
+            must=[
+                models.Filter(
+                    should=[
+                        models.FieldCondition(key="source", match=models.MatchValue(value=f"tai_lieu_{f}.pdf"))
+                        for f in (file_a, file_b)
+                    ]
+                )
+            ]
+        )
+        category_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="metadata.category",
+                    match=models.MatchValue(value=CATEGORIES[file_a % len(CATEGORIES)]),
+                )
+            ]
+        )
+
+        start = time.perf_counter()
+        client.search(collection_name=collection_name, query_vector=query_vector, query_filter=file_filter, limit=10)
+        latencies["search file_id"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        client.search(collection_name=collection_name, query_vector=query_vector, query_filter=sources_filter, limit=10)
+        latencies["search 2 sources"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        client.scroll(collection_name=collection_name, scroll_filter=category_filter, limit=100, with_vectors=False)
+        latencies["scroll category"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        client.count(collection_name=collection_name, count_filter=file_filter, exact=True)
+        latencies["count file_id"].append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filter trước/sau khi tạo payload index")
+    parser.add_argument("--points", type=int, default=50000, help="Số điểm tổng hợp")
+    parser.add_argument("--files", type=int, default=200, help="Số file khác nhau")
+    parser.add_argument("--dim", type=int, default=384, help="Kích thước vector")
+    parser.add_argument("--queries", type=int, default=100, help="Số truy vấn mỗi loại")
+    parser.add_argument("--keep", action="store_true", help="Giữ lại collection tạm")
+    args = parser.parse_args()
+
+    collection_name = f"bench_payload_index_{uuid.uuid4().hex[:8]}"
+    vector_store = VectorStore(collection_name=collection_name)
+    rng = np.random.default_rng(0)
+
+    try:
+        populate(vector_store, collection_name, args.points, args.files, args.dim, rng)
+        # Làm nóng kết nối trước khi đo
+        measure(vector_store, collection_name, 5, args.files, args.dim, seed=99)
+
+        before = measure(vector_store, collection_name, args.queries, args.files, args.dim, seed=1)
+        start = time.perf_counter()
+        vector_store.ensure_payload_indexes(collection_name)
+        print(f"Tạo payload index mất {time.perf_counter() - start:.2f}s")
+        after = measure(vector_store, collection_name, args.queries, args.files, args.dim, seed=1)
+
+        print(f"\n=== KẾT QUẢ ({args.points} điểm, {args.files} file, {args.queries} truy vấn/loại) ===")
+        print(f"{'truy vấn':<18} {'trước p50':>10} {'trước p95':>10} {'sau p50':>10} {'sau p95':>10} {'tăng tốc':>9}")
+        for name in before:
+            b50, b95 = np.percentile(before[name], [50, 95])
+            a50, a95 = np.percentile(after[name], [50, 95])
+            print(
+                f"{name:<18} {b50:>8.1f}ms {b95:>8.1f}ms {a50:>8.1f}ms {a95:>8.1f}ms {b50 / a50:>8.2f}x"
+            )
+    finally:
+        if not args.keep:
+            vector_store.client.delete_collection(collection_name)
+            print(f"Đã xóa collection tạm {collection_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Đo đánh đổi recall / độ trễ của tìm kiếm có lượng tử hóa trên collection thật,
+dùng các câu hỏi thật trong query log (bảng messages, role=user)
+
+Ground truth là tìm kiếm vét cạn trên vector gốc (SearchParams(exact=True)).
+Mỗi cấu hình (fast, balanced với nhiều hệ số oversampling, exact) được so với ground truth.
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/benchmark_quantization.py
+  python backend/scripts/benchmark_quantization.py --quantization scalar   # Bật int8 rồi đo
+  python backend/scripts/benchmark_quantization.py --quantization binary --oversampling 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+from qdrant_client import models
+
+from backend.embedding import EmbeddingModel
+from backend.scripts.corpus_utils import load_query_log
+from backend.vector_store import VectorStore, build_search_params
+
+
+def wait_until_ready(vector_store, collection_name, timeout=600):
+    """Chờ Qdrant dựng xong vector lượng tử hóa (collection chuyển về trạng thái green)"""
+    start = time.time()
+    while time.time() - start < timeout:
+        status = vector_store.client.get_collection(collection_name).status
+        if status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(2)
+    print(f"⚠️ Collection vẫn chưa sẵn sàng sau {timeout}s, kết quả có thể chưa chính xác")
+
+
+def run_queries(vector_store, collection_name, query_vectors, limit, search_params):
+    """Chạy tất cả truy vấn, trả về (danh sách ID kết quả, danh sách độ trễ ms)"""
+    ids = []
+    latencies = []
+    for query_vector in query_vectors:
+        start = time.perf_counter()
+        hits = vector_store.client.search(
+            collection_name=collection_name,
+            query_vector=query_vector,
+            limit=limit,
+            search_params=search_params,
+            with_payload=False,
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([hit.id for hit in hits])
+    return ids, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall / độ trễ của tìm kiếm lượng tử hóa")
+    parser.add_argument("--collection", default="global_documents", help="Collection cần đo")
+    parser.add_argument("--queries", type=int, default=200, help="Số câu hỏi lấy từ query log")
+    parser.add_argument("--limit", type=int, default=50, help="Số kết quả mỗi truy vấn (RETRIEVAL_K)")
+    parser.add_argument(
+        "--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0], help="Các hệ số oversampling cần đo"
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["none", "scalar", "binary"],
+        default=None,
+        help="Đổi cấu hình lượng tử hóa của collection trước khi đo (thay đổi collection thật)",
+    )
+    args = parser.parse_args()
+
+    vector_store = VectorStore(collection_name=args.collection)
+    if args.quantization:
+        vector_store.update_quantization(args.quantization, args.collection)
+        wait_until_ready(vector_store, args.collection)
+
+    info = vector_store.client.get_collection(args.collection)
+    print(f"Collection {args.collection}: {info.points_count} điểm, lượng tử hóa: {info.config.quantization_config}")
+
+    queries = load_query_log(args.queries)
+    embedding_model = EmbeddingModel()
+    query_vectors = [vector.tolist() for vector in embedding_model.encode_batch_sync(queries)]
+    print(f"Đo trên {len(queries)} câu hỏi, top-{args.limit}")
+
+    # Ground truth: vét cạn trên vector gốc
+    truth, truth_latencies = run_queries(
+        vector_store, args.collection, query_vectors, args.limit, models.SearchParams(exact=True)
+    )
+
+    configs = [("fast", build_search_params("fast"))]
+    configs += [
+        (f"balanced x{factor:g}", build_search_params("balanced", oversampling=factor))
+        for factor in args.oversampling
+    ]
+    configs.append(("exact (HNSW gốc)", build_search_params("exact")))
+
+    print(f"\n{'cấu hình':<18} {f'recall@{args.limit}':>10} {'p50':>9} {'p95':>9}")
+    print(
+        f"{'vét cạn':<18} {1.0:>10.4f} {np.percentile(truth_latencies, 50):>7.1f}ms "
+        f"{np.percentile(truth_latencies, 95):>7.1f}ms"
+    )
+    for name, search_params in configs:
+        ids, latencies = run_queries(vector_store, args.collection, query_vectors, args.limit, search_params)
+        recall = np.mean(
+            [len(set(found) & set(expected)) / max(len(expected), 1) for found, expected in zip(ids, truth)]
+        )
+        print(
+            f"{name:<18} {recall:>10.4f} {np.percentile(latencies, 50):>7.1f}ms "
+            f"{np.percentile(latencies, 95):>7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
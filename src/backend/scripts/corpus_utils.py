@@ -0,0 +1,102 @@
+"""
+Tiện ích dùng chung cho các script benchmark: tải chunk văn bản thật từ thư mục tài liệu
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Câu mẫu dùng khi thư mục tài liệu rỗng
+FALLBACK_TEXTS = [
+    "Khóa chính (primary key) là thuộc tính dùng để định danh duy nhất mỗi bộ trong quan hệ.",
+    "SELECT MaSV, HoTen FROM SinhVien WHERE Lop = 'DA21TTB' ORDER BY HoTen;",
+    "Mệnh đề HAVING dùng để lọc các nhóm sau khi GROUP BY, khác với WHERE lọc từng dòng.",
+    "Dạng chuẩn 3 (3NF) yêu cầu không có phụ thuộc bắc cầu vào khóa chính.",
+    "INNER JOIN chỉ trả về các dòng khớp ở cả hai bảng, LEFT JOIN giữ lại mọi dòng của bảng trái.",
+    "Giao tác (transaction) phải đảm bảo tính chất ACID: nguyên tử, nhất quán, cô lập, bền vững.",
+    "CREATE TABLE Lop (MaLop CHAR(10) PRIMARY KEY, TenLop NVARCHAR(50) NOT NULL);",
+    "Chỉ mục (index) giúp tăng tốc truy vấn nhưng làm chậm thao tác INSERT và UPDATE.",
+]
+
+# Câu hỏi mẫu cho benchmark truy vấn / rerank
+SAMPLE_QUERIES = [
+    "Khóa chính là gì?",
+    "Cú pháp câu lệnh SELECT có điều kiện WHERE",
+    "So sánh INNER JOIN và LEFT JOIN",
+    "HAVING khác WHERE như thế nào?",
+    "Dạng chuẩn 3NF là gì?",
+    "Tính chất ACID của giao tác",
+    "Cách tạo bảng với khóa ngoại",
+    "Lỗi vi phạm ràng buộc khóa ngoại",
+]
+
+
+def load_corpus_chunks(data_dir: str = None, limit: int = None):
+    """
+    Tải và chia chunk toàn bộ tài liệu trong data_dir (mặc định UPLOAD_DIR)
+    bằng DocumentProcessor giống như luồng upload thật
+
+    Returns:
+        Danh sách chunk dict (text, metadata, source)
+    """
+    from backend.document_processor import DocumentProcessor
+
+    data_dir = data_dir or os.getenv("UPLOAD_DIR", "backend/data")
+    processor = DocumentProcessor()
+    chunks = []
+    if os.path.isdir(data_dir):
+        documents = processor.load_documents(data_dir)
+        chunks = processor.process_documents(documents)
+
+    if not chunks:
+        print(f"Không tìm thấy tài liệu trong {data_dir}, dùng câu mẫu")
+        chunks = [
+            {"text": text, "metadata": {"source": "sample"}, "source": "sample"}
+            for text in FALLBACK_TEXTS
+        ]
+
+    if limit:
+        chunks = chunks[:limit]
+    return chunks
+
+
+def load_corpus_texts(data_dir: str = None, limit: int = None):
+    """Giống load_corpus_chunks nhưng chỉ trả về danh sách văn bản"""
+    return [chunk["text"] for chunk in load_corpus_chunks(data_dir, limit)]
+
+
+def load_query_log(limit: int = 200):
+    """
+    Tải các câu hỏi thật của người dùng (bảng messages, role=user) từ Supabase,
+    mới nhất trước, bỏ trùng. Dùng SAMPLE_QUERIES nếu không kết nối được.
+    """
+    try:
+        from backend.supabase.client import SupabaseClient
+
+        client = SupabaseClient(use_service_key=True).get_client()
+        result = (
+            client.table("messages")
+            .select("content")
+            .eq("role", "user")
+            .order("message_id", desc=True)
+            .limit(limit * 2)
+            .execute()
+        )
+        queries = []
+        seen = set()
+        for row in result.data or []:
+            content = (row.get("content") or "").strip()
+            if content and content not in seen:
+                seen.add(content)
+                queries.append(content)
+        if queries:
+            return queries[:limit]
+        print("Bảng messages chưa có câu hỏi nào, dùng câu hỏi mẫu")
+    except Exception as e:
+        print(f"Không tải được query log từ Supabase ({str(e)}), dùng câu hỏi mẫu")
+    return list(SAMPLE_QUERIES)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Migration: tạo keyword payload index (file_id, source, metadata.source, metadata.category)
+cho các collection Qdrant đã tồn tại từ trước
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/create_payload_indexes.py                 # Tất cả collection
+  python backend/scripts/create_payload_indexes.py --collection global_documents
+  python backend/scripts/create_payload_indexes.py --dry-run       # Chỉ kiểm tra
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.vector_store import PAYLOAD_INDEX_FIELDS, VectorStore
+
+
+def missing_indexes(vector_store, collection_name):
+    """Các trường chưa có index hoặc index sai kiểu"""
+    payload_schema = vector_store.client.get_collection(collection_name).payload_schema or {}
+    return [
+        field_name
+        for field_name, field_schema in PAYLOAD_INDEX_FIELDS.items()
+        if field_name not in payload_schema or payload_schema[field_name].data_type != field_schema
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tạo payload index cho các collection đã có")
+    parser.add_argument("--collection", default=None, help="Chỉ xử lý một collection")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ liệt kê index còn thiếu")
+    args = parser.parse_args()
+
+    vector_store = VectorStore()
+    if args.collection:
+        collection_names = [args.collection]
+    else:
+        collection_names = [c.name for c in vector_store.client.get_collections().collections]
+
+    failed = 0
+    for collection_name in collection_names:
+        try:
+            missing = missing_indexes(vector_store, collection_name)
+            if not missing:
+                print(f"✅ {collection_name}: đã đủ payload index")
+                continue
+            if args.dry_run:
+                print(f"🔍 {collection_name}: thiếu index cho {', '.join(missing)}")
+                continue
+            created = vector_store.ensure_payload_indexes(collection_name)
+            print(f"✅ {collection_name}: đã tạo index cho {', '.join(created)}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {collection_name}: {str(e)}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Script export model embedding và reranker sang ONNX int8, kiểm tra sai lệch so với
+bản fp32 (PyTorch) và benchmark độ trễ / bộ nhớ của hai backend
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/export_onnx_models.py export      # Export + lượng tử hóa (một lần)
+  python backend/scripts/export_onnx_models.py parity      # So sánh đầu ra int8 với fp32
+  python backend/scripts/export_onnx_models.py benchmark   # So sánh độ trễ và bộ nhớ
+
+Yêu cầu: pip install "sentence-transformers[onnx]"
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+from backend.onnx_backend import (
+    export_quantized_model,
+    get_quantization_config,
+    is_exported,
+    load_cross_encoder,
+    load_sentence_transformer,
+)
+from backend.scripts.corpus_utils import SAMPLE_QUERIES, load_corpus_texts
+
+
+def get_model_names():
+    """Lấy tên model embedding và reranker từ biến môi trường (giống lúc chạy API)"""
+    embedding_model = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-base")
+    reranker_model = os.getenv("RERANKER_MODEL", "ms-marco-MiniLM-L-12-v2")
+    return embedding_model, reranker_model
+
+
+def cmd_export(args):
+    """Export cả hai model sang ONNX int8"""
+    embedding_model, reranker_model = get_model_names()
+    export_quantized_model(embedding_model, "embedding", args.config)
+    export_quantized_model(reranker_model, "reranker", args.config)
+    print("✅ Đã export xong. Đặt EMBEDDING_BACKEND=onnx và RERANKER_BACKEND=onnx để sử dụng.")
+
+
+def cmd_parity(args):
+    """So sánh đầu ra của bản int8 với bản fp32 trên dữ liệu thật"""
+    embedding_model, reranker_model = get_model_names()
+    if not is_exported(embedding_model) or not is_exported(reranker_model):
+        print("❌ Chưa export model. Chạy lệnh export trước.")
+        sys.exit(1)
+
+    texts = load_corpus_texts(limit=args.limit)
+    print(f"Kiểm tra sai lệch trên {len(texts)} chunk, {len(SAMPLE_QUERIES)} câu hỏi")
+
+    # Embedding: cosine giữa vector fp32 và int8, độ trùng top-k láng giềng
+    fp32 = load_sentence_transformer(embedding_model, "torch")
+    int8 = load_sentence_transformer(embedding_model, "onnx")
+    ref = fp32.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    quant = int8.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    cosine = np.sum(ref * quant, axis=1)
+    print("\n=== EMBEDDING ===")
+    print(f"Cosine fp32/int8: trung bình={cosine.mean():.4f}, thấp nhất={cosine.min():.4f}")
+
+    k = min(5, len(texts))
+    q_ref = fp32.encode(SAMPLE_QUERIES, normalize_embeddings=True, show_progress_bar=False)
+    q_quant = int8.encode(SAMPLE_QUERIES, normalize_embeddings=True, show_progress_bar=False)
+    top_ref = np.argsort(-(q_ref @ ref.T), axis=1)[:, :k]
+    top_quant = np.argsort(-(q_quant @ quant.T), axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_quant)])
+    print(f"Độ trùng top-{k} khi tìm kiếm: {overlap:.2%}")
+
+    # Reranker: sai lệch điểm và độ trùng thứ hạng
+    fp32_ce = load_cross_encoder(reranker_model, "torch")
+    int8_ce = load_cross_encoder(reranker_model, "onnx")
+    abs_diffs = []
+    top1_agree = 0
+    rank_corr = []
+    for query, candidates in zip(SAMPLE_QUERIES, top_ref):
+        pairs = [(query, texts[i]) for i in candidates]
+        s_ref = np.asarray(fp32_ce.predict(pairs, show_progress_bar=False))
+        s_quant = np.asarray(int8_ce.predict(pairs, show_progress_bar=False))
+        abs_diffs.append(np.abs(s_ref - s_quant).max())
+        top1_agree += int(np.argmax(s_ref) == np.argmax(s_quant))
+        if len(pairs) > 1:
+            rank_corr.append(
+                np.corrcoef(np.argsort(np.argsort(s_ref)), np.argsort(np.argsort(s_quant)))[0, 1]
+            )
+    print("\n=== RERANKER ===")
+    print(f"Sai lệch điểm lớn nhất: {max(abs_diffs):.4f}")
+    print(f"Top-1 trùng khớp: {top1_agree}/{len(SAMPLE_QUERIES)}")
+    if rank_corr:
+        print(f"Tương quan thứ hạng (Spearman) trung bình: {np.nanmean(rank_corr):.4f}")
+
+
+def _max_rss_mb():
+    """Bộ nhớ RSS lớn nhất của tiến trình hiện tại (MB, Linux trả về KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _benchmark_backend(backend, texts, repeats, result_queue):
+    """Đo độ trễ và bộ nhớ của một backend trong tiến trình riêng để số liệu RSS độc lập"""
+    embedding_model, reranker_model = get_model_names()
+    rss_start = _max_rss_mb()
+    model = load_sentence_transformer(embedding_model, backend)
+    reranker = load_cross_encoder(reranker_model, backend)
+    rss_loaded = _max_rss_mb()
+
+    # Độ trễ encode một câu hỏi (đường truy vấn)
+    query_latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.encode(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)], show_progress_bar=False)
+        query_latencies.append((time.perf_counter() - start) * 1000)
+
+    # Thông lượng encode hàng loạt (đường ingest)
+    start = time.perf_counter()
+    model.encode(texts, batch_size=32, show_progress_bar=False)
+    bulk_seconds = time.perf_counter() - start
+
+    # Độ trễ rerank 15 cặp (giống RERANK_TOP_N mặc định)
+    rerank_latencies = []
+    for i in range(repeats):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        pairs = [(query, text) for text in texts[:15]]
+        start = time.perf_counter()
+        reranker.predict(pairs, batch_size=32, show_progress_bar=False)
+        rerank_latencies.append((time.perf_counter() - start) * 1000)
+
+    result_queue.put(
+        {
+            "backend": backend,
+            "load_rss_mb": rss_loaded - rss_start,
+            "peak_rss_mb": _max_rss_mb(),
+            "query_p50_ms": float(np.percentile(query_latencies, 50)),
+            "query_p95_ms": float(np.percentile(query_latencies, 95)),
+            "bulk_texts_per_s": len(texts) / bulk_seconds if bulk_seconds > 0 else 0.0,
+            "rerank_p50_ms": float(np.percentile(rerank_latencies, 50)),
+            "rerank_p95_ms": float(np.percentile(rerank_latencies, 95)),
+        }
+    )
+
+
+def cmd_benchmark(args):
+    """Benchmark torch và onnx, mỗi backend chạy trong một tiến trình riêng"""
+    texts = load_corpus_texts(limit=args.limit)
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for backend in ("torch", "onnx"):
+        queue = ctx.Queue()
+        process = ctx.Process(
+            target=_benchmark_backend, args=(backend, texts, args.repeats, queue)
+        )
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"\n=== BENCHMARK ({len(texts)} chunk, {args.repeats} lần lặp, config={get_quantization_config()}) ===")
+    header = f"{'backend':<8} {'load MB':>8} {'peak MB':>8} {'query p50':>10} {'query p95':>10} {'bulk/s':>8} {'rerank p50':>11} {'rerank p95':>11}"
+    print(header)
+    for r in results:
+        print(
+            f"{r['backend']:<8} {r['load_rss_mb']:>8.0f} {r['peak_rss_mb']:>8.0f} "
+            f"{r['query_p50_ms']:>8.1f}ms {r['query_p95_ms']:>8.1f}ms {r['bulk_texts_per_s']:>8.1f} "
+            f"{r['rerank_p50_ms']:>9.1f}ms {r['rerank_p95_ms']:>9.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / kiểm tra / benchmark backend ONNX int8")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export model sang ONNX int8")
+    export_parser.add_argument("--config", default=None, help="arm64, avx2, avx512, avx512_vnni")
+    export_parser.set_defaults(func=cmd_export)
+
+    parity_parser = subparsers.add_parser("parity", help="So sánh int8 với fp32")
+    parity_parser.add_argument("--limit", type=int, default=500, help="Số chunk tối đa")
+    parity_parser.set_defaults(func=cmd_parity)
+
+    bench_parser = subparsers.add_parser("benchmark", help="So sánh độ trễ và bộ nhớ")
+    bench_parser.add_argument("--limit", type=int, default=500, help="Số chunk tối đa")
+    bench_parser.add_argument("--repeats", type=int, default=50, help="Số lần lặp đo độ trễ")
+    bench_parser.set_defaults(func=cmd_benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
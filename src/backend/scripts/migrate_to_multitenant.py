@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Migration: gộp các collection user_<id> vào một collection chung phân vùng theo tenant_id
+
+- Tạo payload index tenant_id (is_tenant) và bật HNSW theo tenant (payload_m) cho collection chung
+- Gắn tenant_id = SHARED_TENANT_ID cho các tài liệu chung (admin) chưa có tenant_id
+- Chép toàn bộ point (kèm vector) của từng user_<id> sang collection chung với tenant_id = <id>,
+  đối chiếu số point rồi xóa collection cũ (trừ khi dùng --keep-source)
+
+Chạy migration trước khi bật VECTOR_STORE_MULTITENANT=true, nếu không tài liệu chung
+chưa có tenant_id sẽ không xuất hiện trong kết quả tìm kiếm.
+
+Cách sử dụng (chạy từ thư mục src):
+  python backend/scripts/migrate_to_multitenant.py --dry-run
+  python backend/scripts/migrate_to_multitenant.py
+  python backend/scripts/migrate_to_multitenant.py --keep-source --batch-size 512
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from qdrant_client import models
+
+from backend.vector_store import TENANT_FIELD, VectorStore
+
+
+def tenant_filter(tenant_id):
+    return models.Filter(
+        must=[models.FieldCondition(key=TENANT_FIELD, match=models.MatchValue(value=tenant_id))]
+    )
+
+
+def prepare_shared_collection(vector_store, vector_size):
+    """Tạo collection chung nếu chưa có, đảm bảo index tenant_id và payload_m"""
+    if not vector_store.collection_exists_sync():
+        vector_store.ensure_collection_exists_sync(vector_size)
+        return
+    vector_store.ensure_payload_indexes()
+    vector_store.client.update_collection(
+        collection_name=vector_store.collection_name,
+        hnsw_config=vector_store._collection_create_options()["hnsw_config"],
+    )
+
+
+def backfill_shared_tenant(vector_store, dry_run):
+    """Gắn tenant chung cho các point chưa có tenant_id (tài liệu admin đã index trước đây)"""
+    missing_filter = models.Filter(
+        must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=TENANT_FIELD))]
+    )
+    missing = vector_store.client.count(
+        collection_name=vector_store.collection_name, count_filter=missing_filter, exact=True
+    ).count
+    if dry_run:
+        print(f"🔍 {vector_store.collection_name}: {missing} point chưa có {TENANT_FIELD}")
+        return
+    if missing:
+        vector_store.client.set_payload(
+            collection_name=vector_store.collection_name,
+            payload={TENANT_FIELD: vector_store.shared_tenant_id},
+            points=missing_filter,
+            wait=True,
+        )
+    print(f"✅ {vector_store.collection_name}: gắn {TENANT_FIELD}={vector_store.shared_tenant_id} cho {missing} point")
+
+
+def migrate_collection(vector_store, source_name, batch_size):
+    """Chép một collection user_<id> sang collection chung, trả về số point đã chép"""
+    tenant_id = source_name[len("user_"):]
+    client = vector_store.client
+    copied = 0
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=source_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if records:
+            client.upsert(
+                collection_name=vector_store.collection_name,
+                points=[
+                    models.PointStruct(
+                        id=record.id,
+                        vector=record.vector,
+                        payload={**(record.payload or {}), TENANT_FIELD: tenant_id},
+                    )
+                    for record in records
+                ],
+                wait=True,
+            )
+            copied += len(records)
+        if offset is None:
+            break
+
+    source_count = client.count(collection_name=source_name, exact=True).count
+    migrated_count = client.count(
+        collection_name=vector_store.collection_name, count_filter=tenant_filter(tenant_id), exact=True
+    ).count
+    if migrated_count < source_count:
+        raise RuntimeError(f"chỉ có {migrated_count}/{source_count} point trong collection chung")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gộp các collection user_<id> vào collection multi-tenant")
+    parser.add_argument(
+        "--collection",
+        default=os.getenv("MULTITENANT_COLLECTION", "global_documents"),
+        help="Collection chung (mặc định MULTITENANT_COLLECTION)",
+    )
+    parser.add_argument("--batch-size", type=int, default=256, help="Số point mỗi lần scroll/upsert")
+    parser.add_argument("--keep-source", action="store_true", help="Giữ lại các collection user_<id> sau khi chép")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ liệt kê những gì sẽ được chuyển")
+    args = parser.parse_args()
+
+    vector_store = VectorStore(collection_name=args.collection)
+    # Migration luôn chạy với cấu hình multi-tenant (index tenant_id, payload_m)
+    vector_store.multitenant = True
+    vector_store.tenant_collection = args.collection
+
+    user_collections = sorted(
+        c.name for c in vector_store.client.get_collections().collections if c.name.startswith("user_")
+    )
+    print(f"Tìm thấy {len(user_collections)} collection theo user")
+
+    if args.dry_run:
+        for name in user_collections:
+            count = vector_store.client.count(collection_name=name, exact=True).count
+            print(f"🔍 {name}: {count} point -> {args.collection} ({TENANT_FIELD}={name[len('user_'):]})")
+        if vector_store.collection_exists_sync():
+            backfill_shared_tenant(vector_store, dry_run=True)
+        return
+
+    vector_size = None
+    if user_collections:
+        vector_size = vector_store.get_collection_meta_sync(user_collections[0])["vector_size"]
+    if vector_size is None and not vector_store.collection_exists_sync():
+        print(f"❌ Collection {args.collection} chưa tồn tại và không có dữ liệu để chuyển")
+        sys.exit(1)
+
+    prepare_shared_collection(vector_store, vector_size)
+    backfill_shared_tenant(vector_store, dry_run=False)
+    shared_size = vector_store.get_collection_meta_sync()["vector_size"]
+
+    failed = 0
+    for name in user_collections:
+        try:
+            source_size = vector_store.get_collection_meta_sync(name)["vector_size"]
+            if source_size != shared_size:
+                raise RuntimeError(f"vector_size={source_size} khác collection chung ({shared_size})")
+            copied = migrate_collection(vector_store, name, args.batch_size)
+            if not args.keep_source:
+                vector_store.client.delete_collection(name)
+                vector_store.invalidate_collection_cache(name)
+            print(f"✅ {name}: đã chuyển {copied} point{'' if args.keep_source else ', đã xóa collection cũ'}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {str(e)}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,10 +15,15 @@ def print(*args, **kwargs):
 
 logger = logging.getLogger(__name__)
 import re
+import threading
+import time
 import numpy as np
-from sentence_transformers import CrossEncoder
+from backend.onnx_backend import get_backend, load_cross_encoder
+from backend.chunk_features import apply_boosts
+from backend.rerank_cache import RerankScoreCache
+from backend.rerank_scheduler import RerankScheduler
+from backend.passage_tokens import PassageTokenEncoder
 import os
-import pickle
 import json
 from dotenv import load_dotenv
 
@@ -33,17 +38,10 @@ class SearchManager:
         """Khởi tạo search manager"""
         self.vector_store = vector_store
         self.embedding_model = embedding_model
-        self.corpus = []
-        self.doc_mappings = []
-        self.bm25 = None
-        self.bm25_initialized = False
+        # Tìm kiếm lai: kết quả vector được gộp với BM25 (chỉ mục do vector_store quản lý)
+        # bằng reciprocal rank fusion, điểm của hạng r là 1 / (RRF_K + r)
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
 
-        # Đường dẫn lưu BM25 index
-        self.data_dir = os.getenv("UPLOAD_DIR", "backend/data")
-        
-        # Lấy user_id từ vector_store
-        user_id = self.vector_store.user_id if hasattr(self.vector_store, 'user_id') else None
-        
         # Tải trước model reranking để tránh tải lại mỗi lần cần rerank
         print("Đang tải model reranking...")
 
@@ -52,8 +50,11 @@ class SearchManager:
         default_reranker_model = "ms-marco-MiniLM-L-12-v2"  
         reranker_model = os.getenv("RERANKER_MODEL", default_reranker_model)
 
+        # Backend suy luận cho reranker: torch (mặc định) hoặc onnx int8
+        self.reranker_backend = get_backend("RERANKER_BACKEND")
+
         try:
-            self.reranker = CrossEncoder(reranker_model)
+            self.reranker = load_cross_encoder(reranker_model, self.reranker_backend)
             print(f"Đã tải xong model reranking: {reranker_model}")
         except Exception as e:
             print(f"Lỗi khi tải model reranking {reranker_model}: {str(e)}")
@@ -61,7 +62,7 @@ class SearchManager:
             # Sử dụng model dự phòng nếu có lỗi
             backup_model = "cross-encoder/ms-marco-MiniLM-L-6-v2"
             try:
-                self.reranker = CrossEncoder(backup_model)
+                self.reranker = load_cross_encoder(backup_model, self.reranker_backend)
                 print(f"Đã tải model dự phòng: {backup_model}")
                 reranker_model = backup_model  # Update model name for later reference
             except Exception as backup_error:
@@ -71,32 +72,98 @@ class SearchManager:
         # Lưu thông tin về model đang sử dụng
         self.reranker_model_name = reranker_model
 
+        # Cache điểm cross-encoder theo (query đã chuẩn hóa, chunk), khóa gắn với model + backend
+        self.rerank_cache = None
+        if os.getenv("RERANK_CACHE_ENABLED", "true").lower() == "true":
+            self.rerank_cache = RerankScoreCache(f"{self.reranker_model_name}@{self.reranker_backend}")
+
+        # Cache token ID của passage và chạy reranker trên tensor đã mã hóa sẵn (RERANK_PRETOKENIZE)
+        self.pretokenize = os.getenv("RERANK_PRETOKENIZE", "true").lower() == "true"
+        self.rerank_encoder = PassageTokenEncoder.create(self.reranker) if self.pretokenize else None
+
+        # Gom cặp của các request đồng thời vào chung lượt forward của reranker (RERANK_SCHEDULER_ENABLED)
+        self.rerank_scheduler = None
+        if os.getenv("RERANK_SCHEDULER_ENABLED", "true").lower() == "true":
+            self.rerank_scheduler = RerankScheduler(self.rerank_encoder or self.reranker)
+        self.rerank_predictor = self.rerank_scheduler or self.rerank_encoder or self.reranker
+
+        # Rerank theo tầng (RERANK_CASCADE): none | retrieval (điểm truy xuất) | cross-encoder (model nhỏ)
+        self.cascade_stage = os.getenv("RERANK_CASCADE", "none").lower()
+        self.cascade_top_m = int(os.getenv("RERANK_CASCADE_TOP_M", "6"))
+        self.cascade_margin = float(os.getenv("RERANK_CASCADE_MARGIN", "0"))
+        self.cheap_reranker = None
+        self.cheap_rerank_encoder = None
+        self.cheap_rerank_cache = None
+        if self.cascade_stage != "none" and self.cascade_top_m < 1:
+            print(f"RERANK_CASCADE_TOP_M={self.cascade_top_m} không hợp lệ (phải >= 1), tắt rerank theo tầng")
+            self.cascade_stage = "none"
+        if self.cascade_stage == "cross-encoder":
+            cheap_model = os.getenv("RERANK_CASCADE_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+            try:
+                self.cheap_reranker = load_cross_encoder(cheap_model, self.reranker_backend)
+                if self.pretokenize:
+                    self.cheap_rerank_encoder = PassageTokenEncoder.create(self.cheap_reranker)
+                    self.cheap_reranker = self.cheap_rerank_encoder or self.cheap_reranker
+                if self.rerank_scheduler is not None:
+                    self.cheap_reranker = RerankScheduler(self.cheap_reranker)
+                if self.rerank_cache is not None:
+                    self.cheap_rerank_cache = RerankScoreCache(f"{cheap_model}@{self.reranker_backend}")
+                print(f"Đã tải model rerank tầng rẻ: {cheap_model}")
+            except Exception as e:
+                print(f"Lỗi khi tải model rerank tầng rẻ {cheap_model}, dùng điểm truy xuất: {str(e)}")
+                self.cascade_stage = "retrieval"
+        elif self.cascade_stage not in ("none", "retrieval"):
+            print(f"RERANK_CASCADE={self.cascade_stage} không hợp lệ, tắt rerank theo tầng")
+            self.cascade_stage = "none"
+        self._rerank_stats_lock = threading.Lock()
+        self._rerank_stats = {
+            "calls": 0, "early_exits": 0, "candidates": 0, "expensive_pairs": 0, "cheap_ms": 0.0, "expensive_ms": 0.0,
+        }
+
     async def semantic_search(
         self,
         query: str,
         k: int = 5,
         sources: List[str] = None,
         file_id: List[str] = None,
+        vector_store=None,
+        with_payload: bool = True,
     ) -> List[Dict]:
-        """Tìm kiếm ngữ nghĩa trên vector store (bất đồng bộ)"""
-        # Tạo query vector bất đồng bộ
-        query_vector_array = await self.embedding_model.encode(query)
+        """
+        Tìm kiếm ngữ nghĩa trên vector store (bất đồng bộ)
+
+        vector_store: view theo request (VectorStore.for_collection), mặc định store của SearchManager
+        with_payload: False chỉ lấy id + score, payload bổ sung sau bằng vector_store.fetch_payloads
+
+        Khi bật HYBRID_SEARCH, kết quả vector được gộp với kết quả BM25 (reciprocal rank fusion)
+        để không bỏ sót các từ khóa chính xác như HAVING hay mã lỗi.
+        """
+        vector_store = vector_store or self.vector_store
+        # Tạo query vector bất đồng bộ (gom batch với các request đồng thời)
+        query_vector_array = await self.embedding_model.encode_query(query)
         query_vector = query_vector_array.tolist()
 
         # Sử dụng search_with_filter nếu có danh sách nguồn hoặc file_id
         if sources:
             print(f"Semantic search với sources={sources}")
-            results = await self.vector_store.search_with_filter(
-                query_vector, sources=sources, limit=k
+            results = await vector_store.search_with_filter(
+                query_vector, sources=sources, limit=k, with_payload=with_payload
             )
         elif file_id:
             print(f"Semantic search với file_id={file_id}")
-            results = await self.vector_store.search_with_filter(
-                query_vector, file_id=file_id, limit=k
+            results = await vector_store.search_with_filter(
+                query_vector, file_id=file_id, limit=k, with_payload=with_payload
             )
         else:
             print(f"Semantic search trên toàn bộ tài liệu (không có filter)")
-            results = await self.vector_store.search(query_vector, limit=k)
+            results = await vector_store.search(query_vector, limit=k, with_payload=with_payload)
+
+        lexical_hits = await vector_store.lexical_search(query, limit=k, sources=sources, file_id=file_id)
+        if lexical_hits:
+            results = self._fuse_results(results, lexical_hits, k)
+            if with_payload:
+                # Kết quả chỉ có từ BM25 chưa có payload
+                results = await vector_store.fetch_payloads(results)
 
         # In thông tin để debug
         if results and len(results) > 0:
@@ -115,24 +182,33 @@ class SearchManager:
         k: int = 5,
         sources: List[str] = None,
         file_id: List[str] = None,
+        vector_store=None,
+        with_payload: bool = True,
     ) -> List[Dict]:
         """Tìm kiếm ngữ nghĩa trên vector store (đồng bộ - để tương thích ngược)"""
+        vector_store = vector_store or self.vector_store
         query_vector = self.embedding_model.encode_sync(query).tolist()
 
         # Sử dụng search_with_filter nếu có danh sách nguồn hoặc file_id
         if sources:
             print(f"Semantic search với sources={sources}")
-            results = self.vector_store.search_with_filter_sync(
-                query_vector, sources=sources, limit=k
+            results = vector_store.search_with_filter_sync(
+                query_vector, sources=sources, limit=k, with_payload=with_payload
             )
         elif file_id:
             print(f"Semantic search với file_id={file_id}")
-            results = self.vector_store.search_with_filter_sync(
-                query_vector, file_id=file_id, limit=k
+            results = vector_store.search_with_filter_sync(
+                query_vector, file_id=file_id, limit=k, with_payload=with_payload
             )
         else:
             print(f"Semantic search trên toàn bộ tài liệu (không có filter)")
-            results = self.vector_store.search_sync(query_vector, limit=k)
+            results = vector_store.search_sync(query_vector, limit=k, with_payload=with_payload)
+
+        lexical_hits = vector_store.lexical_search_sync(query, limit=k, sources=sources, file_id=file_id)
+        if lexical_hits:
+            results = self._fuse_results(results, lexical_hits, k)
+            if with_payload:
+                results = vector_store.fetch_payloads_sync(results)
 
         # In thông tin để debug
         if results and len(results) > 0:
@@ -145,78 +221,102 @@ class SearchManager:
 
         return results
 
-    async def rerank_results(self, query: str, results: List[Dict]) -> List[Dict]:
-        """Tái xếp hạng kết quả sử dụng cross-encoder và metadata phong phú (bất đồng bộ)"""
-        if not results:
-            return results
-
-        # Đọc batch_size từ biến môi trường hoặc sử dụng giá trị mặc định cao hơn
-        batch_size = int(os.getenv("RERANK_BATCH_SIZE", "32"))
-        print(f"Đang rerank với batch_size={batch_size}")
-
-        # Sử dụng model reranker đã được tải trước đó
-        pairs = [(query, result["text"]) for result in results]
-        
-        # Chạy reranker trong thread pool để không block
-        loop = asyncio.get_event_loop()
-        scores = await loop.run_in_executor(
-            None,
-            lambda: self.reranker.predict(pairs, batch_size=batch_size)
-        )
+    async def semantic_search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        sources: List[str] = None,
+        file_id: List[str] = None,
+        vector_store=None,
+    ) -> List[List[Dict]]:
+        """
+        Tìm kiếm ngữ nghĩa cho nhiều câu truy vấn cùng lúc (bất đồng bộ)
 
-        # Nhận dạng loại truy vấn (definition, syntax, example, etc.)
-        query_type = self._detect_query_type(query)
-        print(f"Loại truy vấn được phát hiện: {query_type}")
+        Toàn bộ câu truy vấn được encode trong một lần chạy model và tìm kiếm
+        trong một request search_batch tới Qdrant.
 
-        # Cập nhật điểm số và sắp xếp lại
-        for idx, result in enumerate(results):
-            # Điểm gốc từ reranker
-            base_score = float(scores[idx])
-            result["rerank_score"] = base_score
+        Returns:
+            Danh sách kết quả theo đúng thứ tự queries, mỗi phần tử là danh sách doc có score
+        """
+        if not queries:
+            return []
 
-            # Tăng điểm dựa trên metadata phong phú nếu phù hợp với loại truy vấn
-            metadata = result.get("metadata", {})
-            score_boost = 0.0
+        vector_store = vector_store or self.vector_store
+        query_vectors = await self.embedding_model.encode_batch(
+            queries, batch_size=len(queries), show_progress=False, bucketed=False, flush=False
+        )
+        query_filter = self._build_query_filter(sources, file_id)
 
-            # Tăng trọng số cho các chunk phù hợp với loại truy vấn
-            if query_type == "definition" and metadata.get("chứa_định_nghĩa", False):
-                score_boost += 0.2  # Tăng 20%
+        print(f"Semantic search cho {len(queries)} truy vấn (batch)")
+        return await vector_store.search_batch(
+            query_vectors, filters=query_filter, limit=k
+        )
 
-            elif query_type == "syntax" and metadata.get("chứa_cú_pháp", False):
-                score_boost += 0.25  # Tăng 25%
+    def semantic_search_many_sync(
+        self,
+        queries: List[str],
+        k: int = 5,
+        sources: List[str] = None,
+        file_id: List[str] = None,
+        vector_store=None,
+    ) -> List[List[Dict]]:
+        """Tìm kiếm ngữ nghĩa cho nhiều câu truy vấn cùng lúc (đồng bộ)"""
+        if not queries:
+            return []
 
-                # Tăng thêm điểm cho các loại cú pháp SQL cụ thể
-                if "SELECT" in query and metadata.get("chứa_cú_pháp_select", False):
-                    score_boost += 0.1
-                elif "JOIN" in query and metadata.get("chứa_cú_pháp_join", False):
-                    score_boost += 0.1
-                elif ("CREATE" in query or "ALTER" in query) and metadata.get(
-                    "chứa_cú_pháp_ddl", False
-                ):
-                    score_boost += 0.1
+        vector_store = vector_store or self.vector_store
 
-            elif query_type == "example" and metadata.get("chứa_ví_dụ", False):
-                score_boost += 0.15  # Tăng 15%
+        query_vectors = self.embedding_model.encode_batch_sync(
+            queries, batch_size=len(queries), show_progress=False, bucketed=False, flush=False
+        )
+        query_filter = self._build_query_filter(sources, file_id)
 
-            elif query_type == "comparison" and metadata.get("chứa_so_sánh", False):
-                score_boost += 0.15  # Tăng 15%
+        print(f"Semantic search cho {len(queries)} truy vấn (batch)")
+        return vector_store.search_batch_sync(
+            query_vectors, filters=query_filter, limit=k
+        )
 
-            elif query_type == "troubleshooting" and metadata.get("chứa_lỗi", False):
-                score_boost += 0.2  # Tăng 20%
+    def _fuse_results(self, vector_results: List[Dict], lexical_hits: List[Dict], k: int) -> List[Dict]:
+        """
+        Gộp kết quả vector và BM25 bằng reciprocal rank fusion
 
-            # Áp dụng điểm cộng thêm
-            result["final_score"] = base_score + score_boost
+        Kết quả giữ "score" của vector (0.0 nếu chỉ có từ BM25), thêm "bm25_score" và
+        "rrf_score"; danh sách được sắp xếp theo rrf_score và cắt còn k phần tử.
+        """
+        fused = {}
+        for rank, result in enumerate(vector_results):
+            fused[result["id"]] = {**result, "rrf_score": 1.0 / (self.rrf_k + rank + 1)}
+        for rank, hit in enumerate(lexical_hits):
+            result = fused.setdefault(hit["id"], {"id": hit["id"], "score": 0.0, "rrf_score": 0.0})
+            result["bm25_score"] = hit["bm25_score"]
+            result["rrf_score"] += 1.0 / (self.rrf_k + rank + 1)
+        return sorted(fused.values(), key=lambda result: result["rrf_score"], reverse=True)[:k]
+
+    @staticmethod
+    def _build_query_filter(sources=None, file_id=None):
+        """Filter dạng dict cho search_batch, ưu tiên sources giống semantic_search"""
+        if sources:
+            return {"sources": sources}
+        if file_id:
+            return {"file_id": file_id}
+        return None
 
-        # Sắp xếp theo điểm cuối cùng
-        results.sort(key=lambda x: x.get("final_score", 0), reverse=True)
+    async def rerank_results(self, query: str, results: List[Dict]) -> List[Dict]:
+        """Tái xếp hạng kết quả sử dụng cross-encoder và metadata phong phú (bất đồng bộ)"""
+        if not results:
+            return results
 
-        # Log kết quả reranking
-        print(f"Đã rerank {len(results)} kết quả theo query_type='{query_type}'")
-        if results:
-            top_score = results[0].get("final_score", 0)
-            print(f"Điểm cao nhất sau reranking: {top_score:.4f}")
+        # Đọc batch_size từ biến môi trường hoặc sử dụng giá trị mặc định cao hơn
+        batch_size = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+        print(f"Đang rerank với batch_size={batch_size}")
 
-        return results
+        # Chạy reranker trong thread pool để không block (chỉ các cặp chưa có trong cache)
+        loop = asyncio.get_event_loop()
+        scored, scores, pruned = await loop.run_in_executor(
+            None,
+            lambda: self._cascade_scores(query, results, batch_size)
+        )
+        return self._finish_rerank(query, scored, scores, pruned)
 
     def rerank_results_sync(self, query: str, results: List[Dict]) -> List[Dict]:
         """Tái xếp hạng kết quả sử dụng cross-encoder và metadata phong phú (đồng bộ)"""
@@ -227,55 +327,22 @@ class SearchManager:
         batch_size = int(os.getenv("RERANK_BATCH_SIZE", "32"))
         print(f"Đang rerank với batch_size={batch_size}")
 
-        # Sử dụng model reranker đã được tải trước đó
-        pairs = [(query, result["text"]) for result in results]
-        scores = self.reranker.predict(pairs, batch_size=batch_size)
+        # Sử dụng model reranker đã được tải trước đó (chỉ các cặp chưa có trong cache)
+        scored, scores, pruned = self._cascade_scores(query, results, batch_size)
+        return self._finish_rerank(query, scored, scores, pruned)
 
+    def _finish_rerank(self, query: str, scored: List[Dict], scores, pruned: List[Dict]) -> List[Dict]:
+        """Cộng điểm metadata, sắp xếp các kết quả đã chấm điểm và nối các kết quả bị loại ở tầng rẻ vào cuối"""
         # Nhận dạng loại truy vấn (definition, syntax, example, etc.)
         query_type = self._detect_query_type(query)
         print(f"Loại truy vấn được phát hiện: {query_type}")
 
-        # Cập nhật điểm số và sắp xếp lại
-        for idx, result in enumerate(results):
-            # Điểm gốc từ reranker
-            base_score = float(scores[idx])
-            result["rerank_score"] = base_score
-
-            # Tăng điểm dựa trên metadata phong phú nếu phù hợp với loại truy vấn
-            metadata = result.get("metadata", {})
-            score_boost = 0.0
-
-            # Tăng trọng số cho các chunk phù hợp với loại truy vấn
-            if query_type == "definition" and metadata.get("chứa_định_nghĩa", False):
-                score_boost += 0.2  # Tăng 20%
-
-            elif query_type == "syntax" and metadata.get("chứa_cú_pháp", False):
-                score_boost += 0.25  # Tăng 25%
-
-                # Tăng thêm điểm cho các loại cú pháp SQL cụ thể
-                if "SELECT" in query and metadata.get("chứa_cú_pháp_select", False):
-                    score_boost += 0.1
-                elif "JOIN" in query and metadata.get("chứa_cú_pháp_join", False):
-                    score_boost += 0.1
-                elif ("CREATE" in query or "ALTER" in query) and metadata.get(
-                    "chứa_cú_pháp_ddl", False
-                ):
-                    score_boost += 0.1
-
-            elif query_type == "example" and metadata.get("chứa_ví_dụ", False):
-                score_boost += 0.15  # Tăng 15%
-
-            elif query_type == "comparison" and metadata.get("chứa_so_sánh", False):
-                score_boost += 0.15  # Tăng 15%
-
-            elif query_type == "troubleshooting" and metadata.get("chứa_lỗi", False):
-                score_boost += 0.2  # Tăng 20%
-
-            # Áp dụng điểm cộng thêm
-            result["final_score"] = base_score + score_boost
+        # Cập nhật điểm số: điểm reranker + điểm cộng tính từ bitmask feature_flags (vector hóa)
+        apply_boosts(query_type, query, scored, scores)
 
         # Sắp xếp theo điểm cuối cùng
-        results.sort(key=lambda x: x.get("final_score", 0), reverse=True)
+        scored.sort(key=lambda x: x.get("final_score", 0), reverse=True)
+        results = scored + pruned
 
         # Log kết quả reranking
         print(f"Đã rerank {len(results)} kết quả theo query_type='{query_type}'")
@@ -285,6 +352,139 @@ class SearchManager:
 
         return results
 
+    def _cheap_scores(self, query: str, results: List[Dict], batch_size: int) -> np.ndarray:
+        """Điểm của tầng rẻ: cross-encoder nhỏ (L-6) hoặc điểm từ bước truy xuất (rrf_score/cosine)"""
+        if self.cascade_stage == "cross-encoder":
+            return self._predict_scores(
+                query, results, batch_size, self.cheap_reranker, self.cheap_rerank_cache, self.cheap_rerank_encoder
+            )
+        return np.asarray(
+            [result.get("rrf_score", result.get("score", 0.0)) for result in results], dtype=np.float32
+        )
+
+    def _cascade_scores(self, query: str, results: List[Dict], batch_size: int):
+        """
+        Chấm điểm theo tầng (RERANK_CASCADE): tầng rẻ xếp hạng toàn bộ ứng viên, chỉ top-M đi tiếp
+        vào model reranker chính. Nếu top-1 của tầng rẻ hơn top-2 ít nhất RERANK_CASCADE_MARGIN
+        thì dừng sớm, dùng luôn điểm tầng rẻ.
+
+        Returns:
+            Tuple (các kết quả được chấm điểm cuối, điểm tương ứng, các kết quả bị loại ở tầng rẻ
+            đã sắp xếp theo điểm tầng rẻ)
+        """
+        timing = {"candidates": len(results), "cheap_ms": 0.0, "expensive_ms": 0.0, "early_exit": False}
+
+        if self.cascade_stage == "none" or len(results) <= self.cascade_top_m:
+            start = time.perf_counter()
+            scores = self._predict_scores(
+                query, results, batch_size, self.rerank_predictor, self.rerank_cache, self.rerank_encoder
+            )
+            timing["expensive_ms"] = (time.perf_counter() - start) * 1000
+            timing["expensive_pairs"] = len(results)
+            self._record_rerank_timing(timing)
+            return results, scores, []
+
+        start = time.perf_counter()
+        cheap_scores = self._cheap_scores(query, results, batch_size)
+        timing["cheap_ms"] = (time.perf_counter() - start) * 1000
+        order = np.argsort(-cheap_scores, kind="stable")
+
+        if (
+            self.cascade_margin > 0
+            and len(order) > 1
+            and cheap_scores[order[0]] - cheap_scores[order[1]] >= self.cascade_margin
+        ):
+            timing["early_exit"] = True
+            timing["expensive_pairs"] = 0
+            self._record_rerank_timing(timing)
+            return results, cheap_scores, []
+
+        survivors = [results[i] for i in order[: self.cascade_top_m]]
+        pruned = []
+        for i in order[self.cascade_top_m :]:
+            results[i]["rerank_score"] = float(cheap_scores[i])
+            results[i]["final_score"] = float(cheap_scores[i])
+            results[i]["rerank_stage"] = "cheap"
+            pruned.append(results[i])
+
+        start = time.perf_counter()
+        scores = self._predict_scores(
+            query, survivors, batch_size, self.rerank_predictor, self.rerank_cache, self.rerank_encoder
+        )
+        timing["expensive_ms"] = (time.perf_counter() - start) * 1000
+        timing["expensive_pairs"] = len(survivors)
+        self._record_rerank_timing(timing)
+        return survivors, scores, pruned
+
+    def _record_rerank_timing(self, timing: Dict):
+        """Ghi log và cộng dồn thời gian từng tầng rerank để tinh chỉnh RERANK_CASCADE_TOP_M"""
+        print(
+            f"Rerank ({self.cascade_stage}): {timing['candidates']} ứng viên, "
+            f"tầng rẻ {timing['cheap_ms']:.1f}ms, tầng chính {timing['expensive_ms']:.1f}ms "
+            f"({timing['expensive_pairs']} cặp){', dừng sớm' if timing['early_exit'] else ''}"
+        )
+        with self._rerank_stats_lock:
+            stats = self._rerank_stats
+            stats["calls"] += 1
+            stats["early_exits"] += int(timing["early_exit"])
+            stats["candidates"] += timing["candidates"]
+            stats["expensive_pairs"] += timing["expensive_pairs"]
+            stats["cheap_ms"] += timing["cheap_ms"]
+            stats["expensive_ms"] += timing["expensive_ms"]
+
+    def get_rerank_stats(self):
+        """Trả về cấu hình cascade và thời gian trung bình của từng tầng rerank"""
+        with self._rerank_stats_lock:
+            stats = dict(self._rerank_stats)
+        calls = stats["calls"] or 1
+        return {
+            "cascade_stage": self.cascade_stage,
+            "top_m": self.cascade_top_m,
+            "margin": self.cascade_margin,
+            "calls": stats["calls"],
+            "early_exits": stats["early_exits"],
+            "avg_candidates": round(stats["candidates"] / calls, 2),
+            "avg_expensive_pairs": round(stats["expensive_pairs"] / calls, 2),
+            "avg_cheap_ms": round(stats["cheap_ms"] / calls, 2),
+            "avg_expensive_ms": round(stats["expensive_ms"] / calls, 2),
+            "scheduler": self.rerank_scheduler.get_stats() if self.rerank_scheduler is not None else {"enabled": False},
+            "passage_tokens": self.rerank_encoder.get_stats() if self.rerank_encoder is not None else {"enabled": False},
+        }
+
+    @staticmethod
+    def _rerank_pairs(query: str, results: List[Dict], encoder):
+        """Cặp đầu vào cho reranker: cặp token ID đã mã hóa nếu có encoder, ngược lại là (query, text)"""
+        if encoder is not None:
+            return encoder.encode_pairs(query, results)
+        return [(query, result["text"]) for result in results]
+
+    def _predict_scores(
+        self, query: str, results: List[Dict], batch_size: int, reranker, cache, encoder=None
+    ) -> np.ndarray:
+        """Điểm cross-encoder cho từng kết quả, lấy từ rerank cache và chỉ chạy model cho các cặp còn thiếu"""
+        if cache is None:
+            pairs = self._rerank_pairs(query, results, encoder)
+            return np.asarray(reranker.predict(pairs, batch_size=batch_size), dtype=np.float32)
+
+        cached_scores, missing, keys = cache.lookup(query, results)
+        scores = np.zeros(len(results), dtype=np.float32)
+        for i, score in enumerate(cached_scores):
+            if score is not None:
+                scores[i] = score
+        if missing:
+            pairs = self._rerank_pairs(query, [results[i] for i in missing], encoder)
+            predicted = np.asarray(reranker.predict(pairs, batch_size=batch_size), dtype=np.float32)
+            scores[missing] = predicted.reshape(-1)
+            cache.store([keys[i] for i in missing], scores[missing].tolist())
+        print(f"Rerank cache: {len(results) - len(missing)}/{len(results)} cặp đã có điểm")
+        return scores
+
+    def get_rerank_cache_stats(self):
+        """Trả về thống kê hit/miss của rerank cache"""
+        if self.rerank_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.rerank_cache.get_stats()}
+
     def _detect_query_type(self, query: str) -> str:
         """
         Phát hiện loại truy vấn dựa trên từ khóa và cấu trúc câu
@@ -83,6 +83,44 @@ class FilesManager:
         result = self.client.table("document_files").insert(data).execute()
         return result
 
+    def update_file_metadata(
+        self,
+        file_id: str,
+        file_path: str,
+        file_type: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Cập nhật thông tin file khi tài liệu được tải lên lại (giữ nguyên file_id)
+
+        Args:
+            file_id: ID của file
+            file_path: Đường dẫn mới đến file
+            file_type: Loại file (extension)
+            metadata: Thông tin metadata mới (JSON)
+
+        Returns:
+            Kết quả thao tác update
+        """
+        data = {
+            "file_path": file_path,
+            "upload_time": datetime.now().isoformat(),
+        }
+
+        if file_type:
+            data["file_type"] = file_type
+
+        if metadata:
+            data["metadata"] = metadata
+
+        result = (
+            self.client.table("document_files")
+            .update(data)
+            .eq("file_id", file_id)
+            .execute()
+        )
+        return result
+
     def get_files_by_user(
         self, user_id: str, include_deleted: bool = False
     ) -> List[Dict]:
@@ -207,6 +245,42 @@ class FilesManager:
         )
         return result
 
+    def get_files_by_ids(self, file_ids: List[str]) -> List[Dict]:
+        """
+        Lấy thông tin nhiều file theo danh sách ID trong một truy vấn
+
+        Args:
+            file_ids: Danh sách ID của file
+
+        Returns:
+            Danh sách thông tin file tìm thấy
+        """
+        result = (
+            self.client.table("document_files")
+            .select("*")
+            .in_("file_id", file_ids)
+            .execute()
+        )
+        return result.data if hasattr(result, "data") else []
+
+    def delete_files_permanently(self, file_ids: List[str]) -> Dict:
+        """
+        Xóa vĩnh viễn nhiều file từ database trong một truy vấn (hard delete)
+
+        Args:
+            file_ids: Danh sách ID của file
+
+        Returns:
+            Kết quả thao tác delete
+        """
+        result = (
+            self.client.table("document_files")
+            .delete()
+            .in_("file_id", file_ids)
+            .execute()
+        )
+        return result
+
     def get_all_files(self, include_deleted: bool = False) -> List[Dict]:
         """
         Lấy danh sách tất cả file trong hệ thống
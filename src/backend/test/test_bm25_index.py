@@ -0,0 +1,114 @@
+"""
+Unit test cho bm25_index (tokenize, BM25Index thêm/xóa/gộp, đồng bộ giữa các tiến trình)
+"""
+
+import os
+import sys
+import unicodedata
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backend.bm25_index import BM25Index, tokenize
+
+DOCS = [
+    ("p1", "Cơ sở dữ liệu quan hệ và câu lệnh GROUP BY", {"file_id": "f1"}),
+    ("p2", "Lỗi ORA-00942: table or view does not exist", {"file_id": "f1"}),
+    ("p3", "Mệnh đề HAVING lọc sau khi gom nhóm", {"file_id": "f2"}),
+]
+
+
+def _ids(hits):
+    return [point_id for point_id, _ in hits]
+
+
+def _built(path, docs=DOCS):
+    index = BM25Index(str(path / "idx"))
+    index.build(docs)
+    return index
+
+
+def test_tokenize_syllables_bigrams_and_stopwords():
+    terms = tokenize("Cơ sở dữ liệu của GROUP BY")
+    assert "cơ_sở" in terms and "dữ_liệu" in terms and "group_by" in terms
+    # Hư từ bị bỏ khỏi unigram nhưng vẫn nằm trong bigram
+    assert "của" not in terms and "liệu_của" in terms
+    # Chuẩn hóa NFC: dạng tổ hợp và dựng sẵn cho cùng term
+    assert tokenize("cơ sở") == tokenize("cơ sở")
+    assert "ora_00942" in tokenize("ORA-00942")
+
+
+def test_search_ranks_matching_chunk_first(tmp_path):
+    index = _built(tmp_path)
+    assert _ids(index.search("group by", limit=2))[0] == "p1"
+    assert _ids(index.search("ORA-00942"))[0] == "p2"
+    assert _ids(index.search("having", allowed=lambda meta: meta["file_id"] == "f1")) == []
+
+
+def test_add_replace_and_remove(tmp_path):
+    index = _built(tmp_path)
+    index.add([("p4", "Chỉ mục B-tree tăng tốc truy vấn", {"file_id": "f3"})])
+    assert _ids(index.search("b-tree")) == ["p4"]
+
+    # Thêm lại cùng point ID thay thế nội dung cũ
+    index.add([("p4", "Khóa ngoại đảm bảo toàn vẹn", {"file_id": "f3"})])
+    assert index.search("b-tree") == []
+    assert index.get_stats()["documents"] == 4
+
+    assert index.remove(predicate=lambda meta: meta["file_id"] == "f1") == 2
+    assert index.remove(point_ids=["p3", "missing"]) == 1
+    assert _ids(index.search("khóa ngoại")) == ["p4"]
+    assert index.get_stats()["documents"] == 1
+
+
+def test_compact_keeps_results_and_survives_reload(tmp_path):
+    index = _built(tmp_path)
+    index.add([("p4", "Chỉ mục B-tree tăng tốc truy vấn", {"file_id": "f3"})])
+    index.remove(point_ids=["p1"])
+    before = index.search("truy vấn group by having", limit=5)
+
+    index.compact()
+    assert index.get_stats()["pending_changes"] == 0
+    assert index.search("truy vấn group by having", limit=5) == before
+
+    reopened = BM25Index(str(tmp_path / "idx"))
+    assert reopened.search("truy vấn group by having", limit=5) == before
+
+
+def test_delta_replayed_after_reload(tmp_path):
+    index = _built(tmp_path)
+    index.add([("p4", "Chỉ mục B-tree", {"file_id": "f3"})])
+    index.remove(point_ids=["p2"])
+
+    reopened = BM25Index(str(tmp_path / "idx"))
+    assert _ids(reopened.search("b-tree")) == ["p4"]
+    assert reopened.search("ORA-00942") == []
+
+
+def test_refresh_picks_up_changes_of_other_instance(tmp_path):
+    # Hai instance trên cùng thư mục tương đương hai uvicorn worker
+    first = _built(tmp_path)
+    second = BM25Index(str(tmp_path / "idx"))
+
+    first.add([("p4", "Chỉ mục B-tree", {"file_id": "f3"})])
+    second.refresh()
+    assert _ids(second.search("b-tree")) == ["p4"]
+
+    # Gộp ở first đổi generation: second tải lại phần gốc mới và không phát lại delta cũ lần nữa
+    first.remove(point_ids=["p1"])
+    first.compact()
+    second.add([("p5", "Giao dịch ACID", {"file_id": "f4"})])
+    assert second.search("group by") == []
+    assert second.get_stats()["documents"] == 4
+
+    first.refresh()
+    assert _ids(first.search("acid")) == ["p5"]
+    assert first.get_stats()["documents"] == 4
+
+
+def test_drop_by_other_instance(tmp_path):
+    first = _built(tmp_path)
+    second = BM25Index(str(tmp_path / "idx"))
+    first.drop()
+    second.refresh()
+    assert not second.exists
+    assert second.search("group by") == []
@@ -0,0 +1,47 @@
+"""
+Unit test cho ChunkCache (không cần server hay model)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backend.chunk_cache import ChunkCache
+
+
+def test_get_many_reports_hits_and_missing():
+    cache = ChunkCache(max_entries=4)
+    cache.put_many("docs", {"1": {"text": "a"}, 2: {"text": "b"}, "3": None})
+    found, missing = cache.get_many("docs", ["1", 2, "3"])
+    assert found == {"1": {"text": "a"}, "2": {"text": "b"}}
+    assert missing == ["3"]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_are_scoped_by_collection():
+    cache = ChunkCache(max_entries=4)
+    cache.put_many("docs", {"1": {"text": "a"}})
+    assert cache.get_many("docs_v2", ["1"]) == ({}, ["1"])
+
+
+def test_lru_eviction():
+    cache = ChunkCache(max_entries=2)
+    cache.put_many("docs", {"1": {"text": "a"}, "2": {"text": "b"}})
+    cache.get_many("docs", ["1"])
+    cache.put_many("docs", {"3": {"text": "c"}})
+    _, missing = cache.get_many("docs", ["1", "2", "3"])
+    assert missing == ["2"]
+    assert cache.evictions == 1
+
+
+def test_invalidate_by_ids_and_predicate():
+    cache = ChunkCache(max_entries=8)
+    cache.put_many("docs", {"1": {"file_id": "f1"}, "2": {"file_id": "f1"}, "3": {"file_id": "f2"}})
+    cache.put_many("other", {"1": {"file_id": "f1"}})
+
+    assert cache.invalidate("docs", point_ids=["1", "9"]) == 1
+    assert cache.invalidate("docs", predicate=lambda payload: payload["file_id"] == "f1") == 1
+    assert cache.get_many("docs", ["3"])[1] == []
+    assert cache.invalidate("docs") == 1
+    assert cache.get_stats()["entries"] == 1
@@ -0,0 +1,108 @@
+"""
+Unit test cho EmbeddingCache (không cần server hay model)
+"""
+
+import logging
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backend.embedding_cache import EmbeddingCache
+
+DIM = 4
+
+
+def _vec(i):
+    return np.full(DIM, float(i), dtype=np.float32)
+
+
+def _text_with_nul_digest(cache):
+    """Tìm một văn bản có digest kết thúc bằng byte NUL (khoảng 1/256 văn bản)"""
+    for i in range(100000):
+        text = f"nul-{i}"
+        if cache.make_key(text).endswith(b"\x00"):
+            return text
+    raise AssertionError("không tìm được digest kết thúc bằng NUL")
+
+
+def test_store_and_lookup(tmp_path):
+    cache = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=8)
+    cache.store(["a", "b"], np.stack([_vec(1), _vec(2)]))
+    vectors, missing = cache.lookup(["a", "x", "b"])
+    assert missing == [1]
+    np.testing.assert_array_equal(vectors[0], _vec(1))
+    np.testing.assert_array_equal(vectors[2], _vec(2))
+
+
+def test_nul_terminated_digest_survives_eviction_and_reload(tmp_path):
+    cache = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=2)
+    nul_text = _text_with_nul_digest(cache)
+    cache.store([nul_text], _vec(7)[None])
+    cache.flush()
+
+    reopened = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=2)
+    vectors, missing = reopened.lookup([nul_text])
+    assert missing == []
+    np.testing.assert_array_equal(vectors[0], _vec(7))
+
+    # Loại bỏ slot chứa digest kết thúc bằng NUL không được lỗi KeyError
+    reopened.store(["a", "b"], np.stack([_vec(1), _vec(2)]))
+    assert reopened.lookup([nul_text])[1] == [0]
+    assert reopened.get_stats()["entries"] == 2
+
+
+def test_lru_eviction(tmp_path):
+    cache = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=2)
+    cache.store(["a", "b"], np.stack([_vec(1), _vec(2)]))
+    cache.lookup(["a"])
+    cache.store(["c"], _vec(3)[None])
+    _, missing = cache.lookup(["a", "b", "c"])
+    assert missing == [1]
+    assert cache.evictions == 1
+
+
+def test_slot_reused_by_other_process_is_a_miss(tmp_path):
+    first = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=2)
+    first.store(["a", "b"], np.stack([_vec(1), _vec(2)]))
+    second = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=2)
+
+    # first loại bỏ "a" và ghi "c" vào slot đó; second vẫn còn "a" trong chỉ mục của mình
+    first.lookup(["b"])
+    first.store(["c"], _vec(3)[None])
+
+    vectors, missing = second.lookup(["a", "b"])
+    assert missing == [0]
+    np.testing.assert_array_equal(vectors[1], _vec(2))
+
+
+def test_config_change_resets_with_warning(tmp_path, caplog):
+    cache = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=2)
+    cache.store(["a"], _vec(1)[None])
+    cache.flush()
+
+    with caplog.at_level(logging.WARNING, logger="backend.embedding_cache"):
+        resized = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=4)
+    assert any("capacity 2 -> 4" in record.getMessage() for record in caplog.records)
+    assert resized.lookup(["a"])[1] == [0]
+
+
+def test_flush_only_writes_after_new_stores(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_FLUSH_INTERVAL", "3600")
+    cache = EmbeddingCache("m", DIM, cache_dir=str(tmp_path), max_entries=4)
+    flushes = []
+    monkeypatch.setattr(cache._vectors, "flush", lambda: flushes.append(1))
+
+    cache.store(["a"], _vec(1)[None])
+    assert flushes == []  # store không tự msync trước khi hết chu kỳ
+    cache.flush()
+    cache.flush()
+    cache.lookup(["a"])
+    cache.flush()
+    assert len(flushes) == 1
+
+    cache.flush_interval = 0
+    cache.store(["b"], _vec(2)[None])
+    assert len(flushes) == 2
@@ -0,0 +1,225 @@
+"""
+Unit test cho LocalVectorClient (upsert/ghi đè, filter, xóa/nén, alias, mở lại từ đĩa, đồng bộ giữa các tiến trình)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from qdrant_client import models
+
+from backend.local_vector_store import LocalVectorClient, hnswlib
+
+DIM = 4
+VECTORS = {
+    "p1": [1.0, 0.0, 0.0, 0.0],
+    "p2": [0.0, 1.0, 0.0, 0.0],
+    "p3": [0.0, 0.0, 1.0, 0.0],
+}
+PAYLOADS = {
+    "p1": {"file_id": "f1", "metadata": {"category": "SQL"}, "tags": ["a", "b"]},
+    "p2": {"file_id": "f1", "metadata": {"category": "NoSQL"}, "tags": ["b"]},
+    "p3": {"file_id": "f2", "metadata": {"category": "SQL"}, "tags": ["c"]},
+}
+
+
+def _points(ids):
+    return [models.PointStruct(id=point_id, vector=VECTORS[point_id], payload=PAYLOADS[point_id]) for point_id in ids]
+
+
+def _client(path, use_hnsw=False):
+    return LocalVectorClient(base_dir=str(path / "store"), dtype="float32", use_hnsw=use_hnsw)
+
+
+def _filled(path, use_hnsw=False):
+    client = _client(path, use_hnsw)
+    client.create_collection("docs", models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+    client.upsert("docs", _points(VECTORS))
+    return client
+
+
+def _match(key, **match):
+    condition_match = (
+        models.MatchValue(value=match["value"])
+        if "value" in match
+        else models.MatchAny(any=match["any"])
+        if "any" in match
+        else models.MatchExcept(**{"except": match["except_"]})
+    )
+    return models.Filter(must=[models.FieldCondition(key=key, match=condition_match)])
+
+
+def _ids(points):
+    return sorted(point.id for point in points)
+
+
+def _all_ids(client, name="docs"):
+    records, _ = client.scroll(name, limit=100)
+    return _ids(records)
+
+
+def test_upsert_and_overwrite(tmp_path):
+    client = _filled(tmp_path)
+    assert client.count("docs").count == 3
+    assert client.search("docs", VECTORS["p2"], limit=1)[0].id == "p2"
+
+    # Ghi đè cùng ID: giữ nguyên số điểm, thay vector và payload
+    client.upsert(
+        "docs", [models.PointStruct(id="p2", vector=VECTORS["p3"], payload={"file_id": "f3"})]
+    )
+    assert client.count("docs").count == 3
+    hits = client.search("docs", VECTORS["p3"], limit=2)
+    assert _ids(hits) == ["p2", "p3"]
+    assert hits[0].score == pytest.approx(1.0)
+    assert client.retrieve("docs", ["p2"])[0].payload == {"file_id": "f3"}
+
+    with pytest.raises(ValueError):
+        client.upsert("docs", [models.PointStruct(id="p4", vector=[1.0, 0.0], payload={})])
+
+
+def test_filtered_search(tmp_path):
+    client = _filled(tmp_path)
+    query = VECTORS["p1"]
+    assert _ids(client.search("docs", query, query_filter=_match("file_id", value="f1"))) == ["p1", "p2"]
+    assert _ids(client.search("docs", query, query_filter=_match("metadata.category", any=["NoSQL"]))) == ["p2"]
+    assert _ids(client.search("docs", query, query_filter=_match("metadata.category", except_=["SQL"]))) == ["p2"]
+    # Trường chứa list không mã hóa thành cột: dùng cách lọc theo từng dòng
+    assert _ids(client.search("docs", query, query_filter=_match("tags", value="b"))) == ["p1", "p2"]
+    assert client.count("docs", count_filter=_match("file_id", value="missing")).count == 0
+
+    # Cột keyword được cập nhật tại chỗ sau khi ghi đè
+    client.upsert("docs", [models.PointStruct(id="p3", vector=VECTORS["p3"], payload={"file_id": "f1"})])
+    assert _ids(client.search("docs", query, query_filter=_match("file_id", value="f1"))) == ["p1", "p2", "p3"]
+
+
+def test_delete_and_compact(tmp_path):
+    client = _filled(tmp_path)
+    client.delete("docs", models.PointIdsList(points=["p1"]))
+    client.delete("docs", models.FilterSelector(filter=_match("file_id", value="f2")))
+    assert _all_ids(client) == ["p2"]
+    assert client.search("docs", VECTORS["p1"], limit=3)[0].id == "p2"
+
+    collection = client._get("docs")
+    collection.compact()
+    assert collection.size == 1
+    assert _all_ids(client) == ["p2"]
+    assert client.search("docs", VECTORS["p2"], limit=1)[0].score == pytest.approx(1.0)
+
+    client.upsert("docs", _points(["p1"]))
+    assert _all_ids(client) == ["p1", "p2"]
+
+    reopened = _client(tmp_path)
+    assert _all_ids(reopened) == ["p1", "p2"]
+    assert reopened.search("docs", VECTORS["p1"], limit=1)[0].id == "p1"
+
+
+def test_alias_create_and_switch(tmp_path):
+    client = _filled(tmp_path)
+    client.create_collection("docs_v2", models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+    client.upsert("docs_v2", _points(["p3"]))
+
+    client.update_collection_aliases(
+        [models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name="docs", alias_name="live"))]
+    )
+    assert _all_ids(client, "live") == ["p1", "p2", "p3"]
+
+    # Chuyển alias nguyên tử: xóa và tạo lại trong cùng một lần gọi
+    client.update_collection_aliases(
+        [
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name="live")),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name="docs_v2", alias_name="live")),
+        ]
+    )
+    assert _all_ids(client, "live") == ["p3"]
+    assert [alias.alias_name for alias in client.get_collection_aliases("docs_v2").aliases] == ["live"]
+
+    with pytest.raises(ValueError):
+        client.update_collection_aliases(
+            [models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name="docs", alias_name="docs_v2"))]
+        )
+
+    client.delete_collection("docs_v2")
+    assert client.get_aliases().aliases == []
+    assert not client.collection_exists("live")
+
+
+def test_reopen_from_disk(tmp_path):
+    client = _filled(tmp_path)
+    client.create_payload_index("docs", "file_id", models.PayloadSchemaType.KEYWORD)
+    client.delete("docs", models.PointIdsList(points=["p2"]))
+    client.close()
+
+    reopened = _client(tmp_path)
+    assert reopened.collection_exists("docs")
+    assert _all_ids(reopened) == ["p1", "p3"]
+    assert reopened.retrieve("docs", ["p1"])[0].payload == PAYLOADS["p1"]
+    assert reopened.get_collection("docs").payload_schema["file_id"].data_type == "keyword"
+    assert _ids(reopened.search("docs", VECTORS["p1"], query_filter=_match("file_id", value="f2"))) == ["p3"]
+
+
+def test_reopen_after_grow(tmp_path):
+    client = _client(tmp_path)
+    client.create_collection("docs", models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+    rng = np.random.default_rng(0)
+    vectors = rng.random((1500, DIM)).astype(np.float32)
+    client.upsert(
+        "docs", [models.PointStruct(id=i, vector=vector.tolist(), payload={"i": i}) for i, vector in enumerate(vectors)]
+    )
+    client.close()
+
+    reopened = _client(tmp_path)
+    assert reopened.count("docs").count == 1500
+    assert reopened.search("docs", vectors[1234], limit=1)[0].id == 1234
+
+
+@pytest.mark.parametrize("use_hnsw", [False, pytest.param(True, marks=pytest.mark.skipif(hnswlib is None, reason="chưa cài hnswlib"))])
+def test_changes_of_other_instance_are_visible(tmp_path, use_hnsw):
+    # Hai client trên cùng thư mục tương đương hai uvicorn worker
+    first = _filled(tmp_path, use_hnsw)
+    second = _client(tmp_path, use_hnsw)
+    assert _all_ids(second) == ["p1", "p2", "p3"]
+
+    first.delete("docs", models.PointIdsList(points=["p1"]))
+    second.upsert("docs", [models.PointStruct(id="p4", vector=[0.0, 0.0, 0.0, 1.0], payload={"file_id": "f4"})])
+    assert _all_ids(first) == ["p2", "p3", "p4"]
+    assert first.search("docs", [0.0, 0.0, 0.0, 1.0], limit=1)[0].id == "p4"
+    # Dòng mới của second không trùng dòng của first
+    first.upsert("docs", _points(["p1"]))
+    assert _all_ids(second) == ["p1", "p2", "p3", "p4"]
+    assert second.search("docs", VECTORS["p1"], limit=1)[0].id == "p1"
+
+    # Nén ở first đổi generation: second tải lại thay vì phát lại log cũ
+    first.delete("docs", models.PointIdsList(points=["p2", "p3"]))
+    first._get("docs").compact()
+    second.upsert("docs", _points(["p2"]))
+    assert _all_ids(second) == ["p1", "p2", "p4"]
+    assert _all_ids(first) == ["p1", "p2", "p4"]
+    assert first.search("docs", VECTORS["p2"], limit=1)[0].id == "p2"
+
+
+def test_alias_switch_and_drop_by_other_instance(tmp_path):
+    first = _filled(tmp_path)
+    first.create_collection("docs_v2", models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+    first.upsert("docs_v2", _points(["p3"]))
+    first.update_collection_aliases(
+        [models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name="docs", alias_name="live"))]
+    )
+    second = _client(tmp_path)
+    assert _all_ids(second, "live") == ["p1", "p2", "p3"]
+
+    first.update_collection_aliases(
+        [
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name="live")),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name="docs_v2", alias_name="live")),
+        ]
+    )
+    assert _all_ids(second, "live") == ["p3"]
+
+    first.delete_collection("docs")
+    with pytest.raises(ValueError):
+        second.count("docs")
+    assert not second.collection_exists("docs")
@@ -0,0 +1,121 @@
+"""
+Unit test cho PassageTokenEncoder: cặp đã mã hóa sẵn phải giống hệt tokenizer(query, passage, truncation=True)
+
+Dùng tokenizer kiểu BERT dựng từ vocab nhỏ (không tải model), bỏ qua nếu chưa cài transformers.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+transformers = pytest.importorskip("transformers")
+
+from backend.passage_tokens import PassageTokenEncoder
+
+MAX_LENGTH = 24
+WORDS = [f"w{i}" for i in range(40)]
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+
+    vocab = {token: i for i, token in enumerate(["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + WORDS)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+    )
+    return transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        model_max_length=MAX_LENGTH,
+        pad_token="[PAD]",
+        unk_token="[UNK]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        model_input_names=["input_ids", "token_type_ids", "attention_mask"],
+    )
+
+
+@pytest.fixture(scope="module")
+def encoder(tokenizer):
+    model = SimpleNamespace(tokenizer=tokenizer, model=None, max_length=MAX_LENGTH)
+    return PassageTokenEncoder.create(model)
+
+
+def _text(n):
+    return " ".join(WORDS[i % len(WORDS)] for i in range(n))
+
+
+@pytest.mark.parametrize("query_len", [0, 1, 3, 10, 11, 12, 20, 30])
+@pytest.mark.parametrize("passage_len", [0, 1, 5, 10, 11, 12, 19, 40])
+def test_pairs_match_tokenizer_longest_first(tokenizer, encoder, query_len, passage_len):
+    query, passage = _text(query_len), _text(passage_len)
+    # Gọi theo lô như CrossEncoder.predict (passage rỗng vẫn được coi là một cặp)
+    expected = tokenizer(
+        [query], [passage], truncation="longest_first", max_length=MAX_LENGTH, return_token_type_ids=True
+    )
+    expected = {name: values[0] for name, values in expected.items()}
+    pair = encoder.encode_pairs(query, [{"text": passage}])[0]
+    assert pair["input_ids"] == expected["input_ids"]
+    assert pair["token_type_ids"] == expected["token_type_ids"]
+
+
+def test_truncate_budget_split(encoder):
+    budget = encoder.pair_budget
+    assert budget == MAX_LENGTH - 3
+    assert encoder._truncate(3, 5) == (3, 5)
+    # Chuỗi ngắn vừa nửa ngân sách: chỉ cắt chuỗi dài
+    assert encoder._truncate(3, 40) == (3, budget - 3)
+    # Cả hai dài hơn nửa ngân sách: phần lẻ thuộc về chuỗi dài hơn, bằng nhau thì passage
+    assert encoder._truncate(30, 20) == (budget - budget // 2, budget // 2)
+    assert encoder._truncate(20, 20) == (budget // 2, budget - budget // 2)
+
+
+def test_passage_tokens_cached(encoder):
+    encoder.clear()
+    results = [{"text": _text(5)}, {"text": _text(7)}]
+    encoder.encode_pairs("w1", results)
+    encoder.encode_pairs("w2 w3", results)
+    stats = encoder.get_stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] >= 2
+
+
+def test_non_torch_backend_is_not_pretokenized(tokenizer):
+    model = SimpleNamespace(tokenizer=tokenizer, model=None, max_length=MAX_LENGTH, backend="onnx")
+    assert PassageTokenEncoder.create(model) is None
+
+
+def test_predict_matches_cross_encoder(tokenizer, tmp_path):
+    torch = pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        max_position_embeddings=64,
+        num_labels=1,
+    )
+    transformers.BertForSequenceClassification(config).save_pretrained(tmp_path)
+    tokenizer.save_pretrained(tmp_path)
+    cross_encoder = sentence_transformers.CrossEncoder(str(tmp_path), max_length=MAX_LENGTH)
+
+    encoder = PassageTokenEncoder.create(cross_encoder)
+    assert encoder is not None
+    query = _text(6)
+    passages = [_text(n) for n in (0, 3, 11, 40)]
+    expected = cross_encoder.predict([(query, passage) for passage in passages])
+    scores = encoder.predict(encoder.encode_pairs(query, [{"text": passage} for passage in passages]), batch_size=2)
+    np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,61 @@
+"""
+Unit test cho RerankScoreCache (không cần server hay model)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backend import rerank_cache
+from backend.rerank_cache import RerankScoreCache, normalize_query
+
+RESULTS = [{"id": "p1", "text": "a"}, {"id": "p2", "text": "b"}, {"text": "c"}]
+
+
+def _fill(cache, query="SQL là gì?"):
+    _, missing, keys = cache.lookup(query, RESULTS)
+    cache.store([keys[i] for i in missing], [float(i) for i in missing])
+
+
+def test_normalize_query():
+    assert normalize_query("  SQL   là GÌ?? ") == "sql là gì"
+    assert normalize_query(None) == ""
+
+
+def test_repeated_query_hits_after_normalization():
+    cache = RerankScoreCache("m@torch", max_entries=10)
+    _fill(cache)
+    scores, missing, _ = cache.lookup("sql  là gì", RESULTS)
+    assert missing == []
+    assert scores == [0.0, 1.0, 2.0]
+    assert cache.get_stats()["hit_rate"] == 0.5
+
+
+def test_key_depends_on_model_and_chunk_identity():
+    cache = RerankScoreCache("m@torch", max_entries=10)
+    other_model = RerankScoreCache("m@onnx", max_entries=10)
+    query = normalize_query("sql")
+    assert cache.make_key(query, {"id": "p1"}) != other_model.make_key(query, {"id": "p1"})
+    # Không có point ID: khóa theo hash văn bản
+    assert cache.make_key(query, {"text": "x"}) == cache.make_key(query, {"text": "x"})
+    assert cache.make_key(query, {"text": "x"}) != cache.make_key(query, {"text": "y"})
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rerank_cache.time, "monotonic", lambda: now[0])
+    cache = RerankScoreCache("m", max_entries=10, ttl_seconds=60)
+    _fill(cache)
+    now[0] += 61
+    _, missing, _ = cache.lookup("sql là gì", RESULTS)
+    assert missing == [0, 1, 2]
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = RerankScoreCache("m", max_entries=2)
+    _fill(cache)
+    assert cache.evictions == 1
+    _, missing, _ = cache.lookup("sql là gì", RESULTS)
+    assert missing == [0]
@@ -0,0 +1,84 @@
+"""
+Unit test cho RerankScheduler với model giả (không cần torch hay model thật)
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backend.rerank_scheduler import RerankScheduler
+
+
+class FakeCrossEncoder:
+    """Điểm = độ dài passage; lỗi với passage "boom"; có thể giữ lượt đầu tiên để request khác xếp hàng"""
+
+    max_length = 512
+
+    def __init__(self, hold_first=False):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def predict(self, pairs, batch_size=None):
+        self.calls.append(list(pairs))
+        self.started.set()
+        self.release.wait(5)
+        if any(passage == "boom" for _, passage in pairs):
+            raise RuntimeError("model failed")
+        return np.array([len(passage) for _, passage in pairs], dtype=np.float32)
+
+
+def _wait_pending(scheduler, pairs):
+    for _ in range(500):
+        if scheduler.get_stats()["pending_pairs"] >= pairs:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("request chưa vào hàng đợi")
+
+
+def test_scores_returned_in_request_order():
+    scheduler = RerankScheduler(FakeCrossEncoder())
+    scores = scheduler.predict([("q", "aaa"), ("q", "a"), ("q", "aa")])
+    np.testing.assert_array_equal(scores, [3, 1, 2])
+    assert scheduler.get_stats()["pending_pairs"] == 0
+
+
+def test_error_propagates_to_request_and_worker_recovers():
+    model = FakeCrossEncoder()
+    scheduler = RerankScheduler(model)
+    with pytest.raises(RuntimeError, match="model failed"):
+        scheduler.predict([("q", "ok"), ("q", "boom")])
+    assert scheduler.get_stats()["pending_pairs"] == 0
+
+    np.testing.assert_array_equal(scheduler.predict([("q", "ok")]), [2])
+
+
+def test_error_only_fails_requests_in_the_failed_pass():
+    model = FakeCrossEncoder(hold_first=True)
+    # Budget nhỏ: mỗi lượt chỉ chứa 2 cặp nên yêu cầu thứ hai/ba chạy ở các lượt riêng
+    scheduler = RerankScheduler(model, token_budget=8)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        first = pool.submit(scheduler.predict, [("q", "x")])
+        assert model.started.wait(5)
+        failing = pool.submit(scheduler.predict, [("q", "boom"), ("q", "y"), ("q", "z")])
+        _wait_pending(scheduler, 4)
+        healthy = pool.submit(scheduler.predict, [("q", "abcd")])
+        _wait_pending(scheduler, 5)
+        model.release.set()
+
+        np.testing.assert_array_equal(first.result(5), [1])
+        with pytest.raises(RuntimeError, match="model failed"):
+            failing.result(5)
+        np.testing.assert_array_equal(healthy.result(5), [4])
+
+    # Các cặp còn lại của request lỗi bị bỏ, không được chấm ở lượt sau
+    assert all(("q", "z") not in call for call in model.calls)
+    assert scheduler.get_stats()["pending_pairs"] == 0
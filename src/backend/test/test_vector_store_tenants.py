@@ -0,0 +1,62 @@
+"""
+Unit test cách ly tenant (VECTOR_STORE_MULTITENANT) khi duyệt tài liệu, chạy trên kho cục bộ (không cần Qdrant)
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backend.local_vector_store import LocalVectorStore
+
+DIM = 8
+
+
+class FakeEmbeddingModel:
+    """Vector ngẫu nhiên: chỉ kiểm tra việc lọc payload"""
+
+    def get_dimension(self):
+        return DIM
+
+    async def iter_encode_batches(self, texts, batch_size=128):
+        yield 0, np.random.rand(len(texts), DIM).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_STORE_MULTITENANT", "true")
+    monkeypatch.setenv("HYBRID_SEARCH", "false")
+    store = LocalVectorStore(base_dir=str(tmp_path), collection_name="global_documents")
+    for user_id in (None, "u1", "u2"):
+        view = store.for_collection(user_id=user_id)
+        owner = user_id or "shared"
+        chunks = [
+            {"text": f"{owner}-{i}", "source": f"{owner}.pdf", "metadata": {"category": "SQL"}} for i in range(3)
+        ]
+        asyncio.run(view.index_documents_streaming(chunks, FakeEmbeddingModel(), None, f"file-{owner}"))
+    return store
+
+
+def _owners(documents):
+    return {document["text"].split("-")[0] for document in documents}
+
+
+def test_each_tenant_sees_only_its_own_and_shared_chunks(store):
+    assert _owners(store.for_collection(user_id="u1").get_all_documents()) == {"shared", "u1"}
+    assert _owners(store.for_collection(user_id="u2").get_all_documents()) == {"shared", "u2"}
+    assert _owners(store.for_collection().get_all_documents()) == {"shared"}
+
+
+def test_category_listing_is_tenant_scoped(store):
+    documents = store.for_collection(user_id="u2").get_document_by_category("SQL")
+    assert len(documents) == 6
+    assert _owners(documents) == {"shared", "u2"}
+
+
+def test_all_tenants_opt_out(store):
+    documents = list(store.for_collection().iter_documents(all_tenants=True))
+    assert _owners(documents) == {"shared", "u1", "u2"}
@@ -1,5 +1,6 @@
 from sqlalchemy import null
-from qdrant_client import QdrantClient, models
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
+import httpx
 import logging
 import numpy as np
 import asyncio
@@ -22,10 +23,95 @@ import os
 from dotenv import load_dotenv
 import uuid
 import time
+import hashlib
+import copy
+import threading
+from itertools import islice
+
+from backend.bm25_index import BM25Registry
+from backend.chunk_cache import ChunkCache
+from backend.chunk_features import FEATURE_FIELD, compact_metadata, compact_payload
 
 # Load biến môi trường từ .env
 load_dotenv()
 
+# Namespace cố định để sinh ID point xác định từ (file_id, nội dung chunk)
+POINT_ID_NAMESPACE = uuid.UUID("6f1d2a4e-3c58-5b7e-9a61-0d4c8e2b7f93")
+
+# Các trường payload được dùng trong filter (search_with_filter, delete_by_file_id,
+# delete_by_file_path, get_document_by_category) -> cần index để Qdrant không quét toàn bộ payload
+PAYLOAD_INDEX_FIELDS = {
+    "file_id": models.PayloadSchemaType.KEYWORD,
+    "source": models.PayloadSchemaType.KEYWORD,
+    "metadata.source": models.PayloadSchemaType.KEYWORD,
+    "metadata.category": models.PayloadSchemaType.KEYWORD,
+}
+
+# Multi-tenant: một collection chung, mỗi point gắn tenant_id (user_id hoặc SHARED_TENANT_ID cho tài liệu
+# chung của admin). is_tenant giúp Qdrant gom dữ liệu theo tenant và dựng đồ thị HNSW riêng (payload_m)
+TENANT_FIELD = "tenant_id"
+TENANT_INDEX_SCHEMA = models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+
+SUPPORTED_QUANTIZATION_MODES = ("none", "scalar", "binary")
+# Mức chính xác khi tìm kiếm trên collection có lượng tử hóa:
+# - fast: chỉ dùng điểm của vector lượng tử hóa
+# - balanced: lấy limit x oversampling ứng viên lượng tử hóa rồi tính lại điểm bằng vector gốc
+# - exact: bỏ qua vector lượng tử hóa, tìm trên vector gốc
+SUPPORTED_SEARCH_PRECISIONS = ("fast", "balanced", "exact")
+
+
+def build_quantization_config(mode=None):
+    """
+    Tạo cấu hình lượng tử hóa cho collection từ QDRANT_QUANTIZATION (none, scalar, binary)
+
+    Returns:
+        ScalarQuantization / BinaryQuantization hoặc None nếu không lượng tử hóa
+    """
+    mode = (mode or os.getenv("QDRANT_QUANTIZATION", "none")).lower()
+    if mode not in SUPPORTED_QUANTIZATION_MODES:
+        raise ValueError(
+            f"QDRANT_QUANTIZATION={mode} không hợp lệ. Hỗ trợ: {', '.join(SUPPORTED_QUANTIZATION_MODES)}"
+        )
+    # Giữ vector lượng tử hóa trong RAM, vector gốc có thể nằm trên đĩa (on_disk)
+    always_ram = os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+    if mode == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=float(os.getenv("QDRANT_SCALAR_QUANTILE", "0.99")),
+                always_ram=always_ram,
+            )
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    return None
+
+
+def build_search_params(precision=None, oversampling=None):
+    """
+    Tạo SearchParams theo mức chính xác (QDRANT_SEARCH_PRECISION, mặc định balanced)
+
+    Collection không lượng tử hóa sẽ bỏ qua các tham số này.
+    """
+    precision = (precision or os.getenv("QDRANT_SEARCH_PRECISION", "balanced")).lower()
+    if precision not in SUPPORTED_SEARCH_PRECISIONS:
+        raise ValueError(
+            f"precision={precision} không hợp lệ. Hỗ trợ: {', '.join(SUPPORTED_SEARCH_PRECISIONS)}"
+        )
+    if precision == "exact":
+        quantization = models.QuantizationSearchParams(ignore=True)
+    elif precision == "fast":
+        quantization = models.QuantizationSearchParams(ignore=False, rescore=False)
+    else:
+        quantization = models.QuantizationSearchParams(
+            ignore=False,
+            rescore=True,
+            oversampling=float(oversampling or os.getenv("QDRANT_SEARCH_OVERSAMPLING", "2.0")),
+        )
+    return models.SearchParams(quantization=quantization)
+
 
 class VectorStore:
     """Lớp quản lý kho lưu trữ vector với Qdrant và hỗ trợ async"""
@@ -48,17 +134,32 @@ class VectorStore:
                 "QDRANT_URL và QDRANT_API_KEY phải được cung cấp trong file .env hoặc trong tham số khởi tạo"
             )
 
-        # Khởi tạo Qdrant client
+        # gRPC (cổng 6334) chỉ bật khi được cấu hình, mặc định dùng REST qua HTTPS
+        self.prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+        self._qdrant_url = qdrant_url
+        self._qdrant_api_key = qdrant_api_key
+
+        # Client đồng bộ cho các script và thao tác quản trị
         self.client = QdrantClient(
             url=qdrant_url,
             api_key=qdrant_api_key,
-            prefer_grpc=False,
+            prefer_grpc=self.prefer_grpc,
             https=True,
         )
+        # Client bất đồng bộ (tạo khi cần, gắn với event loop đang chạy)
+        self._async_client = None
+        self._async_client_loop = None
 
         # Lưu user_id và collection_name nếu có
         self.user_id = user_id
         self.collection_name = collection_name
+        # Các collection đã kiểm tra payload index trong tiến trình này
+        self._indexed_collections = set()
+        # Cache thông tin collection đã biết là tồn tại: tên -> {vector_size, distance}
+        self._collection_cache = {}
+        self._init_multitenancy()
+        self._init_chunk_cache()
+        self._init_lexical_index()
 
         # Nếu đã có cả user_id và collection_name, thì ghi log
         if user_id and collection_name:
@@ -67,7 +168,7 @@ class VectorStore:
             )
         # Nếu chỉ có user_id, tạo collection_name từ user_id
         elif user_id:
-            self.collection_name = f"user_{user_id}"
+            self.collection_name = self._collection_name_for(user_id)
             print(f"Khởi tạo Vector Store với collection: {self.collection_name}")
         # Nếu không có gì cả, chỉ khởi tạo client
         else:
@@ -75,6 +176,268 @@ class VectorStore:
                 "Khởi tạo Vector Store mà không chỉ định collection. Collection sẽ được xác định khi thao tác với cụ thể user_id."
             )
 
+    def _create_async_client(self):
+        """Tạo AsyncQdrantClient với connection pool giữ kết nối (HTTP/2 nếu có thư viện h2)"""
+        http2 = os.getenv("QDRANT_HTTP2", "true").lower() == "true"
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("Chưa cài h2, AsyncQdrantClient dùng HTTP/1.1 (pip install httpx[http2])")
+                http2 = False
+
+        return AsyncQdrantClient(
+            url=self._qdrant_url,
+            api_key=self._qdrant_api_key,
+            prefer_grpc=self.prefer_grpc,
+            https=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("QDRANT_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("QDRANT_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            ),
+        )
+
+    @property
+    def async_client(self):
+        """
+        AsyncQdrantClient dùng cho các phương thức bất đồng bộ
+
+        Connection pool gắn với event loop nên client được tạo lại nếu loop thay đổi
+        (ví dụ script gọi asyncio.run nhiều lần).
+        """
+        # View theo request (for_collection) dùng chung client với store gốc
+        owner = self.__dict__.get("_root") or self
+        loop = asyncio.get_event_loop()
+        if owner._async_client is None or owner._async_client_loop is not loop:
+            owner._async_client = owner._create_async_client()
+            owner._async_client_loop = loop
+        return owner._async_client
+
+    def __setattr__(self, name, value):
+        if name in ("collection_name", "user_id") and self.__dict__.get("_frozen"):
+            raise AttributeError(
+                f"View của collection {self.collection_name} không đổi được {name}, hãy tạo view mới bằng for_collection()"
+            )
+        super().__setattr__(name, value)
+
+    def for_collection(self, collection_name=None, user_id=None):
+        """
+        Tạo view nhẹ, bất biến gắn với một collection / user cho từng request
+
+        View dùng chung client, connection pool và các cache với store gốc, nên nhiều
+        request đồng thời có thể tìm kiếm trên các collection khác nhau mà không
+        phải sửa collection_name / user_id dùng chung.
+
+        Args:
+            collection_name: Collection của view (mặc định collection của user_id, hoặc collection hiện tại)
+            user_id: User của view (tenant khi bật multi-tenant)
+
+        Returns:
+            VectorStore không đổi được collection_name / user_id
+        """
+        if collection_name is None:
+            collection_name = self._collection_name_for(user_id) if user_id else self.collection_name
+        view = copy.copy(self)
+        view.__dict__.update(
+            {
+                "_root": self.__dict__.get("_root") or self,
+                "collection_name": collection_name,
+                "user_id": user_id,
+                "_frozen": True,
+            }
+        )
+        return view
+
+    def _init_multitenancy(self):
+        """Đọc cấu hình multi-tenant (VECTOR_STORE_MULTITENANT) thay cho mỗi user một collection"""
+        self.multitenant = os.getenv("VECTOR_STORE_MULTITENANT", "false").lower() == "true"
+        self.tenant_collection = os.getenv("MULTITENANT_COLLECTION", "global_documents")
+        self.shared_tenant_id = os.getenv("SHARED_TENANT_ID", "global")
+
+    def _init_chunk_cache(self):
+        """Cache payload của chunk cho truy xuất hai pha (CHUNK_CACHE_ENABLED), dùng chung với các view"""
+        enabled = os.getenv("CHUNK_CACHE_ENABLED", "true").lower() == "true"
+        self.chunk_cache = ChunkCache() if enabled else None
+
+    def _init_lexical_index(self, base_dir=None):
+        """Chỉ mục BM25 cho tìm kiếm lai (HYBRID_SEARCH), dùng chung với các view"""
+        enabled = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+        self.lexical_indexes = BM25Registry(base_dir) if enabled else None
+
+    def _cache_points(self, points, collection_name=None):
+        """
+        Làm nóng chunk cache và cập nhật chỉ mục BM25 (nếu đã dựng) bằng các point vừa upsert
+
+        Bỏ qua khi upsert vào collection không phải collection đang phục vụ (ví dụ phiên bản mới trong lúc
+        rebuild blue/green): truy vấn luôn đọc cache theo tên alias nên các mục khóa theo tên phiên bản
+        không bao giờ được dùng mà chỉ đẩy các mục đang dùng ra khỏi cache.
+        """
+        if collection_name is not None and collection_name != self.collection_name:
+            return
+        collection_name = self.collection_name
+        if self.chunk_cache is not None:
+            self.chunk_cache.put_many(
+                collection_name,
+                {str(point.id): point.payload for point in points},
+            )
+        if self.lexical_indexes is not None:
+            index = self.lexical_indexes.get(collection_name)
+            # Đang dựng: add chờ dựng xong rồi mới ghi, để point upsert sau khi đã duyệt qua không bị thiếu
+            if index.exists or index.building.locked():
+                index.add(
+                    (point.id, point.payload.get("text", ""), self._lexical_payload(point.payload))
+                    for point in points
+                )
+
+    def _invalidate_chunks(self, collection_name=None, point_ids=None, predicate=None):
+        """
+        Bỏ payload đã cache và các mục BM25 của các point bị xóa
+        (không truyền point_ids/predicate: toàn bộ collection, chỉ mục BM25 sẽ được dựng lại khi cần)
+        """
+        collection_name = collection_name or self.collection_name
+        if self.chunk_cache is not None:
+            self.chunk_cache.invalidate(collection_name, point_ids, predicate)
+        if self.lexical_indexes is not None:
+            index = self.lexical_indexes.get(collection_name)
+            with index.lock:
+                index.refresh()
+                if not index.exists:
+                    return
+                if point_ids is None and predicate is None:
+                    index.drop()
+                else:
+                    index.remove(point_ids, predicate)
+
+    @staticmethod
+    def _lexical_payload(payload):
+        """Payload rút gọn lưu cùng chỉ mục BM25, đủ cho các điều kiện lọc và xóa"""
+        lexical_payload = {
+            key: payload[key] for key in ("file_id", "source", "file_path", TENANT_FIELD) if key in payload
+        }
+        metadata_source = (payload.get("metadata") or {}).get("source")
+        if metadata_source is not None:
+            lexical_payload["metadata"] = {"source": metadata_source}
+        return lexical_payload
+
+    def _lexical_index(self, collection_name=None):
+        """
+        Chỉ mục BM25 của collection (đã cập nhật thay đổi của các tiến trình khác)
+
+        Lần dùng đầu tiên chỉ khởi động việc dựng chỉ mục trong thread nền và trả về None: tìm kiếm
+        chỉ dùng vector cho tới khi dựng xong, không request nào phải chờ duyệt toàn bộ collection.
+
+        Returns:
+            BM25Index hoặc None nếu tắt tìm kiếm lai / chỉ mục chưa sẵn sàng
+        """
+        if self.lexical_indexes is None:
+            return None
+        collection_name = collection_name or self.collection_name
+        index = self.lexical_indexes.get(collection_name)
+        index.refresh()
+        if index.exists:
+            return index
+        self.build_lexical_index_async(collection_name)
+        return None
+
+    def build_lexical_index_async(self, collection_name=None):
+        """Dựng chỉ mục BM25 của collection trong thread nền (bỏ qua nếu đang dựng)"""
+        if self.lexical_indexes is None:
+            return
+        collection_name = collection_name or self.collection_name
+        index = self.lexical_indexes.get(collection_name)
+        if not index.building.acquire(blocking=False):
+            return
+        threading.Thread(
+            target=self._build_lexical_index,
+            args=(collection_name, index),
+            name=f"bm25-build-{collection_name}",
+            daemon=True,
+        ).start()
+
+    def _build_lexical_index(self, collection_name, index):
+        try:
+            if not self.collection_exists_sync(collection_name):
+                return
+            index.refresh()
+            if index.exists:
+                return
+            print(f"Đang dựng chỉ mục BM25 cho collection {collection_name} (tạm thời chỉ tìm kiếm vector)...")
+            index.build(
+                (record.id, (record.payload or {}).get("text", ""), self._lexical_payload(record.payload or {}))
+                for record in self.scroll_iter(
+                    with_payload=["text", "file_id", "source", "file_path", "metadata", TENANT_FIELD],
+                    collection_name=collection_name,
+                )
+            )
+        except Exception as e:
+            print(f"Lỗi khi dựng chỉ mục BM25 cho collection {collection_name}: {str(e)}")
+        finally:
+            index.building.release()
+
+    def _lexical_filter(self, sources=None, file_id=None):
+        """Điều kiện lọc trên payload rút gọn, tương đương _build_filter + điều kiện tenant"""
+        tenants = None
+        if self.multitenant:
+            tenants = {self.shared_tenant_id}
+            if self.user_id:
+                tenants.add(self.user_id)
+        if not sources and not file_id and tenants is None:
+            return None
+        sources = set(sources) if sources else None
+        file_ids = set(file_id) if file_id else None
+
+        def allowed(payload):
+            if sources is not None and payload.get("source") not in sources:
+                return False
+            if file_ids is not None and payload.get("file_id") not in file_ids:
+                return False
+            if tenants is not None and payload.get(TENANT_FIELD) not in tenants:
+                return False
+            return True
+
+        return allowed
+
+    def lexical_search_sync(self, query, limit=5, sources=None, file_id=None):
+        """
+        Tìm kiếm từ khóa BM25 trên collection hiện tại (đồng bộ)
+
+        Returns:
+            Danh sách {"id", "bm25_score"} giảm dần theo điểm (rỗng nếu tắt tìm kiếm lai)
+        """
+        try:
+            index = self._lexical_index()
+            if index is None:
+                return []
+            hits = index.search(query, limit=limit, allowed=self._lexical_filter(sources, file_id))
+            return [{"id": point_id, "bm25_score": score} for point_id, score in hits]
+        except Exception as e:
+            print(f"Lỗi khi tìm kiếm BM25: {str(e)}")
+            return []
+
+    async def lexical_search(self, query, limit=5, sources=None, file_id=None):
+        """Tìm kiếm từ khóa BM25 (bất đồng bộ), chạy trong thread pool vì phải đọc đĩa để cập nhật chỉ mục"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.lexical_search_sync(query, limit=limit, sources=sources, file_id=file_id)
+        )
+
+    def get_lexical_index_stats(self):
+        """Trả về thống kê các chỉ mục BM25 đã dựng"""
+        if self.lexical_indexes is None:
+            return {"enabled": False}
+        return {"enabled": True, "collections": self.lexical_indexes.get_stats()}
+
+    def get_chunk_cache_stats(self):
+        """Trả về thống kê hit/miss của chunk cache"""
+        if self.chunk_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.chunk_cache.get_stats()}
+
+    def _collection_name_for(self, user_id):
+        """Collection chứa dữ liệu của user: collection chung nếu bật multi-tenant, ngược lại user_<id>"""
+        return self.tenant_collection if self.multitenant else f"user_{user_id}"
+
     def get_collection_name_for_user(self, user_id):
         """Lấy tên collection cho user_id cụ thể"""
         if not user_id:
@@ -83,10 +446,157 @@ class VectorStore:
         # Cập nhật user_id và collection_name hiện tại
         if self.user_id != user_id:
             self.user_id = user_id
-            self.collection_name = f"user_{user_id}"
+            self.collection_name = self._collection_name_for(user_id)
 
         return self.collection_name
 
+    @property
+    def tenant_id(self):
+        """Tenant của các thao tác hiện tại: user_id, hoặc tenant chung khi không có user (admin)"""
+        return self.user_id or self.shared_tenant_id
+
+    def _tenant_condition(self):
+        """Điều kiện chỉ thấy dữ liệu riêng của user và tài liệu chung (None nếu không bật multi-tenant)"""
+        if not self.multitenant:
+            return None
+        tenants = [self.shared_tenant_id]
+        if self.user_id and self.user_id != self.shared_tenant_id:
+            tenants.append(self.user_id)
+        return models.FieldCondition(key=TENANT_FIELD, match=models.MatchAny(any=tenants))
+
+    def _with_tenant(self, query_filter):
+        """Gộp điều kiện tenant vào filter tìm kiếm"""
+        tenant_condition = self._tenant_condition()
+        if tenant_condition is None:
+            return query_filter
+        if query_filter is None:
+            return models.Filter(must=[tenant_condition])
+        return models.Filter(must=[tenant_condition, query_filter])
+
+    def _owner_condition(self):
+        """Điều kiện chỉ chạm tới dữ liệu của chính tenant hiện tại (None nếu không bật multi-tenant)"""
+        if not self.multitenant:
+            return None
+        return models.FieldCondition(key=TENANT_FIELD, match=models.MatchValue(value=self.tenant_id))
+
+    def _with_owner(self, query_filter):
+        """
+        Gộp điều kiện tenant sở hữu vào filter xóa/đếm
+
+        Khác _with_tenant (được đọc cả tài liệu chung): view của một user chỉ được xóa dữ liệu của chính
+        user đó, view không có user (admin) chỉ xóa tài liệu chung
+        """
+        owner_condition = self._owner_condition()
+        if owner_condition is None:
+            return query_filter
+        if query_filter is None:
+            return models.Filter(must=[owner_condition])
+        return models.Filter(must=[owner_condition, query_filter])
+
+    def _payload_index_fields(self):
+        """Các trường cần payload index, thêm tenant_id (is_tenant) khi bật multi-tenant"""
+        if not self.multitenant:
+            return PAYLOAD_INDEX_FIELDS
+        return {**PAYLOAD_INDEX_FIELDS, TENANT_FIELD: TENANT_INDEX_SCHEMA}
+
+    def _collection_create_options(self):
+        """Tham số tạo collection: lượng tử hóa, và HNSW theo tenant (payload_m) nếu bật multi-tenant"""
+        options = {"quantization_config": build_quantization_config()}
+        if self.multitenant:
+            options["hnsw_config"] = models.HnswConfigDiff(
+                payload_m=int(os.getenv("MULTITENANT_PAYLOAD_M", "16")),
+            )
+        return options
+
+    @staticmethod
+    def _parse_collection_meta(collection_info):
+        """Lấy kích thước vector và hàm khoảng cách từ CollectionInfo"""
+        vectors = collection_info.config.params.vectors
+        if isinstance(vectors, dict):
+            # Named vectors: dùng vector đầu tiên
+            vectors = next(iter(vectors.values()))
+        return {"vector_size": vectors.size, "distance": vectors.distance}
+
+    @staticmethod
+    def _is_not_found_error(error):
+        """Lỗi do collection không tồn tại (REST 404, gRPC NOT_FOUND hoặc kho cục bộ)"""
+        if getattr(error, "status_code", None) == 404:
+            return True
+        code = getattr(error, "code", None)
+        if callable(code):
+            try:
+                if code().name == "NOT_FOUND":
+                    return True
+            except Exception:
+                pass
+        message = str(error).lower()
+        return "not found" in message or "doesn't exist" in message or "không tồn tại" in message
+
+    def _handle_collection_error(self, error, collection_name=None):
+        """Xóa cache của collection nếu lỗi cho thấy nó đã bị xóa ở nơi khác"""
+        if self._is_not_found_error(error):
+            self.invalidate_collection_cache(collection_name)
+
+    def invalidate_collection_cache(self, collection_name=None):
+        """Bỏ thông tin đã cache của collection (mặc định collection hiện tại)"""
+        collection_name = collection_name or self.collection_name
+        self._collection_cache.pop(collection_name, None)
+        self._indexed_collections.discard(collection_name)
+
+    def get_collection_meta_sync(self, collection_name=None):
+        """
+        Thông tin collection (vector_size, distance) từ cache, hỏi Qdrant một lần nếu chưa có
+
+        Returns:
+            Dict {vector_size, distance} hoặc None nếu collection không tồn tại
+        """
+        collection_name = collection_name or self.collection_name
+        collection_meta = self._collection_cache.get(collection_name)
+        if collection_meta is not None:
+            return collection_meta
+
+        try:
+            collection_info = self.client.get_collection(collection_name)
+        except Exception as e:
+            if self._is_not_found_error(e):
+                return None
+            raise
+        collection_meta = self._parse_collection_meta(collection_info)
+        self._collection_cache[collection_name] = collection_meta
+        return collection_meta
+
+    async def get_collection_meta(self, collection_name=None):
+        """Giống get_collection_meta_sync nhưng dùng AsyncQdrantClient"""
+        collection_name = collection_name or self.collection_name
+        collection_meta = self._collection_cache.get(collection_name)
+        if collection_meta is not None:
+            return collection_meta
+
+        try:
+            collection_info = await self.async_client.get_collection(collection_name)
+        except Exception as e:
+            if self._is_not_found_error(e):
+                return None
+            raise
+        collection_meta = self._parse_collection_meta(collection_info)
+        self._collection_cache[collection_name] = collection_meta
+        return collection_meta
+
+    def collection_exists_sync(self, collection_name=None):
+        """Kiểm tra collection tồn tại (dùng cache)"""
+        return self.get_collection_meta_sync(collection_name) is not None
+
+    async def collection_exists(self, collection_name=None):
+        """Kiểm tra collection tồn tại (bất đồng bộ, dùng cache)"""
+        return await self.get_collection_meta(collection_name) is not None
+
+    def _warn_vector_size_mismatch(self, collection_meta, vector_size):
+        if vector_size and collection_meta["vector_size"] != vector_size:
+            print(
+                f"CẢNH BÁO: Collection {self.collection_name} có vector_size={collection_meta['vector_size']} "
+                f"nhưng embedding model tạo vector {vector_size} chiều"
+            )
+
     async def ensure_collection_exists(self, vector_size, user_id=None):
         """Đảm bảo collection tồn tại trong Qdrant (bất đồng bộ)"""
         # Nếu có user_id mới, cập nhật collection_name
@@ -100,29 +610,30 @@ class VectorStore:
             )
             return False
 
-        # Chạy operations trong thread pool để không block
-        loop = asyncio.get_event_loop()
-        
-        collections = await loop.run_in_executor(
-            None, lambda: self.client.get_collections().collections
-        )
-        collection_names = [c.name for c in collections]
+        collection_meta = await self.get_collection_meta()
 
-        if self.collection_name not in collection_names:
+        if collection_meta is None:
             print(
                 f"Tạo collection mới: {self.collection_name} với vector_size={vector_size}"
             )
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
-                )
+            await self.async_client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+                **self._collection_create_options(),
             )
-            return True
+            self._collection_cache[self.collection_name] = {
+                "vector_size": vector_size,
+                "distance": Distance.COSINE,
+            }
         else:
             print(f"Collection {self.collection_name} đã tồn tại")
-            return True
+            self._warn_vector_size_mismatch(collection_meta, vector_size)
+
+        if self.collection_name not in self._indexed_collections:
+            # Thao tác một lần cho mỗi collection, dùng client đồng bộ trong thread pool
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._verify_payload_indexes)
+        return True
 
     def ensure_collection_exists_sync(self, vector_size, user_id=None):
         """Đảm bảo collection tồn tại trong Qdrant (đồng bộ)"""
@@ -137,26 +648,105 @@ class VectorStore:
             )
             return False
 
-        collections = self.client.get_collections().collections
-        collection_names = [c.name for c in collections]
+        collection_meta = self.get_collection_meta_sync()
 
-        if self.collection_name not in collection_names:
+        if collection_meta is None:
             print(
                 f"Tạo collection mới: {self.collection_name} với vector_size={vector_size}"
             )
             self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+                **self._collection_create_options(),
             )
-            return True
+            self._collection_cache[self.collection_name] = {
+                "vector_size": vector_size,
+                "distance": Distance.COSINE,
+            }
         else:
             print(f"Collection {self.collection_name} đã tồn tại")
-            return True
+            self._warn_vector_size_mismatch(collection_meta, vector_size)
 
-    async def index_documents(self, chunks, embeddings, user_id, file_id):
-        """Index dữ liệu lên Qdrant (bất đồng bộ)"""
-        start_time = time.time()
+        if self.collection_name not in self._indexed_collections:
+            self._verify_payload_indexes()
+        return True
 
+    def ensure_payload_indexes(self, collection_name=None):
+        """
+        Tạo keyword index cho các trường payload dùng để lọc (PAYLOAD_INDEX_FIELDS)
+
+        Index đã tồn tại đúng kiểu được giữ nguyên, index sai kiểu được tạo lại.
+
+        Args:
+            collection_name: Tên collection (mặc định collection hiện tại)
+
+        Returns:
+            Danh sách trường vừa được tạo index
+        """
+        collection_name = collection_name or self.collection_name
+        payload_schema = self.client.get_collection(collection_name).payload_schema or {}
+
+        created = []
+        for field_name, field_schema in self._payload_index_fields().items():
+            existing = payload_schema.get(field_name)
+            if existing is not None and self._index_matches(existing, field_schema):
+                continue
+            if existing is not None:
+                print(
+                    f"[INDEX] Trường {field_name} đang có index kiểu {existing.data_type}, tạo lại kiểu {field_schema}"
+                )
+                self.client.delete_payload_index(
+                    collection_name=collection_name, field_name=field_name, wait=True
+                )
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True,
+            )
+            created.append(field_name)
+
+        if created:
+            print(f"[INDEX] Đã tạo payload index cho {', '.join(created)} trong collection {collection_name}")
+        self._indexed_collections.add(collection_name)
+        return created
+
+    @staticmethod
+    def _index_matches(existing, field_schema):
+        """Index hiện có đúng kiểu (và đúng cờ is_tenant) với cấu hình mong muốn"""
+        expected_type = getattr(field_schema, "type", field_schema)
+        if existing.data_type != expected_type:
+            return False
+        expected_tenant = getattr(field_schema, "is_tenant", None)
+        return not expected_tenant or getattr(existing.params, "is_tenant", None) == expected_tenant
+
+    def update_quantization(self, mode=None, collection_name=None):
+        """
+        Bật / đổi / tắt lượng tử hóa cho collection đã tồn tại (Qdrant tự dựng lại ở nền)
+
+        Args:
+            mode: none, scalar hoặc binary (mặc định QDRANT_QUANTIZATION)
+            collection_name: Tên collection (mặc định collection hiện tại)
+        """
+        collection_name = collection_name or self.collection_name
+        quantization_config = build_quantization_config(mode)
+        if quantization_config is None:
+            quantization_config = models.Disabled.DISABLED
+        self.client.update_collection(
+            collection_name=collection_name,
+            quantization_config=quantization_config,
+        )
+        print(f"Đã cập nhật lượng tử hóa của {collection_name}: {mode or os.getenv('QDRANT_QUANTIZATION', 'none')}")
+
+    def _verify_payload_indexes(self):
+        """Kiểm tra payload index của collection hiện tại, lỗi chỉ được ghi log (index là tối ưu hóa)"""
+        try:
+            self.ensure_payload_indexes()
+        except Exception as e:
+            print(f"[INDEX] Không thể tạo payload index cho {self.collection_name}: {str(e)}")
+
+    async def _prepare_index_collection(self, user_id, vector_size):
+        """Xác định collection để index và tạo collection nếu chưa tồn tại (bất đồng bộ)"""
         # CẬP NHẬT: Cho phép user_id=None để index vào collection chung
         if user_id is not None:
             # Cập nhật collection_name nếu user_id khác hoặc chưa có collection_name
@@ -175,97 +765,439 @@ class VectorStore:
                 f"[INDEX] Sử dụng collection chung: {self.collection_name} (không dùng user_id)"
             )
 
-        print(
-            f"[INDEX] Bắt đầu index {len(chunks)} chunks vào collection {self.collection_name}"
-        )
-
         # Đảm bảo collection có tồn tại
-        loop = asyncio.get_event_loop()
-        collection_exists = await loop.run_in_executor(
-            None, lambda: self.client.collection_exists(self.collection_name)
-        )
-        
-        if not collection_exists:
-            # Lấy kích thước vector an toàn
-            vector_size = 768  # Giá trị mặc định
-            if embeddings is not None and len(embeddings) > 0:
-                if isinstance(embeddings[0], (list, np.ndarray)):
-                    # Kiểm tra xem embeddings[0] có phải là mảng hoặc danh sách
-                    vector_size = len(embeddings[0])
-                else:
-                    print(
-                        "[INDEX] Cảnh báo: embeddings[0] không phải là mảng như mong đợi"
-                    )
+        collection_exists = await self.collection_exists()
 
+        if not collection_exists:
             print(
                 f"[INDEX] Collection {self.collection_name} chưa tồn tại, tạo mới với size={vector_size}"
             )
             await self.ensure_collection_exists(vector_size)
+        elif self.collection_name not in self._indexed_collections:
+            # Collection tạo từ trước khi có payload index (hoặc tạo bên ngoài)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._verify_payload_indexes)
+
+    @staticmethod
+    def make_point_id(file_id, text):
+        """
+        Sinh ID point xác định từ file_id và hash nội dung chunk
+
+        Cùng một chunk của cùng một file luôn có cùng ID, nhờ vậy khi index lại
+        chỉ cần so sánh tập ID để biết chunk nào được thêm / bị xóa
+        """
+        if not file_id:
+            # Không có file_id thì không thể so sánh giữa các lần index, dùng ID ngẫu nhiên
+            return str(uuid.uuid4())
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{file_id}:{content_hash}"))
+
+    def _build_point(self, chunk, embedding, file_id):
+        """Tạo PointStruct từ một chunk và embedding tương ứng"""
+        # ID xác định theo (file_id, nội dung) để index lại không tạo bản trùng
+        point_id = self.make_point_id(file_id, chunk["text"])
+
+        # Đảm bảo source có trong cả payload trực tiếp và metadata
+        source = chunk.get("source", "unknown")
+
+        # Đảm bảo metadata là một dict
+        if "metadata" not in chunk or not isinstance(chunk["metadata"], dict):
+            chunk["metadata"] = {}
+
+        # Đảm bảo source cũng có trong metadata
+        if source and "source" not in chunk["metadata"]:
+            chunk["metadata"]["source"] = source
+
+        # Thêm timestamp để theo dõi nếu chưa có
+        if "indexed_at" not in chunk["metadata"]:
+            chunk["metadata"]["indexed_at"] = int(time.time())
+
+        # Đảm bảo embedding là danh sách trước khi thêm vào points
+        if isinstance(embedding, np.ndarray):
+            embedding = embedding.tolist()
+
+        # Tạo payload theo cấu trúc mới: các cờ boolean được gộp thành bitmask feature_flags,
+        # chunk_type/category có thêm mã số nhỏ
+        metadata, feature_fields = compact_metadata(chunk["metadata"])
+        payload = {
+            "text": chunk["text"],
+            "source": source,
+            "file_id": file_id,
+            "metadata": metadata,
+            **feature_fields,
+        }
+        if self.multitenant:
+            payload[TENANT_FIELD] = self.tenant_id
+
+        return PointStruct(
+            id=point_id,
+            vector=embedding,
+            payload=payload,
+        )
+
+    async def _upsert_pipeline(self, point_batches, parallelism=None, collection_name=None):
+        """
+        Gửi các batch point lên Qdrant qua hàng đợi giới hạn với nhiều upsert song song
+
+        Args:
+            point_batches: async iterator trả về từng danh sách PointStruct
+            parallelism: Số upsert chạy đồng thời (mặc định QDRANT_UPSERT_PARALLELISM)
+            collection_name: Collection đích (mặc định collection hiện tại)
+
+        Returns:
+            Tổng số point đã upsert
+        """
+        parallelism = parallelism or int(os.getenv("QDRANT_UPSERT_PARALLELISM", "4"))
+        async_client = self.async_client
+        # Hàng đợi giới hạn: producer (encode) phải chờ khi các upsert chưa kịp xử lý,
+        # nhờ vậy bộ nhớ chỉ giữ tối đa khoảng 2 x parallelism batch
+        queue = asyncio.Queue(maxsize=parallelism)
+        collection_name = collection_name or self.collection_name
+        upserted = 0
+
+        errors = []
+
+        async def upsert_worker():
+            nonlocal upserted
+            while True:
+                points = await queue.get()
+                if points is None:
+                    return
+                if errors:
+                    # Đã có lỗi: chỉ lấy bớt hàng đợi để producer không bị chặn vĩnh viễn
+                    continue
+                try:
+                    await async_client.upsert(
+                        collection_name=collection_name,
+                        points=points,
+                    )
+                    # Tách từ cho BM25 tốn CPU: chạy trong thread pool để không chặn event loop
+                    await asyncio.get_event_loop().run_in_executor(
+                        None, self._cache_points, points, collection_name
+                    )
+                    upserted += len(points)
+                except Exception as e:
+                    self._handle_collection_error(e, collection_name)
+                    errors.append(e)
+
+        workers = [asyncio.create_task(upsert_worker()) for _ in range(parallelism)]
+        try:
+            async for points in point_batches:
+                if points:
+                    await queue.put(points)
+                # Dừng sớm nếu một upsert đã lỗi
+                if errors:
+                    break
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+        if errors:
+            raise errors[0]
+        return upserted
+
+    async def index_documents(self, chunks, embeddings, user_id, file_id, batch_size=None, parallelism=None):
+        """Index dữ liệu lên Qdrant (bất đồng bộ)"""
+        start_time = time.time()
+
+        # Lấy kích thước vector an toàn
+        vector_size = 768  # Giá trị mặc định
+        if embeddings is not None and len(embeddings) > 0:
+            if isinstance(embeddings[0], (list, np.ndarray)):
+                # Kiểm tra xem embeddings[0] có phải là mảng hoặc danh sách
+                vector_size = len(embeddings[0])
+            else:
+                print(
+                    "[INDEX] Cảnh báo: embeddings[0] không phải là mảng như mong đợi"
+                )
+
+        await self._prepare_index_collection(user_id, vector_size)
+
+        print(
+            f"[INDEX] Bắt đầu index {len(chunks)} chunks vào collection {self.collection_name}"
+        )
 
-        points = []
         # Kiểm tra file_id
         if not file_id:
             print(
                 "[INDEX] Cảnh báo: file_id không được thiết lập"
             )
-        for idx, chunk in enumerate(chunks):
-            # Tạo ID ngẫu nhiên cho mỗi điểm để tránh ghi đè
-            point_id = str(uuid.uuid4())
 
-            # Đảm bảo source có trong cả payload trực tiếp và metadata
-            source = chunk.get("source", "unknown")
+        batch_size = batch_size or int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "128"))
 
-            # Đảm bảo metadata là một dict
-            if "metadata" not in chunk or not isinstance(chunk["metadata"], dict):
-                chunk["metadata"] = {}
+        async def point_batches():
+            for batch_start in range(0, len(chunks), batch_size):
+                batch_end = min(batch_start + batch_size, len(chunks))
+                yield [
+                    self._build_point(chunks[idx], embeddings[idx], file_id)
+                    for idx in range(batch_start, batch_end)
+                ]
 
-            # Đảm bảo source cũng có trong metadata
-            if source and "source" not in chunk["metadata"]:
-                chunk["metadata"]["source"] = source
+        # Gửi dữ liệu lên Qdrant bất đồng bộ theo từng batch
+        await self._upsert_pipeline(point_batches(), parallelism=parallelism)
 
-            # Thêm timestamp để theo dõi nếu chưa có
-            if "indexed_at" not in chunk["metadata"]:
-                chunk["metadata"]["indexed_at"] = int(time.time())
+        end_time = time.time()
+        print(
+            f"[INDEX] Hoàn thành index {len(chunks)} chunks vào collection {self.collection_name} trong {end_time - start_time:.2f}s"
+        )
 
-            # In thông tin để debug nếu là chunk đầu tiên hoặc mỗi 50 chunks
-            if idx == 0 or idx % 50 == 0 or idx == len(chunks) - 1:
-                print(
-                    f"[INDEX] Indexing chunk {idx}/{len(chunks)}: id={point_id}, source={source}"
+    async def index_documents_streaming(
+        self, chunks, embedding_model, user_id, file_id, batch_size=None, parallelism=None
+    ):
+        """
+        Encode và index chunks theo pipeline (bất đồng bộ)
+
+        Embedding của batch N+1 được tạo trong khi batch N đang được upsert lên Qdrant,
+        và hàng đợi giới hạn giữ cho bộ nhớ ổn định bất kể kích thước tài liệu.
+
+        Args:
+            chunks: Danh sách chunk cần index
+            embedding_model: EmbeddingModel dùng để encode
+            user_id: ID người dùng (None để dùng collection đã thiết lập)
+            file_id: ID của file
+            batch_size: Số chunk mỗi batch encode/upsert (mặc định QDRANT_UPSERT_BATCH_SIZE)
+            parallelism: Số upsert chạy đồng thời (mặc định QDRANT_UPSERT_PARALLELISM)
+
+        Returns:
+            Số chunk đã index
+        """
+        start_time = time.time()
+        await self._prepare_index_collection(user_id, embedding_model.get_dimension())
+
+        print(
+            f"[INDEX] Bắt đầu index (pipeline) {len(chunks)} chunks vào collection {self.collection_name}"
+        )
+
+        # Kiểm tra file_id
+        if not file_id:
+            print(
+                "[INDEX] Cảnh báo: file_id không được thiết lập"
+            )
+
+        batch_size = batch_size or int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "128"))
+        texts = [chunk["text"] for chunk in chunks]
+
+        async def point_batches():
+            async for batch_start, vectors in embedding_model.iter_encode_batches(
+                texts, batch_size=batch_size
+            ):
+                yield [
+                    self._build_point(chunks[batch_start + offset], vector, file_id)
+                    for offset, vector in enumerate(vectors)
+                ]
+
+        indexed = await self._upsert_pipeline(point_batches(), parallelism=parallelism)
+
+        end_time = time.time()
+        print(
+            f"[INDEX] Hoàn thành index (pipeline) {indexed} chunks vào collection {self.collection_name} trong {end_time - start_time:.2f}s"
+        )
+        return indexed
+
+    @staticmethod
+    def _file_id_filter(file_id):
+        """Filter các point thuộc một file_id"""
+        return Filter(
+            must=[
+                models.FieldCondition(
+                    key="file_id",
+                    match=models.MatchValue(value=file_id)
                 )
+            ]
+        )
 
-            # Đảm bảo embedding là danh sách trước khi thêm vào points
-            current_embedding = embeddings[idx]
-            if isinstance(current_embedding, np.ndarray):
-                current_embedding = current_embedding.tolist()
-
-            # Tạo payload theo cấu trúc mới
-            payload = {
-                "text": chunk["text"],
-                "source": source,
-                "file_id": file_id,
-                "metadata": chunk["metadata"],
-            }
+    @staticmethod
+    def _category_filter(category):
+        """Filter các point thuộc một danh mục (metadata.category)"""
+        return Filter(
+            must=[
+                models.FieldCondition(
+                    key="metadata.category",
+                    match=models.MatchValue(value=category)
+                )
+            ]
+        )
 
-            point = PointStruct(
-                id=point_id,
-                vector=current_embedding,
-                payload=payload,
+    def scroll_iter(
+        self, scroll_filter=None, with_payload=True, page_size=None, with_vectors=False, collection_name=None
+    ):
+        """
+        Duyệt toàn bộ point của collection theo từng trang (generator, bộ nhớ không đổi)
+
+        Args:
+            scroll_filter: Filter tùy chọn
+            with_payload: True (toàn bộ payload), False, hoặc danh sách trường cần lấy
+            page_size: Số point mỗi lần scroll (mặc định QDRANT_SCROLL_PAGE_SIZE)
+            with_vectors: Có lấy vector hay không
+            collection_name: Collection cần duyệt (mặc định collection hiện tại)
+
+        Yields:
+            Record của Qdrant
+        """
+        page_size = page_size or int(os.getenv("QDRANT_SCROLL_PAGE_SIZE", "512"))
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=collection_name or self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
             )
-            points.append(point)
+            yield from records
+            if offset is None:
+                break
+
+    def iter_documents(self, category=None, payload_fields=None, page_size=None, all_tenants=False):
+        """
+        Duyệt tài liệu trong collection (có thể lọc theo danh mục) dưới dạng dict
+
+        Khi bật multi-tenant chỉ trả về tài liệu chung và tài liệu của user hiện tại (giống tìm kiếm).
+
+        Args:
+            category: Danh mục cần lọc (None để lấy tất cả)
+            payload_fields: Danh sách trường payload cần lấy (mặc định text, metadata, source)
+            page_size: Số point mỗi lần scroll
+            all_tenants: True để duyệt dữ liệu của mọi tenant (chỉ dùng cho thao tác quản trị)
+
+        Yields:
+            Dict {"text", "metadata", "source"} hoặc {"id", <payload_fields>...} nếu chỉ định payload_fields
+        """
+        scroll_filter = self._category_filter(category) if category else None
+        if not all_tenants:
+            scroll_filter = self._with_tenant(scroll_filter)
+        with_payload = list(payload_fields) if payload_fields else True
+        for record in self.scroll_iter(scroll_filter, with_payload=with_payload, page_size=page_size):
+            payload = record.payload or {}
+            if payload_fields:
+                document = {"id": str(record.id)}
+                document.update({field: payload.get(field) for field in payload_fields})
+                yield document
+            else:
+                yield {
+                    "text": payload.get("text", ""),
+                    "metadata": payload.get("metadata", {}),
+                    "source": payload.get("source", "unknown"),
+                }
+
+    def get_point_ids_by_file_id(self, file_id, page_size=1000):
+        """
+        Lấy tập ID của tất cả point thuộc một file (không tải payload và vector)
+
+        Args:
+            file_id: ID của file
+            page_size: Số point mỗi lần scroll
 
-        # Gửi dữ liệu lên Qdrant bất đồng bộ
-        await loop.run_in_executor(
-            None,
-            lambda: self.client.upsert(
+        Returns:
+            Set các ID (chuỗi)
+        """
+        if not self.collection_exists_sync():
+            return set()
+
+        return {
+            str(record.id)
+            for record in self.scroll_iter(
+                self._with_owner(self._file_id_filter(file_id)), with_payload=False, page_size=page_size
+            )
+        }
+
+    async def get_point_ids_by_file_id_async(self, file_id, page_size=1000):
+        """Giống get_point_ids_by_file_id nhưng dùng AsyncQdrantClient"""
+        if not await self.collection_exists():
+            return set()
+
+        point_ids = set()
+        offset = None
+        while True:
+            records, offset = await self.async_client.scroll(
                 collection_name=self.collection_name,
-                points=points,
+                scroll_filter=self._with_owner(self._file_id_filter(file_id)),
+                limit=page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
             )
+            point_ids.update(str(record.id) for record in records)
+            if offset is None:
+                break
+        return point_ids
+
+    async def index_documents_incremental(
+        self, chunks, embedding_model, user_id, file_id, batch_size=None, parallelism=None
+    ):
+        """
+        Index lại một file theo kiểu tăng dần (bất đồng bộ)
+
+        So sánh tập chunk mới với các point đang có của file: chỉ encode/upsert chunk
+        mới và xóa các point không còn trong tài liệu, chunk không đổi được giữ nguyên.
+
+        Args:
+            chunks: Danh sách chunk của phiên bản mới của file
+            embedding_model: EmbeddingModel dùng để encode các chunk mới
+            user_id: ID người dùng (None để dùng collection đã thiết lập)
+            file_id: ID của file (bắt buộc, phải giống lần index trước)
+            batch_size: Số chunk mỗi batch encode/upsert (mặc định QDRANT_UPSERT_BATCH_SIZE)
+            parallelism: Số upsert chạy đồng thời (mặc định QDRANT_UPSERT_PARALLELISM)
+
+        Returns:
+            Dict thống kê: added, removed, unchanged
+        """
+        if not file_id:
+            raise ValueError("file_id là bắt buộc khi index tăng dần")
+
+        start_time = time.time()
+        await self._prepare_index_collection(user_id, embedding_model.get_dimension())
+
+        existing_ids = await self.get_point_ids_by_file_id_async(file_id)
+
+        # Các chunk trùng nội dung trong cùng file có cùng ID nên chỉ giữ một bản
+        new_chunks = {}
+        for chunk in chunks:
+            new_chunks.setdefault(self.make_point_id(file_id, chunk["text"]), chunk)
+
+        added_chunks = [
+            chunk for point_id, chunk in new_chunks.items() if point_id not in existing_ids
+        ]
+        removed_ids = [point_id for point_id in existing_ids if point_id not in new_chunks]
+        unchanged = len(new_chunks) - len(added_chunks)
+
+        print(
+            f"[INDEX] Index tăng dần file_id={file_id}: thêm {len(added_chunks)}, "
+            f"xóa {len(removed_ids)}, giữ nguyên {unchanged}"
         )
 
+        # Upsert trước rồi mới xóa để file luôn tìm kiếm được trong lúc cập nhật
+        if added_chunks:
+            await self.index_documents_streaming(
+                added_chunks,
+                embedding_model,
+                user_id,
+                file_id,
+                batch_size=batch_size,
+                parallelism=parallelism,
+            )
+
+        if removed_ids:
+            await self.async_client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=removed_ids),
+            )
+            self._invalidate_chunks(point_ids=removed_ids)
+
         end_time = time.time()
         print(
-            f"[INDEX] Hoàn thành index {len(chunks)} chunks vào collection {self.collection_name} trong {end_time - start_time:.2f}s"
+            f"[INDEX] Hoàn thành index tăng dần file_id={file_id} trong {end_time - start_time:.2f}s"
         )
+        return {
+            "added": len(added_chunks),
+            "removed": len(removed_ids),
+            "unchanged": unchanged,
+        }
 
     def index_documents_sync(self, chunks, embeddings, user_id, file_id):
         """Index dữ liệu lên Qdrant (đồng bộ - để tương thích ngược)"""
@@ -294,7 +1226,7 @@ class VectorStore:
         )
 
         # Đảm bảo collection có tồn tại
-        if not self.client.collection_exists(self.collection_name):
+        if not self.collection_exists_sync():
             # Lấy kích thước vector an toàn
             vector_size = 768  # Giá trị mặc định
             if embeddings is not None and len(embeddings) > 0:
@@ -311,70 +1243,175 @@ class VectorStore:
             )
             self.ensure_collection_exists_sync(vector_size)
 
-        points = []
         # Kiểm tra file_id
         if not file_id:
             print(
                 "[INDEX] Cảnh báo: file_id không được thiết lập"
             )
-        for idx, chunk in enumerate(chunks):
-            # Tạo ID ngẫu nhiên cho mỗi điểm để tránh ghi đè
-            point_id = str(uuid.uuid4())
-
-            # Đảm bảo source có trong cả payload trực tiếp và metadata
-            source = chunk.get("source", "unknown")
+        # Gửi dữ liệu lên Qdrant theo từng batch để không giữ toàn bộ points trong bộ nhớ
+        batch_size = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "128"))
+        for batch_start in range(0, len(chunks), batch_size):
+            batch_end = min(batch_start + batch_size, len(chunks))
+            points = [
+                self._build_point(chunks[idx], embeddings[idx], file_id)
+                for idx in range(batch_start, batch_end)
+            ]
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points,
+            )
+            self._cache_points(points)
 
-            # Đảm bảo metadata là một dict
-            if "metadata" not in chunk or not isinstance(chunk["metadata"], dict):
-                chunk["metadata"] = {}
+        end_time = time.time()
+        print(
+            f"[INDEX] Hoàn thành index {len(chunks)} chunks vào collection {self.collection_name} trong {end_time - start_time:.2f}s"
+        )
 
-            # Đảm bảo source cũng có trong metadata
-            if source and "source" not in chunk["metadata"]:
-                chunk["metadata"]["source"] = source
+    @staticmethod
+    def _build_filter(sources=None, file_id=None):
+        """Tạo Filter từ danh sách nguồn và/hoặc danh sách file_id (None nếu không lọc)"""
+        filter_conditions = []
 
-            # Thêm timestamp để theo dõi nếu chưa có
-            if "indexed_at" not in chunk["metadata"]:
-                chunk["metadata"]["indexed_at"] = int(time.time())
+        if sources:
+            source_conditions = []
+            for source in sources:
+                source_conditions.append(
+                    models.FieldCondition(
+                        key="source", match=models.MatchValue(value=source)
+                    )
+                )
+            if len(source_conditions) == 1:
+                filter_conditions.append(source_conditions[0])
+            else:
+                filter_conditions.append(
+                    models.Filter(should=source_conditions)
+                )
 
-            # In thông tin để debug nếu là chunk đầu tiên hoặc mỗi 50 chunks
-            if idx == 0 or idx % 50 == 0 or idx == len(chunks) - 1:
-                print(
-                    f"[INDEX] Indexing chunk {idx}/{len(chunks)}: id={point_id}, source={source}"
+        if file_id:
+            file_id_conditions = []
+            for fid in file_id:
+                file_id_conditions.append(
+                    models.FieldCondition(
+                        key="file_id", match=models.MatchValue(value=fid)
+                    )
+                )
+            if len(file_id_conditions) == 1:
+                filter_conditions.append(file_id_conditions[0])
+            else:
+                filter_conditions.append(
+                    models.Filter(should=file_id_conditions)
                 )
 
-            # Đảm bảo embedding là danh sách trước khi thêm vào points
-            current_embedding = embeddings[idx]
-            if isinstance(current_embedding, np.ndarray):
-                current_embedding = current_embedding.tolist()
-
-            # Tạo payload theo cấu trúc mới
-            payload = {
-                "text": chunk["text"],
-                "source": source,
-                "file_id": file_id,
-                "metadata": chunk["metadata"],
-            }
+        # Kết hợp các điều kiện filter
+        if len(filter_conditions) == 0:
+            query_filter = None
+        elif len(filter_conditions) == 1:
+            query_filter = models.Filter(must=[filter_conditions[0]])
+        else:
+            query_filter = models.Filter(must=filter_conditions)
+        return query_filter
+
+    @staticmethod
+    def _format_payload(point_id, payload, score):
+        """Dict kết quả chuẩn từ ID, payload và điểm"""
+        return {
+            "id": str(point_id),
+            "text": payload.get("text", ""),
+            "source": payload.get("source", "unknown"),
+            "file_id": payload.get("file_id", ""),
+            "metadata": payload.get("metadata", {}),
+            FEATURE_FIELD: payload.get(FEATURE_FIELD),
+            "score": score,
+        }
+
+    def _format_result(self, result):
+        """Chuyển ScoredPoint thành dict kết quả chuẩn (chỉ id + score nếu tìm với with_payload=False)"""
+        if result.payload is None:
+            return {"id": str(result.id), "score": result.score}
+        return self._format_payload(result.id, result.payload, result.score)
+
+    def _fill_payloads(self, results, fetched):
+        """Ghép payload vào các kết quả chỉ có id (giữ các điểm đã có như bm25_score), bỏ kết quả mà point đã bị xóa"""
+        filled = []
+        for result in results:
+            if "text" in result:
+                filled.append(result)
+                continue
+            payload = fetched.get(result["id"])
+            if payload is not None:
+                filled.append({**result, **self._format_payload(result["id"], payload, result["score"])})
+        return filled
+
+    async def fetch_payloads(self, results):
+        """
+        Pha 2 của truy xuất hai pha: bổ sung text/metadata cho các kết quả chỉ có id (bất đồng bộ)
 
-            point = PointStruct(
-                id=point_id,
-                vector=current_embedding,
-                payload=payload,
-            )
-            points.append(point)
+        Payload lấy từ chunk cache, các ID chưa có được retrieve một lần từ Qdrant rồi đưa vào cache.
+        Kết quả đã có text (ví dụ tìm với with_payload=True) được giữ nguyên.
 
-        # Gửi dữ liệu lên Qdrant
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points,
-        )
+        Args:
+            results: Danh sách kết quả (thường là top-N cần rerank)
 
-        end_time = time.time()
-        print(
-            f"[INDEX] Hoàn thành index {len(chunks)} chunks vào collection {self.collection_name} trong {end_time - start_time:.2f}s"
-        )
+        Returns:
+            Danh sách kết quả đầy đủ, giữ nguyên thứ tự
+        """
+        point_ids = [result["id"] for result in results if "text" not in result]
+        if not point_ids:
+            return results
+
+        fetched, missing = self._lookup_chunks(point_ids)
+        if missing:
+            try:
+                records = await self.async_client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=missing,
+                    with_payload=True,
+                    with_vectors=False,
+                )
+                fetched.update(self._store_records(records))
+            except Exception as e:
+                self._handle_collection_error(e)
+                print(f"Lỗi khi lấy payload của {len(missing)} chunk: {str(e)}")
+        return self._fill_payloads(results, fetched)
+
+    def fetch_payloads_sync(self, results):
+        """Giống fetch_payloads nhưng dùng client đồng bộ"""
+        point_ids = [result["id"] for result in results if "text" not in result]
+        if not point_ids:
+            return results
+
+        fetched, missing = self._lookup_chunks(point_ids)
+        if missing:
+            try:
+                records = self.client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=missing,
+                    with_payload=True,
+                    with_vectors=False,
+                )
+                fetched.update(self._store_records(records))
+            except Exception as e:
+                self._handle_collection_error(e)
+                print(f"Lỗi khi lấy payload của {len(missing)} chunk: {str(e)}")
+        return self._fill_payloads(results, fetched)
+
+    def _lookup_chunks(self, point_ids):
+        if self.chunk_cache is None:
+            return {}, list(point_ids)
+        return self.chunk_cache.get_many(self.collection_name, point_ids)
+
+    def _store_records(self, records):
+        payloads = {str(record.id): record.payload for record in records}
+        if self.chunk_cache is not None:
+            self.chunk_cache.put_many(self.collection_name, payloads)
+        return payloads
+
+    async def search(self, query_vector, limit=5, user_id=None, precision=None, with_payload=True):
+        """
+        Tìm kiếm vector tương tự (bất đồng bộ), precision: fast / balanced / exact
 
-    async def search(self, query_vector, limit=5, user_id=None):
-        """Tìm kiếm vector tương tự (bất đồng bộ)"""
+        with_payload=False chỉ trả về id + score (pha 1 của truy xuất hai pha, xem fetch_payloads)
+        """
         # Cập nhật collection_name nếu user_id được cung cấp và khác với hiện tại
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
@@ -385,38 +1422,28 @@ class VectorStore:
             )
             return []
 
-        loop = asyncio.get_event_loop()
-        
         try:
-            search_result = await loop.run_in_executor(
-                None,
-                lambda: self.client.search(
-                    collection_name=self.collection_name,
-                    query_vector=query_vector,
-                    limit=limit,
-                )
+            search_result = await self.async_client.search(
+                collection_name=self.collection_name,
+                query_vector=query_vector,
+                query_filter=self._with_tenant(None),
+                limit=limit,
+                search_params=build_search_params(precision),
+                with_payload=with_payload,
             )
 
-            results = []
-            for result in search_result:
-                doc = {
-                    "text": result.payload.get("text", ""),
-                    "source": result.payload.get("source", "unknown"),
-                    "file_id": result.payload.get("file_id", ""),
-                    "metadata": result.payload.get("metadata", {}),
-                    "score": result.score,
-                }
-                results.append(doc)
+            results = [self._format_result(result) for result in search_result]
 
             print(f"Vector search tìm thấy {len(results)} kết quả trong collection {self.collection_name}")
             return results
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"Lỗi khi tìm kiếm vector: {str(e)}")
             return []
 
-    def search_sync(self, query_vector, limit=5, user_id=None):
-        """Tìm kiếm vector tương tự (đồng bộ)"""
+    def search_sync(self, query_vector, limit=5, user_id=None, precision=None, with_payload=True):
+        """Tìm kiếm vector tương tự (đồng bộ), precision: fast / balanced / exact, with_payload như search"""
         # Cập nhật collection_name nếu user_id được cung cấp và khác với hiện tại
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
@@ -431,118 +1458,63 @@ class VectorStore:
             search_result = self.client.search(
                 collection_name=self.collection_name,
                 query_vector=query_vector,
+                query_filter=self._with_tenant(None),
                 limit=limit,
+                search_params=build_search_params(precision),
+                with_payload=with_payload,
             )
 
-            results = []
-            for result in search_result:
-                doc = {
-                    "text": result.payload.get("text", ""),
-                    "source": result.payload.get("source", "unknown"),
-                    "file_id": result.payload.get("file_id", ""),
-                    "metadata": result.payload.get("metadata", {}),
-                    "score": result.score,
-                }
-                results.append(doc)
+            results = [self._format_result(result) for result in search_result]
 
             print(f"Vector search tìm thấy {len(results)} kết quả trong collection {self.collection_name}")
             return results
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"Lỗi khi tìm kiếm vector: {str(e)}")
             return []
 
     async def search_with_filter(
-        self, query_vector, sources=None, file_id=None, user_id=None, limit=5
+        self, query_vector, sources=None, file_id=None, user_id=None, limit=5, precision=None, with_payload=True
     ):
-        """Tìm kiếm vector có filter (bất đồng bộ)"""
+        """Tìm kiếm vector có filter (bất đồng bộ), with_payload như search"""
         # Cập nhật collection_name nếu user_id được cung cấp
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
 
-        if not self.collection_name:
-            print(
-                "CẢNH BÁO: Không có collection_name để tìm kiếm. Cần thiết lập user_id hoặc collection_name."
-            )
-            return []
-
-        # Xây dựng filter
-        filter_conditions = []
-
-        if sources:
-            source_conditions = []
-            for source in sources:
-                source_conditions.append(
-                    models.FieldCondition(
-                        key="source", match=models.MatchValue(value=source)
-                    )
-                )
-            if len(source_conditions) == 1:
-                filter_conditions.append(source_conditions[0])
-            else:
-                filter_conditions.append(
-                    models.Filter(should=source_conditions)
-                )
-
-        if file_id:
-            file_id_conditions = []
-            for fid in file_id:
-                file_id_conditions.append(
-                    models.FieldCondition(
-                        key="file_id", match=models.MatchValue(value=fid)
-                    )
-                )
-            if len(file_id_conditions) == 1:
-                filter_conditions.append(file_id_conditions[0])
-            else:
-                filter_conditions.append(
-                    models.Filter(should=file_id_conditions)
-                )
+        if not self.collection_name:
+            print(
+                "CẢNH BÁO: Không có collection_name để tìm kiếm. Cần thiết lập user_id hoặc collection_name."
+            )
+            return []
 
-        # Kết hợp các điều kiện filter
-        if len(filter_conditions) == 0:
-            query_filter = None
-        elif len(filter_conditions) == 1:
-            query_filter = models.Filter(must=[filter_conditions[0]])
-        else:
-            query_filter = models.Filter(must=filter_conditions)
+        query_filter = self._with_tenant(self._build_filter(sources, file_id))
 
-        loop = asyncio.get_event_loop()
-        
         try:
-            search_result = await loop.run_in_executor(
-                None,
-                lambda: self.client.search(
-                    collection_name=self.collection_name,
-                    query_vector=query_vector,
-                    query_filter=query_filter,
-                    limit=limit,
-                )
+            search_result = await self.async_client.search(
+                collection_name=self.collection_name,
+                query_vector=query_vector,
+                query_filter=query_filter,
+                limit=limit,
+                search_params=build_search_params(precision),
+                with_payload=with_payload,
             )
 
-            results = []
-            for result in search_result:
-                doc = {
-                    "text": result.payload.get("text", ""),
-                    "source": result.payload.get("source", "unknown"),
-                    "file_id": result.payload.get("file_id", ""),
-                    "metadata": result.payload.get("metadata", {}),
-                    "score": result.score,
-                }
-                results.append(doc)
+            results = [self._format_result(result) for result in search_result]
 
             filter_desc = f"sources={sources}" if sources else f"file_id={file_id}" if file_id else "no filter"
             print(f"Vector search với filter ({filter_desc}) tìm thấy {len(results)} kết quả")
             return results
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"Lỗi khi tìm kiếm vector với filter: {str(e)}")
             return []
 
     def search_with_filter_sync(
-        self, query_vector, sources=None, file_id=None, user_id=None, limit=5
+        self, query_vector, sources=None, file_id=None, user_id=None, limit=5, precision=None, with_payload=True
     ):
-        """Tìm kiếm vector có filter (đồng bộ)"""
+        """Tìm kiếm vector có filter (đồng bộ), with_payload như search"""
         # Cập nhật collection_name nếu user_id được cung cấp
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
@@ -553,46 +1525,7 @@ class VectorStore:
             )
             return []
 
-        # Xây dựng filter
-        filter_conditions = []
-
-        if sources:
-            source_conditions = []
-            for source in sources:
-                source_conditions.append(
-                    models.FieldCondition(
-                        key="source", match=models.MatchValue(value=source)
-                    )
-                )
-            if len(source_conditions) == 1:
-                filter_conditions.append(source_conditions[0])
-            else:
-                filter_conditions.append(
-                    models.Filter(should=source_conditions)
-                )
-
-        if file_id:
-            file_id_conditions = []
-            for fid in file_id:
-                file_id_conditions.append(
-                    models.FieldCondition(
-                        key="file_id", match=models.MatchValue(value=fid)
-                    )
-                )
-            if len(file_id_conditions) == 1:
-                filter_conditions.append(file_id_conditions[0])
-            else:
-                filter_conditions.append(
-                    models.Filter(should=file_id_conditions)
-                )
-
-        # Kết hợp các điều kiện filter
-        if len(filter_conditions) == 0:
-            query_filter = None
-        elif len(filter_conditions) == 1:
-            query_filter = models.Filter(must=[filter_conditions[0]])
-        else:
-            query_filter = models.Filter(must=filter_conditions)
+        query_filter = self._with_tenant(self._build_filter(sources, file_id))
 
         try:
             search_result = self.client.search(
@@ -600,29 +1533,152 @@ class VectorStore:
                 query_vector=query_vector,
                 query_filter=query_filter,
                 limit=limit,
+                search_params=build_search_params(precision),
+                with_payload=with_payload,
             )
 
-            results = []
-            for result in search_result:
-                doc = {
-                    "text": result.payload.get("text", ""),
-                    "source": result.payload.get("source", "unknown"),
-                    "file_id": result.payload.get("file_id", ""),
-                    "metadata": result.payload.get("metadata", {}),
-                    "score": result.score,
-                }
-                results.append(doc)
+            results = [self._format_result(result) for result in search_result]
 
             filter_desc = f"sources={sources}" if sources else f"file_id={file_id}" if file_id else "no filter"
             print(f"Vector search với filter ({filter_desc}) tìm thấy {len(results)} kết quả")
             return results
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"Lỗi khi tìm kiếm vector với filter: {str(e)}")
             return []
 
+    def _build_search_requests(self, query_vectors, filters=None, limit=5, precision=None, with_payload=True):
+        """
+        Tạo danh sách SearchRequest cho search_batch
+
+        Args:
+            query_vectors: Danh sách vector truy vấn
+            filters: None, một filter dùng chung cho mọi truy vấn, hoặc danh sách filter theo từng truy vấn.
+                Mỗi filter là models.Filter hoặc dict {"sources": [...], "file_id": [...]}
+            limit: Số kết quả mỗi truy vấn
+            precision: fast / balanced / exact
+            with_payload: False để chỉ lấy id + score
+
+        Returns:
+            Danh sách models.SearchRequest
+        """
+        if filters is None or isinstance(filters, (dict, models.Filter)):
+            filters = [filters] * len(query_vectors)
+        elif len(filters) != len(query_vectors):
+            raise ValueError(
+                f"Số filter ({len(filters)}) không khớp số truy vấn ({len(query_vectors)})"
+            )
+
+        search_params = build_search_params(precision)
+        requests = []
+        for query_vector, query_filter in zip(query_vectors, filters):
+            if isinstance(query_filter, dict):
+                query_filter = self._build_filter(
+                    query_filter.get("sources"), query_filter.get("file_id")
+                )
+            if hasattr(query_vector, "tolist"):
+                query_vector = query_vector.tolist()
+            requests.append(
+                models.SearchRequest(
+                    vector=query_vector,
+                    filter=self._with_tenant(query_filter),
+                    limit=limit,
+                    params=search_params,
+                    with_payload=with_payload,
+                )
+            )
+        return requests
+
+    async def search_batch(
+        self, query_vectors, filters=None, limit=5, user_id=None, precision=None, with_payload=True
+    ):
+        """
+        Tìm kiếm nhiều truy vấn trong một lần gọi Qdrant (bất đồng bộ)
+
+        Args:
+            query_vectors: Danh sách vector truy vấn
+            filters: None, một filter chung hoặc danh sách filter theo từng truy vấn (xem _build_search_requests)
+            limit: Số kết quả mỗi truy vấn
+            user_id: ID người dùng (tùy chọn)
+            precision: fast / balanced / exact
+            with_payload: False để chỉ lấy id + score (bổ sung sau bằng fetch_payloads)
+
+        Returns:
+            Danh sách kết quả theo đúng thứ tự truy vấn, mỗi phần tử là danh sách doc có score
+        """
+        if user_id and user_id != self.user_id:
+            self.collection_name = self.get_collection_name_for_user(user_id)
+
+        if not self.collection_name:
+            print(
+                "CẢNH BÁO: Không có collection_name để tìm kiếm. Cần thiết lập user_id hoặc collection_name."
+            )
+            return [[] for _ in query_vectors]
+
+        if len(query_vectors) == 0:
+            return []
+
+        try:
+            requests = self._build_search_requests(query_vectors, filters, limit, precision, with_payload)
+            batch_result = await self.async_client.search_batch(
+                collection_name=self.collection_name, requests=requests
+            )
+
+            results = [
+                [self._format_result(result) for result in search_result]
+                for search_result in batch_result
+            ]
+
+            print(
+                f"Batch search {len(requests)} truy vấn tìm thấy {sum(len(r) for r in results)} kết quả trong collection {self.collection_name}"
+            )
+            return results
+
+        except Exception as e:
+            self._handle_collection_error(e)
+            print(f"Lỗi khi batch search vector: {str(e)}")
+            return [[] for _ in query_vectors]
+
+    def search_batch_sync(
+        self, query_vectors, filters=None, limit=5, user_id=None, precision=None, with_payload=True
+    ):
+        """Tìm kiếm nhiều truy vấn trong một lần gọi Qdrant (đồng bộ), tham số giống search_batch"""
+        if user_id and user_id != self.user_id:
+            self.collection_name = self.get_collection_name_for_user(user_id)
+
+        if not self.collection_name:
+            print(
+                "CẢNH BÁO: Không có collection_name để tìm kiếm. Cần thiết lập user_id hoặc collection_name."
+            )
+            return [[] for _ in query_vectors]
+
+        if len(query_vectors) == 0:
+            return []
+
+        try:
+            requests = self._build_search_requests(query_vectors, filters, limit, precision, with_payload)
+            batch_result = self.client.search_batch(
+                collection_name=self.collection_name, requests=requests
+            )
+
+            results = [
+                [self._format_result(result) for result in search_result]
+                for search_result in batch_result
+            ]
+
+            print(
+                f"Batch search {len(requests)} truy vấn tìm thấy {sum(len(r) for r in results)} kết quả trong collection {self.collection_name}"
+            )
+            return results
+
+        except Exception as e:
+            self._handle_collection_error(e)
+            print(f"Lỗi khi batch search vector: {str(e)}")
+            return [[] for _ in query_vectors]
+
     def get_all_documents(self, limit=1000, user_id=None):
-        """Lấy tất cả tài liệu từ collection"""
+        """Lấy tất cả tài liệu từ collection (tối đa limit, None để lấy toàn bộ)"""
         # Cập nhật collection_name nếu có user_id mới
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
@@ -638,48 +1694,39 @@ class VectorStore:
 
         try:
             # Kiểm tra xem collection có tồn tại không
-            if not self.client.collection_exists(self.collection_name):
+            if not self.collection_exists_sync():
                 print(f"Collection {self.collection_name} không tồn tại")
                 return []
 
-            collection_info = self.get_collection_info()
-            if not collection_info:
-                print(f"Collection {self.collection_name} không tồn tại")
-                return []
+            # Scroll qua từng trang bằng next_offset để không bỏ sót point
+            return list(islice(self.iter_documents(), limit))
 
-            points_count = collection_info.get("points_count", 0)
-            if points_count == 0:
-                print(f"Collection {self.collection_name} không có dữ liệu")
-                return []
+        except Exception as e:
+            self._handle_collection_error(e)
+            print(f"Lỗi khi lấy tất cả tài liệu: {str(e)}")
+            return []
 
-            # Giới hạn số lượng tài liệu trả về nếu quá lớn
-            actual_limit = min(limit, points_count)
+    def delete_tenant(self, tenant_id):
+        """
+        Xóa toàn bộ point của một tenant trong collection chung (chế độ multi-tenant)
 
-            # Scroll để lấy tất cả points
-            results = self.client.scroll(
+        Returns:
+            Tuple (success, message)
+        """
+        try:
+            self.client.delete(
                 collection_name=self.collection_name,
-                limit=actual_limit,
-                with_payload=True,
-                with_vectors=False,  # Không cần vector vì chỉ dùng văn bản
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(
+                        must=[models.FieldCondition(key=TENANT_FIELD, match=models.MatchValue(value=tenant_id))]
+                    )
+                ),
             )
-
-            points, next_offset = results
-
-            # Chuyển đổi thành định dạng chuẩn
-            documents = [
-                {
-                    "text": point.payload["text"],
-                    "metadata": point.payload["metadata"],
-                    "source": point.payload.get("source", "unknown"),
-                }
-                for point in points
-            ]
-
-            return documents
-
+            self._invalidate_chunks(predicate=lambda payload: payload.get(TENANT_FIELD) == tenant_id)
+            return True, f"Đã xóa dữ liệu của tenant {tenant_id} trong collection {self.collection_name}"
         except Exception as e:
-            print(f"Lỗi khi lấy tất cả tài liệu: {str(e)}")
-            return []
+            self._handle_collection_error(e)
+            return False, f"Lỗi khi xóa dữ liệu của tenant {tenant_id}: {str(e)}"
 
     def delete_collection(self, user_id=None):
         """Xóa collection trong Qdrant"""
@@ -687,16 +1734,26 @@ class VectorStore:
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
 
+        # Multi-tenant: collection dùng chung, chỉ xóa dữ liệu của tenant hiện tại
+        # (view không có user chỉ xóa tài liệu chung, không bao giờ xóa cả collection)
+        if self.multitenant:
+            success, message = self.delete_tenant(self.tenant_id)
+            print(message)
+            return
+
         if not self.collection_name:
             raise ValueError(
                 "collection_name không được để trống. Cần user_id để xác định collection."
             )
 
-        if not self.client.collection_exists(self.collection_name):
+        if not self.collection_exists_sync():
             print(f"Collection {self.collection_name} không tồn tại, không cần xóa")
             return
 
-        self.client.delete_collection(self.collection_name)
+        # collection_name có thể là alias: xóa collection thật (alias bị xóa theo)
+        self.client.delete_collection(self.resolve_collection_name() or self.collection_name)
+        self.invalidate_collection_cache()
+        self._invalidate_chunks()
         print(f"Đã xóa collection {self.collection_name}")
 
     def get_collection_info(self, user_id=None):
@@ -711,18 +1768,243 @@ class VectorStore:
             )
 
         try:
-            if not self.client.collection_exists(self.collection_name):
-                print(f"Collection {self.collection_name} không tồn tại")
-                return None
-
+            # Gọi thẳng get_collection (1 round trip) và cập nhật cache từ kết quả
             collection_info = self.client.get_collection(self.collection_name)
+            self._collection_cache[self.collection_name] = self._parse_collection_meta(collection_info)
             return collection_info.dict()
         except Exception as e:
+            self._handle_collection_error(e)
+            if self._is_not_found_error(e):
+                print(f"Collection {self.collection_name} không tồn tại")
+                return None
             print(f"Lỗi khi lấy thông tin collection: {str(e)}")
             return None
 
+    # ----- Blue/green: collection theo phiên bản + alias -----
+
+    @staticmethod
+    def _is_collection_version(name, alias):
+        """Tên có dạng <alias>_v<YYYYmmddHHMMSS> (một phiên bản của alias)"""
+        prefix = f"{alias}_v"
+        return name.startswith(prefix) and name[len(prefix):].isdigit()
+
+    def resolve_collection_name(self, alias=None):
+        """
+        Collection thật mà alias đang trỏ tới
+
+        Returns:
+            Tên collection, chính alias nếu đó là collection thật (chưa chuyển sang alias), None nếu không tồn tại
+        """
+        alias = alias or self.collection_name
+        for alias_description in self.client.get_aliases().aliases:
+            if alias_description.alias_name == alias:
+                return alias_description.collection_name
+        collection_names = {c.name for c in self.client.get_collections().collections}
+        return alias if alias in collection_names else None
+
+    def list_collection_versions(self, alias=None):
+        """Danh sách các phiên bản của alias, cũ nhất trước"""
+        alias = alias or self.collection_name
+        return sorted(
+            c.name
+            for c in self.client.get_collections().collections
+            if self._is_collection_version(c.name, alias)
+        )
+
+    def switch_alias(self, alias, collection_name):
+        """
+        Chuyển alias sang collection_name trong một thao tác nguyên tử
+
+        Lần đầu chuyển sang alias, collection cũ trùng tên alias phải bị xóa trước
+        (Qdrant không cho alias trùng tên collection) nên chỉ có một khoảng trống rất ngắn.
+        Trước khi xóa, collection cũ được sao lưu thành phiên bản <alias>_v0 (cũ nhất), giữ lại
+        như mọi phiên bản cũ cho tới khi gc_collection_versions xóa nó.
+        """
+        current = self.resolve_collection_name(alias)
+        if current == collection_name:
+            return
+        if current == alias:
+            backup_name = self._backup_legacy_collection(alias)
+            print(f"Chuyển collection {alias} sang dạng alias: đã sao lưu vào {backup_name}, xóa collection cũ cùng tên")
+            self.client.delete_collection(alias)
+            current = None
+
+        operations = []
+        if current is not None:
+            operations.append(
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias))
+            )
+        operations.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+            )
+        )
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        self.invalidate_collection_cache(alias)
+        # Payload được cache theo tên alias, phiên bản mới có thể khác (ví dụ reset rỗng)
+        self._invalidate_chunks(alias)
+        print(f"Alias {alias}: {current or '(chưa có)'} -> {collection_name}")
+
+    def _backup_legacy_collection(self, alias):
+        """
+        Sao chép nguyên vector + payload của collection cũ trùng tên alias sang <alias>_v0
+
+        Returns:
+            Tên collection sao lưu
+        """
+        backup_name = f"{alias}_v0"
+        if self.client.collection_exists(backup_name):
+            self.client.delete_collection(backup_name)
+        vectors_config = self.client.get_collection(alias).config.params.vectors
+        self.client.create_collection(
+            collection_name=backup_name, vectors_config=vectors_config, **self._collection_create_options()
+        )
+        self.ensure_payload_indexes(backup_name)
+
+        batch = []
+        for record in self.scroll_iter(with_payload=True, with_vectors=True, collection_name=alias):
+            batch.append(PointStruct(id=record.id, vector=record.vector, payload=record.payload or {}))
+            if len(batch) >= 256:
+                self.client.upsert(collection_name=backup_name, points=batch)
+                batch = []
+        if batch:
+            self.client.upsert(collection_name=backup_name, points=batch)
+
+        expected = self.client.count(collection_name=alias, exact=True).count
+        copied = self.client.count(collection_name=backup_name, exact=True).count
+        if copied != expected:
+            self.client.delete_collection(backup_name)
+            raise RuntimeError(f"Sao lưu {alias} không đủ dữ liệu: {alias}={expected}, {backup_name}={copied}")
+        return backup_name
+
+    def gc_collection_versions(self, alias=None, keep=None):
+        """
+        Xóa các phiên bản cũ không còn được alias trỏ tới
+
+        Args:
+            alias: Tên alias (mặc định collection hiện tại)
+            keep: Số phiên bản cũ gần nhất được giữ lại để quay lui (mặc định QDRANT_KEEP_OLD_VERSIONS)
+
+        Returns:
+            Danh sách collection đã xóa
+        """
+        alias = alias or self.collection_name
+        keep = int(os.getenv("QDRANT_KEEP_OLD_VERSIONS", "1")) if keep is None else keep
+        current = self.resolve_collection_name(alias)
+        old_versions = [name for name in self.list_collection_versions(alias) if name != current]
+        expired = old_versions[: max(len(old_versions) - keep, 0)]
+        for name in expired:
+            self.client.delete_collection(name)
+            self.invalidate_collection_cache(name)
+            print(f"Đã xóa phiên bản cũ {name}")
+        return expired
+
+    async def _iter_rebuild_batches(self, source_name, embedding_model, batch_size):
+        """Đọc lần lượt từng trang của collection nguồn và encode lại văn bản bằng embedding_model"""
+        offset = None
+        while True:
+            records, offset = await self.async_client.scroll(
+                collection_name=source_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            if records:
+                vectors = await embedding_model.encode_batch(
+                    [(record.payload or {}).get("text", "") for record in records],
+                    batch_size=batch_size,
+                    show_progress=False,
+                )
+                yield [
+                    PointStruct(id=record.id, vector=vector.tolist(), payload=compact_payload(record.payload))
+                    for record, vector in zip(records, vectors)
+                ]
+            if offset is None:
+                break
+
+    async def rebuild_collection(
+        self, embedding_model, alias=None, copy_data=True, batch_size=None, parallelism=None, keep=None
+    ):
+        """
+        Dựng lại collection theo kiểu blue/green mà không làm gián đoạn tìm kiếm (bất đồng bộ)
+
+        Tạo collection phiên bản mới, encode lại toàn bộ chunk của collection hiện tại
+        (ví dụ sau khi đổi embedding model), đối chiếu số point rồi chuyển alias sang
+        phiên bản mới. Tìm kiếm luôn đi qua alias nên vẫn dùng bản cũ cho tới lúc chuyển.
+
+        Args:
+            embedding_model: EmbeddingModel dùng để encode lại
+            alias: Tên alias mà mọi truy vấn sử dụng (mặc định collection hiện tại)
+            copy_data: False để chuyển sang một collection rỗng (reset dữ liệu)
+            batch_size: Số chunk mỗi batch encode/upsert (mặc định QDRANT_UPSERT_BATCH_SIZE)
+            parallelism: Số upsert chạy đồng thời (mặc định QDRANT_UPSERT_PARALLELISM)
+            keep: Số phiên bản cũ giữ lại sau khi chuyển (mặc định QDRANT_KEEP_OLD_VERSIONS)
+
+        Returns:
+            Dict {alias, collection, previous, points_count, removed}
+        """
+        alias = alias or self.collection_name
+        if not alias:
+            raise ValueError("Cần collection_name (alias) để dựng lại collection")
+
+        start_time = time.time()
+        loop = asyncio.get_event_loop()
+        source_name = await loop.run_in_executor(None, self.resolve_collection_name, alias)
+        new_name = f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+        while await self.collection_exists(new_name):
+            new_name = f"{alias}_v{int(new_name.rsplit('_v', 1)[1]) + 1}"
+
+        vector_size = embedding_model.get_dimension()
+        print(f"[REBUILD] Tạo {new_name} (vector_size={vector_size}) từ {source_name or '(trống)'}")
+        await self.async_client.create_collection(
+            collection_name=new_name,
+            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+            **self._collection_create_options(),
+        )
+        self._collection_cache[new_name] = {"vector_size": vector_size, "distance": Distance.COSINE}
+
+        try:
+            await loop.run_in_executor(None, self.ensure_payload_indexes, new_name)
+
+            expected = 0
+            if copy_data and source_name:
+                batch_size = batch_size or int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "128"))
+                await self._upsert_pipeline(
+                    self._iter_rebuild_batches(source_name, embedding_model, batch_size),
+                    parallelism=parallelism,
+                    collection_name=new_name,
+                )
+                # Đếm lại nguồn sau khi sao chép: có ghi mới trong lúc dựng thì không khớp
+                expected = (await self.async_client.count(collection_name=source_name, exact=True)).count
+
+            points_count = (await self.async_client.count(collection_name=new_name, exact=True)).count
+            if points_count != expected:
+                raise RuntimeError(
+                    f"Số point không khớp: {source_name}={expected}, {new_name}={points_count}"
+                )
+        except BaseException:
+            await self.async_client.delete_collection(new_name)
+            self.invalidate_collection_cache(new_name)
+            print(f"[REBUILD] Hủy phiên bản {new_name}, alias {alias} giữ nguyên")
+            raise
+
+        await loop.run_in_executor(None, self.switch_alias, alias, new_name)
+        removed = await loop.run_in_executor(None, self.gc_collection_versions, alias, keep)
+
+        print(
+            f"[REBUILD] Hoàn thành {new_name} ({points_count} point) trong {time.time() - start_time:.2f}s"
+        )
+        return {
+            "alias": alias,
+            "collection": new_name,
+            "previous": source_name,
+            "points_count": points_count,
+            "removed": removed,
+        }
+
     def get_document_by_category(self, category, limit=100, user_id=None):
-        """Lấy tài liệu theo danh mục (SQL, NoSQL, ...)"""
+        """Lấy tài liệu theo danh mục (SQL, NoSQL, ...), tối đa limit (None để lấy toàn bộ)"""
         # Cập nhật collection_name nếu có user_id mới
         if user_id and user_id != self.user_id:
             self.collection_name = self.get_collection_name_for_user(user_id)
@@ -732,40 +2014,15 @@ class VectorStore:
                 "collection_name không được để trống. Cần user_id để xác định collection."
             )
 
-        if not self.client.collection_exists(self.collection_name):
+        if not self.collection_exists_sync():
             print(f"Collection {self.collection_name} không tồn tại")
             return []
 
         try:
-            # Tạo bộ lọc theo danh mục
-            category_filter = Filter(
-                must=[{"key": "metadata.category", "match": {"value": category}}]
-            )
-
-            # Scroll với filter
-            results = self.client.scroll(
-                collection_name=self.collection_name,
-                limit=limit,
-                with_payload=True,
-                with_vectors=False,
-                filter=category_filter,
-            )
-
-            points, next_offset = results
-
-            # Chuyển đổi thành định dạng chuẩn
-            documents = [
-                {
-                    "text": point.payload["text"],
-                    "metadata": point.payload["metadata"],
-                    "source": point.payload.get("source", "unknown"),
-                }
-                for point in points
-            ]
-
-            return documents
+            return list(islice(self.iter_documents(category=category), limit))
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"Lỗi khi lấy tài liệu theo danh mục: {str(e)}")
             return []
 
@@ -791,21 +2048,26 @@ class VectorStore:
                 f"[VECTOR_STORE] Bắt đầu xóa {len(point_ids)} điểm. ID mẫu: {point_ids[:3] if len(point_ids) > 3 else point_ids}"
             )
 
-            if not self.client.collection_exists(self.collection_name):
+            if not self.collection_exists_sync():
                 print(
                     f"[VECTOR_STORE] Lỗi: Collection {self.collection_name} không tồn tại"
                 )
                 return False
 
-            # Xóa từng điểm từ collection
-            delete_result = self.client.collection(self.collection_name).delete(
-                points_selector=models.PointIdsList(
-                    points=point_ids,
+            # Xóa từng điểm từ collection (multi-tenant: chỉ các point thuộc tenant hiện tại)
+            points_selector = models.PointIdsList(points=point_ids)
+            if self.multitenant:
+                points_selector = models.FilterSelector(
+                    filter=self._with_owner(models.Filter(must=[models.HasIdCondition(has_id=point_ids)]))
                 )
+            delete_result = self.client.collection(self.collection_name).delete(
+                points_selector=points_selector
             )
+            self._invalidate_chunks(point_ids=point_ids)
             print(f"[VECTOR_STORE] Kết quả xóa điểm: {delete_result}")
             return True
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"[VECTOR_STORE] Lỗi khi xóa điểm từ vector store: {str(e)}")
             import traceback
 
@@ -833,12 +2095,15 @@ class VectorStore:
         try:
             print(f"[VECTOR_STORE] Bắt đầu xóa điểm theo filter: {filter_dict}")
 
-            if not self.client.collection_exists(self.collection_name):
+            if not self.collection_exists_sync():
                 print(
                     f"[VECTOR_STORE] Lỗi: Collection {self.collection_name} không tồn tại"
                 )
                 return False, "Collection không tồn tại"
 
+            # Multi-tenant: chỉ xóa các điểm thuộc tenant hiện tại
+            delete_filter = self._with_owner(models.Filter(**filter_dict["filter"]))
+
             # Trước khi xóa, hãy đếm số lượng điểm khớp với filter
             try:
                 # Lấy thông tin collection trước khi xóa
@@ -851,7 +2116,7 @@ class VectorStore:
                     print(f"[VECTOR_STORE] Đang đếm số điểm khớp với filter...")
                     count_results = self.client.count(
                         collection_name=self.collection_name,
-                        count_filter=models.Filter(**filter_dict["filter"]),
+                        count_filter=delete_filter,
                     )
                     print(
                         f"[VECTOR_STORE] Số điểm khớp với filter: {count_results.count}"
@@ -863,8 +2128,10 @@ class VectorStore:
             print(f"[VECTOR_STORE] Thực hiện xóa điểm theo filter...")
             result = self.client.delete(
                 collection_name=self.collection_name,
-                points_selector=models.FilterSelector(filter=filter_dict["filter"]),
+                points_selector=models.FilterSelector(filter=delete_filter),
             )
+            # Filter tùy ý: không biết point nào bị xóa nên bỏ cache của cả collection
+            self._invalidate_chunks()
 
             print(f"[VECTOR_STORE] Kết quả xóa điểm: {result}")
 
@@ -881,6 +2148,7 @@ class VectorStore:
                 return True, f"Đã xóa {result.deleted} điểm"
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"[VECTOR_STORE] Lỗi khi xóa điểm theo filter: {str(e)}")
             import traceback
 
@@ -917,19 +2185,12 @@ class VectorStore:
             return False, "file_id không được để trống"
 
         # Kiểm tra collection có tồn tại không
-        if not self.client.collection_exists(self.collection_name):
+        if not self.collection_exists_sync():
             return False, f"Collection {self.collection_name} không tồn tại"
 
         try:
-            # Tạo filter để tìm các điểm có file_id tương ứng
-            delete_filter = Filter(
-                must=[
-                    models.FieldCondition(
-                        key="file_id",
-                        match=models.MatchValue(value=file_id)
-                    )
-                ]
-            )
+            # Tạo filter để tìm các điểm có file_id tương ứng (multi-tenant: chỉ của tenant hiện tại)
+            delete_filter = self._with_owner(self._file_id_filter(file_id))
 
             # Đếm số lượng điểm sẽ bị xóa trước khi xóa
             count_result = self.client.count(
@@ -948,6 +2209,7 @@ class VectorStore:
                 collection_name=self.collection_name,
                 points_selector=models.FilterSelector(filter=delete_filter)
             )
+            self._invalidate_chunks(predicate=lambda payload: payload.get("file_id") == file_id)
 
             if delete_result:
                 message = f"Đã xóa {points_to_delete} điểm dữ liệu với file_id: {file_id}"
@@ -957,10 +2219,73 @@ class VectorStore:
                 return False, f"Không thể xóa các điểm với file_id: {file_id}"
 
         except Exception as e:
+            self._handle_collection_error(e)
             error_msg = f"Lỗi khi xóa file_id {file_id}: {str(e)}"
             print(f"[DELETE] {error_msg}")
             return False, error_msg
 
+    def delete_by_file_ids(self, file_ids, count_mode="exact", expected_counts=None):
+        """
+        Xóa tất cả điểm dữ liệu của nhiều file bằng một lệnh delete duy nhất (filter MatchAny)
+
+        Args:
+            file_ids: Danh sách file_id cần xóa
+            count_mode: "exact" (đếm chính xác bằng một lệnh count trước khi xóa),
+                "metadata" (cộng chunks_count đã lưu khi upload, không hỏi Qdrant) hoặc "none"
+            expected_counts: Dict file_id -> số chunk đã lưu khi upload (dùng với count_mode="metadata")
+
+        Returns:
+            Tuple (success: bool, message: str, deleted_count: int hoặc None nếu không đếm)
+        """
+        if count_mode not in ("exact", "metadata", "none"):
+            raise ValueError(f"count_mode không hợp lệ: {count_mode}")
+
+        file_ids = list(dict.fromkeys(file_id for file_id in file_ids if file_id))
+        if not file_ids:
+            return False, "Danh sách file_id không được để trống", 0
+
+        print(f"[DELETE] Xóa {len(file_ids)} file trong collection: {self.collection_name}")
+
+        if not self.collection_exists_sync():
+            return False, f"Collection {self.collection_name} không tồn tại", 0
+
+        # Multi-tenant: chỉ xóa các điểm thuộc tenant hiện tại
+        delete_filter = self._with_owner(
+            Filter(must=[models.FieldCondition(key="file_id", match=models.MatchAny(any=file_ids))])
+        )
+        try:
+            deleted_count = None
+            if count_mode == "exact":
+                deleted_count = self.client.count(
+                    collection_name=self.collection_name,
+                    count_filter=delete_filter,
+                    exact=True,
+                ).count
+                if deleted_count == 0:
+                    return True, f"Không có điểm dữ liệu nào của {len(file_ids)} file", 0
+            elif count_mode == "metadata" and expected_counts is not None:
+                deleted_count = sum(int(expected_counts.get(file_id) or 0) for file_id in file_ids)
+
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(filter=delete_filter),
+            )
+            deleted_file_ids = set(file_ids)
+            self._invalidate_chunks(predicate=lambda payload: payload.get("file_id") in deleted_file_ids)
+
+            if deleted_count is None:
+                message = f"Đã xóa dữ liệu của {len(file_ids)} file"
+            else:
+                message = f"Đã xóa {deleted_count} điểm dữ liệu của {len(file_ids)} file"
+            print(f"[DELETE] {message}")
+            return True, message, deleted_count
+
+        except Exception as e:
+            self._handle_collection_error(e)
+            error_msg = f"Lỗi khi xóa {len(file_ids)} file: {str(e)}"
+            print(f"[DELETE] {error_msg}")
+            return False, error_msg, 0
+
     def delete_by_file_path(self, file_path, user_id=None):
         """
         Xóa tất cả điểm dữ liệu liên quan đến đường dẫn file
@@ -990,23 +2315,25 @@ class VectorStore:
             return False, "file_path không được để trống"
 
         # Kiểm tra collection có tồn tại không
-        if not self.client.collection_exists(self.collection_name):
+        if not self.collection_exists_sync():
             return False, f"Collection {self.collection_name} không tồn tại"
 
         try:
             # Tạo filter để tìm các điểm có file_path tương ứng
             # Tìm kiếm trong cả source và metadata.source
-            delete_filter = Filter(
-                should=[
-                    models.FieldCondition(
-                        key="source",
-                        match=models.MatchValue(value=file_path)
-                    ),
-                    models.FieldCondition(
-                        key="metadata.source",
-                        match=models.MatchValue(value=file_path)
-                    )
-                ]
+            delete_filter = self._with_owner(
+                Filter(
+                    should=[
+                        models.FieldCondition(
+                            key="source",
+                            match=models.MatchValue(value=file_path)
+                        ),
+                        models.FieldCondition(
+                            key="metadata.source",
+                            match=models.MatchValue(value=file_path)
+                        )
+                    ]
+                )
             )
 
             # Đếm số lượng điểm sẽ bị xóa trước khi xóa
@@ -1026,6 +2353,10 @@ class VectorStore:
                 collection_name=self.collection_name,
                 points_selector=models.FilterSelector(filter=delete_filter)
             )
+            self._invalidate_chunks(
+                predicate=lambda payload: payload.get("source") == file_path
+                or (payload.get("metadata") or {}).get("source") == file_path
+            )
 
             if delete_result:
                 message = f"Đã xóa {points_to_delete} điểm dữ liệu với file_path: {file_path}"
@@ -1035,6 +2366,7 @@ class VectorStore:
                 return False, f"Không thể xóa các điểm với file_path: {file_path}"
 
         except Exception as e:
+            self._handle_collection_error(e)
             error_msg = f"Lỗi khi xóa file_path {file_path}: {str(e)}"
             print(f"[DELETE] {error_msg}")
             return False, error_msg
@@ -1066,7 +2398,7 @@ class VectorStore:
                 f"[VECTOR_STORE] Bắt đầu xóa các điểm của file có UUID: {file_uuid} trong đường dẫn"
             )
 
-            if not self.client.collection_exists(self.collection_name):
+            if not self.collection_exists_sync():
                 print(
                     f"[VECTOR_STORE] Lỗi: Collection {self.collection_name} không tồn tại"
                 )
@@ -1087,7 +2419,7 @@ class VectorStore:
                 # Đếm theo source trước
                 count_results = self.client.count(
                     collection_name=self.collection_name,
-                    count_filter=models.Filter(**filter_condition["filter"]),
+                    count_filter=self._with_owner(models.Filter(**filter_condition["filter"])),
                 )
                 source_points = count_results.count
                 print(
@@ -1098,7 +2430,7 @@ class VectorStore:
                 if source_points == 0:
                     count_results = self.client.count(
                         collection_name=self.collection_name,
-                        count_filter=models.Filter(**alternate_filter["filter"]),
+                        count_filter=self._with_owner(models.Filter(**alternate_filter["filter"])),
                     )
                     path_points = count_results.count
                     print(
@@ -1130,9 +2462,13 @@ class VectorStore:
             result = self.client.delete(
                 collection_name=self.collection_name,
                 points_selector=models.FilterSelector(
-                    filter=filter_condition["filter"]
+                    filter=self._with_owner(models.Filter(**filter_condition["filter"]))
                 ),
             )
+            self._invalidate_chunks(
+                predicate=lambda payload: file_uuid in payload.get("source", "")
+                or file_uuid in payload.get("file_path", "")
+            )
 
             # Sau khi xóa, kiểm tra số lượng điểm còn lại
             info_after = self.client.get_collection(self.collection_name)
@@ -1147,6 +2483,7 @@ class VectorStore:
             return True, f"Đã xóa {points_deleted} điểm thuộc file có UUID {file_uuid}"
 
         except Exception as e:
+            self._handle_collection_error(e)
             print(f"[VECTOR_STORE] Lỗi khi xóa điểm theo UUID: {str(e)}")
             import traceback
 